@@ -1,81 +1,202 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
-from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
+import hmac
+import os
 import sqlite3
+import time
+from datetime import date, datetime
+from http.cookies import SimpleCookie
+
+from flask import Blueprint, Flask, Response, abort, current_app, flash, g, jsonify, redirect, render_template, request, send_file, session, stream_with_context, url_for
+from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 from werkzeug.security import check_password_hash, generate_password_hash
-from datetime import datetime, timedelta
 
-app = Flask(__name__)
-app.secret_key = 'supergeheimeschluessel'
+import statistik
+import db
+from db import get_db, aufraeumen, normalisiere_uid
+from cache import KartenCache, UserCache, Cache, SeitenCache
+from buchung import BuchungsEngine, UnbekannterUser
+import transaktionen as ledger
+import massenimport
+import prognose
+import produkte
+import archiv
+import fehlscans
+import konten
+import kiosk_api
+import live
+import metriken
+import migrationen
+import replikation
+import seiten
+import webserver
 
-import os
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
-# ... deine anderen Imports ...
+# --- KONFIGURATION ---
+# Standardwerte; jeder Schlüssel lässt sich per Umgebungsvariable KAFFEE_<SCHLÜSSEL> setzen.
+# Werte werden als JSON gelesen, wo das geht: KAFFEE_PORT=8080, KAFFEE_SITZUNG_STEMPEL=true,
+# KAFFEE_DB=/pfad/kaffee.db bleibt ein String.
+STANDARD_KONFIGURATION = {
+    'SECRET_KEY': 'supergeheimeschluessel',
+    'DB': db.DB_NAME,
+    'HOST': '0.0.0.0',
+    'PORT': 5000,
+    'THREADS': 4,
+    'SSE_PORT': 5001,
+    'SSE_ORIGINS': [],          # weitere Origins, die den Stream mit Cookies lesen dürfen (die App selbst immer)
+    'KONTENPFLEGE_S': 3600,
+    'PROFIL_MS': None,          # Schwelle für den Sampling-Profiler, None = aus (siehe metriken.py)
+    'PROFIL_DIR': 'profile',
+    'SITZUNG_STEMPEL': False,   # siehe load_user
+    # Mehrere Server (siehe replikation.py): ein 'schreiber', beliebig viele 'replikat'
+    'ROLLE': 'schreiber',
+    'SCHREIBER_URL': None,      # Replikat: Basis-URL des Schreibers
+    'REPLIKAT_TOKEN': None,     # ohne Token verschickt der Schreiber keine Snapshots
+    'SNAPSHOT_PFAD': None,      # Schreiber: Snapshot-Datei, Standard <DB>.snapshot
+    'SNAPSHOT_S': 30,
+    'API_ASYNC_PORT': None,     # zweiter Port für die Kiosk-API im asyncio-Server (siehe kiosk_api.py), None = aus
+    # Buchungen aus Monaten vor den letzten ARCHIV_MONATE in Jahresarchive verschieben (siehe archiv.py), None = aus.
+    # Snapshots für Replikate enthalten keine Archive: dort müssen die Dateien in ARCHIV_DIR liegen.
+    'ARCHIV_MONATE': None,
+    'ARCHIV_DIR': None,         # None = neben der DB
+    'ARCHIV_S': 86400,
+}
 
-app = Flask(__name__)
-app.secret_key = 'supergeheimeschluessel'
+# Alle Routen der Kasse; create_app() hängt sie zusammen mit den Status-Seiten an die App
+kaffee = Blueprint('kaffee', __name__)
 
-# --- ABSOLUTER PFAD ZUR DATENBANK (WICHTIG FÜR ECHTE SERVER) ---
-BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-DB_NAME = os.path.join(BASE_DIR, "kaffee.db")
+# Verbindungen sind pro Worker-Thread langlebig (siehe db.py) und werden nicht mehr
+# geschlossen. Nach jedem Request wird nur eine offene Transaktion verworfen.
+def db_aufraeumen(exception=None):
+    aufraeumen()
 
-def get_db():
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    # Stelle sicher, dass die Settings-Tabelle immer existiert!
-    conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
-    conn.commit()
-    return conn
+# --- METRIKEN ---
+# Latenz, SQL-Anweisungen und Cache-Trefferquoten je Route unter /metrics (siehe metriken.py).
+# PROFIL_MS schaltet den Sampling-Profiler für langsame Requests ein.
+messung = metriken.Metriken()
 
-def get_prediction_stats(conn):
+def messung_starten():
+    messung.anfrage_start()
+
+def messung_status(response):
+    g.messung_status = response.status_code
+    return response
+
+def messung_beenden(exception=None):
+    # teardown_request läuft immer, auch nach einer Exception oder wenn ein after_request-Hook
+    # scheitert; ohne Antwort zählt der Request als 500
+    route = request.url_rule.rule if request.url_rule else 'unbekannt'
+    messung.anfrage_ende(route, request.method, 500 if exception is not None else g.get('messung_status', 500))
+
+@kaffee.route('/metrics')
+def metrics():
+    return Response(messung.text(), mimetype='text/plain; version=0.0.4')
+
+# RFID-UID -> User für /api/check_card (siehe cache.py)
+karten_cache = KartenCache()
+# Unbekannte Karten: gezählt im Speicher, gesammelt geschrieben (siehe fehlscans.py)
+fehlscan_log = fehlscans.FehlscanLog(db.verbinden)
+# Abgeleitete Ansichten für Admin & Dashboard. Invalidiert von admin_action und api_book,
+# die TTL fängt nur Änderungen an app.py vorbei ab.
+auswertungen = Cache(ttl=60)
+messung.cache_registrieren('karten', karten_cache)
+messung.cache_registrieren('auswertungen', auswertungen)
+SALDO_ANSICHTEN = ('finanzen', 'empfehlung', 'users')
+# Dashboard, History und Admin fertig gerendert je Datenstand, mit ETag und Kompression (siehe seiten.py)
+seiten_cache = SeitenCache()
+messung.cache_registrieren('seiten', seiten_cache)
+gerendert = seiten.Seiten(seiten_cache)
+# Benutzerverwaltung im Admin-Bereich seitenweise, damit die Seite mit der Zahl der User nicht wächst
+USER_PRO_SEITE = 50
+# Ein Schreib-Thread mit Group Commit für alle Kiosk-Buchungen (siehe buchung.py)
+buchungen = BuchungsEngine()
+verbrauchsprognose = prognose.Prognose()
+# Saldo-Stände + Abgleich users.saldo gegen das Ledger (siehe konten.py), gestartet in __main__
+kontenpflege = konten.Kontenpflege(db.verbinden)
+# Alte Monate ins Archiv; ein neues Archivjahr hängen alle Threads nach einem Neuverbinden an
+archivierung = archiv.Archivierung(db.verbinden, bei_neuer_datei=db.neu_verbinden)
+
+# --- SCHREIBER & REPLIKATE (siehe replikation.py) ---
+def neuer_snapshot():
+    # Replikat: neuer Stand vom Schreiber -> neu verbinden, alle abgeleiteten Ansichten verwerfen
+    db.neu_verbinden()
+    karten_cache.leeren()
+    auswertungen.leeren()
+    user_cache.leeren()
+    if hub.aktiv():
+        hub.markieren('stats', 'finanzen')
+
+snapshot_versand = replikation.SnapshotVersand(db.verbinden)
+snapshot_abruf = replikation.SnapshotAbruf(bei_neuem_stand=neuer_snapshot)
+# Lesen ohne DB-Änderung, obwohl POST: darf auch ein Replikat beantworten
+REPLIKAT_POST_ERLAUBT = {'kaffee.login'}
+
+def replikat_weiterleiten():
+    # Replikat: alles, was schreibt, geht per 307 (Methode und Body bleiben) an den Schreiber
+    if request.method in ('GET', 'HEAD', 'OPTIONS') or request.endpoint in REPLIKAT_POST_ERLAUBT:
+        return None
+    if not current_app.config['SCHREIBER_URL']:
+        return jsonify({'status': 'error', 'message': 'Nur-Lese-Replikat ohne SCHREIBER_URL'}), 503
+    return redirect(current_app.config['SCHREIBER_URL'].rstrip('/') + request.full_path.rstrip('?'), code=307)
+
+def gesundheit(conn):
+    # Für das Failover der Kiosks (kiosk_io.ServerListe) und Load-Balancer
+    if db.NUR_LESEN:
+        alter = snapshot_abruf.alter()
+        frisch = alter is not None and alter < 3 * snapshot_abruf.intervall
+        return {'status': 'ok' if frisch else 'veraltet', 'rolle': 'replikat',
+                'snapshot_alter_s': None if alter is None else round(alter, 1)}, 200 if frisch else 503
+    conn.execute("SELECT 1").fetchone()
+    return {'status': 'ok', 'rolle': 'schreiber'}, 200
+
+@kaffee.route('/api/health')
+def api_health():
+    daten, status = gesundheit(get_db())
+    return jsonify(daten), status
+
+@kaffee.route('/api/snapshot')
+def api_snapshot():
+    # Nur der Schreiber, nur mit Token – der Snapshot enthält auch die Passwort-Hashes
+    token = current_app.config['REPLIKAT_TOKEN']
+    if current_app.config['ROLLE'] != 'schreiber' or not token:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get('X-Replikat-Token', ''), str(token)):
+        abort(403)
+    if snapshot_versand.etag is None:
+        return jsonify({'status': 'error', 'message': 'Noch kein Snapshot'}), 503
+    return send_file(snapshot_versand.pfad, mimetype='application/vnd.sqlite3',
+                     etag=snapshot_versand.etag, conditional=True, max_age=0)
+
+def seitenschluessel(name, *teile):
+    # Alles, wovon eine gecachte Seite abhängt. Der Datenstand zählt jede Invalidierung in
+    # app.py; das Zeitfenster der TTL fängt wie bei auswertungen Änderungen an app.py vorbei ab.
+    return (name, auswertungen.stand, int(time.time() // auswertungen.ttl), current_user.id,
+            request.host, tuple(sorted(request.args.items())), *teile)
+
+def get_settings(conn):
+    return auswertungen.hole('settings', lambda: dict(conn.execute("SELECT key, value FROM settings").fetchall()))
+
+def get_produkte(conn):
+    return auswertungen.hole('produkte', lambda: produkte.alle(conn))
+
+def get_gramm_pro_tasse(settings):
     try:
-        row_gramm = conn.execute("SELECT value FROM settings WHERE key='gramm_pro_tasse'").fetchone()
-        gramm_pro_tasse = float(row_gramm[0]) if row_gramm else 12.0
-    except Exception:
-        gramm_pro_tasse = 12.0
+        return float(settings.get('gramm_pro_tasse', 12.0))
+    except (TypeError, ValueError):
+        return 12.0
+
+def get_prediction_stats(conn):
+    settings = get_settings(conn)
+    gramm_pro_tasse = get_gramm_pro_tasse(settings)
         
     # KORREKTUR: Alles komplett über die Datenbank-Zeit berechnen (Zeitzonen ignorieren!)
-    times = conn.execute("""
-        SELECT 
-            COALESCE((SELECT value FROM settings WHERE key='reset_datum'), '2000-01-01 00:00:00') as reset_time,
-            datetime('now', '-100 days') as hundred_days_ago,
-            datetime('now') as db_now
-    """).fetchone()
-    
-    reset_str = times['reset_time']
-    hundred_str = times['hundred_days_ago']
-    db_now_str = times['db_now']
+    hundred_str = conn.execute("SELECT datetime('now', '-100 days')").fetchone()[0]
+    reset_str = settings.get('reset_datum') or '2000-01-01 00:00:00'
     
     # Das neuere Datum gewinnt
     start_date_str = max(reset_str, hundred_str)
     
-    # Exakte Tage ausrechnen (nimmt die SQLite-Funktion julianday für exakte Kommazahlen)
-    days_passed_query = conn.execute("SELECT julianday(?) - julianday(?)", (db_now_str, start_date_str)).fetchone()[0]
-    days_passed = max(days_passed_query, 1.0)
+    # Wochentagsprofil + Reichweite für alle Sorten, gecacht bis zur nächsten Tasse/Lieferung (siehe prognose.py)
+    stats = verbrauchsprognose.berechnen(conn, date.fromisoformat(start_date_str[:10]), gramm_pro_tasse)
     
-    stats = {}
-    sorten = [
-        ('Koffein', 'KAUF_KOFFEIN', 'Schwarz'), 
-        ('Entkoffeiniert', 'KAUF_ENTKOFFEINIERT', 'Decaf')
-    ]
-    
-    for sorte_name, kauf_typ, text_match in sorten:
-        bohnen_in = conn.execute("SELECT SUM(menge_gramm) FROM bohnen_log WHERE sorte=?", (sorte_name,)).fetchone()[0] or 0
-        tassen_gesamt = conn.execute("SELECT COUNT(*) FROM transaktionen WHERE typ=? OR (typ='KAUF' AND beschreibung LIKE ?)", (kauf_typ, f'%{text_match}%')).fetchone()[0] or 0
-        bestand = bohnen_in - (tassen_gesamt * gramm_pro_tasse)
-        
-        # HIER zählten die Kaffees vorher nicht, weil start_date_str durch Python in der "Zukunft" lag!
-        tassen_zeitraum = conn.execute("SELECT COUNT(*) FROM transaktionen WHERE zeitstempel >= ? AND (typ=? OR (typ='KAUF' AND beschreibung LIKE ?))", (start_date_str, kauf_typ, f'%{text_match}%')).fetchone()[0] or 0
-        
-        tassen_pro_tag = tassen_zeitraum / days_passed
-        tage_bis_leer = (bestand / (tassen_pro_tag * gramm_pro_tasse)) if tassen_pro_tag > 0 else 999
-        
-        stats[sorte_name] = {
-            'bestand': int(bestand),
-            'tassen_pro_tag': round(tassen_pro_tag, 1),
-            'tage_bis_leer': int(tage_bis_leer)
-        }
-    
-    whale_user = conn.execute("SELECT name, saldo FROM users WHERE is_admin = 0 ORDER BY saldo ASC LIMIT 1").fetchone()
+    whale_user = auswertungen.hole('empfehlung', lambda: conn.execute("SELECT name, saldo FROM users WHERE is_admin = 0 ORDER BY saldo ASC LIMIT 1").fetchone())
     
     return {
         'sorten_stats': stats, 
@@ -93,79 +214,168 @@ def get_financial_health(conn):
         'bilanz': guthaben_summe + schulden_summe
     }
 
+# --- LIVE-UPDATES (SSE, siehe live.py) ---
+def sse_user(app, cookie_header):
+    # Flask-Session aus dem Cookie lesen, damit der SSE-Server weiß, wer zuhört
+    cookie = SimpleCookie()
+    cookie.load(cookie_header or '')
+    morsel = cookie.get(app.config['SESSION_COOKIE_NAME'])
+    serializer = app.session_interface.get_signing_serializer(app)
+    if morsel is None or serializer is None:
+        return None
+    try:
+        session = serializer.loads(morsel.value, max_age=int(app.permanent_session_lifetime.total_seconds()))
+    except Exception:
+        return None
+    user_id = session.get('_user_id')
+    if user_id is None:
+        return None
+    u = get_db().execute("SELECT id, is_admin FROM users WHERE id = ?", (user_id,)).fetchone()
+    return (u['id'], bool(u['is_admin'])) if u else None
+
+# auth setzt create_app(), weil sse_user die App für das Session-Cookie braucht
+hub = live.Hub(auth=None, quellen={
+    'stats': (lambda: get_prediction_stats(get_db()), False),
+    'finanzen': (lambda: auswertungen.hole('finanzen', lambda: get_financial_health(get_db())), True),
+})
+
+def sse_kontext():
+    if hub.port is None:
+        return {'sse_url': None}
+    return {'sse_url': f"{request.scheme}://{request.host.rsplit(':', 1)[0]}:{hub.port}/api/stream"}
+
+@kaffee.route('/api/stream')
+def api_stream():
+    # Die Streams laufen im asyncio-Thread von live.py, nicht in einem Waitress-Worker
+    if hub.port is None:
+        return jsonify({'status': 'error', 'message': 'Live-Updates sind nicht aktiv'}), 503
+    return redirect(sse_kontext()['sse_url'], code=307)
+
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+login_manager.login_view = 'kaffee.login'
 
-class User(UserMixin):
-    def __init__(self, id, name, is_admin, saldo):
+# Kompaktes User-Objekt ohne __dict__. Der Saldo gehört nicht hinein: er ändert sich mit jeder
+# Buchung, Seiten lesen ihn frisch aus der DB.
+class User:
+    __slots__ = ('id', 'name', 'is_admin', 'version')
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
+
+    def __init__(self, id, name, is_admin, version=0):
         self.id = id
         self.name = name
         self.is_admin = is_admin
-        self.saldo = saldo
+        self.version = version
+
+    def get_id(self):
+        return str(self.id)
+
+# Angemeldete Seiten kosten so keine eigene Abfrage mehr; admin_action invalidiert bei edit/delete.
+user_cache = UserCache()
+messung.cache_registrieren('users', user_cache)
+# Mit SITZUNG_STEMPEL merkt sich die Session die sitzung_version beim Login.
+# Bearbeitet der Admin den User, passt der Stempel nicht mehr und die Session endet.
+
+def user_aus_zeile(u):
+    return User(u['id'], u['name'], bool(u['is_admin']), u['sitzung_version'])
 
 @login_manager.user_loader
 def load_user(user_id):
-    conn = get_db()
-    u = conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
-    conn.close()
-    if u:
-        return User(u['id'], u['name'], u['is_admin'], u['saldo'])
-    return None
+    try:
+        user_id = int(user_id)
+    except ValueError:
+        return None
+    user, generation = user_cache.hole(user_id)
+    if user is None:
+        u = get_db().execute("SELECT id, name, is_admin, sitzung_version FROM users WHERE id = ?", (user_id,)).fetchone()
+        if u is None:
+            return None
+        user = user_aus_zeile(u)
+        user_cache.eintragen(user_id, user, generation)
+    if current_app.config['SITZUNG_STEMPEL'] and session.get('stempel', user.version) != user.version:
+        return None
+    return user
 
-@app.route('/login', methods=['GET', 'POST'])
+@kaffee.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         name = request.form['name']
         password = request.form['password']
         conn = get_db()
         user_data = conn.execute("SELECT * FROM users WHERE name = ?", (name,)).fetchone()
-        conn.close()
         
         if user_data and check_password_hash(user_data['password_hash'], password):
-            user_obj = User(user_data['id'], user_data['name'], user_data['is_admin'], user_data['saldo'])
+            user_obj = user_aus_zeile(user_data)
             login_user(user_obj)
-            return redirect(url_for('dashboard'))
+            session['stempel'] = user_obj.version
+            return redirect(url_for('kaffee.dashboard'))
         else:
             flash('Login fehlgeschlagen. Name oder Passwort falsch.')
     return render_template('login.html')
 
-@app.route('/logout')
+@kaffee.route('/logout')
 @login_required
 def logout():
     logout_user()
-    return redirect(url_for('login'))
+    return redirect(url_for('kaffee.login'))
 
-@app.route('/')
-@app.route('/dashboard')
+@kaffee.route('/')
+@kaffee.route('/dashboard')
 @login_required
 def dashboard():
-    conn = get_db()
-    transaktionen = conn.execute("SELECT * FROM transaktionen WHERE user_id = ? ORDER BY zeitstempel DESC LIMIT 10", (current_user.id,)).fetchall()
-    curr_saldo = conn.execute("SELECT saldo FROM users WHERE id = ?", (current_user.id,)).fetchone()[0]
-    stats = get_prediction_stats(conn)
-    conn.close()
-    return render_template('dashboard.html', transaktionen=transaktionen, saldo=curr_saldo, stats=stats)
+    def rendern():
+        conn = get_db()
+        transaktionen, naechste = ledger.seite(conn, 10, request.args.get('vor'), user_id=current_user.id)
+        curr_saldo = conn.execute("SELECT saldo FROM users WHERE id = ?", (current_user.id,)).fetchone()[0]
+        stats = get_prediction_stats(conn)
+        return render_template('dashboard.html', transaktionen=transaktionen, saldo=curr_saldo, stats=stats, naechste=naechste)
+    # Die Prognose rechnet ab "heute": neuer Tag, neue Seite
+    return gerendert.antwort(seitenschluessel('dashboard', date.today()), rendern)
 
-@app.route('/admin')
+@kaffee.route('/admin')
 @login_required
 def admin():
     if not current_user.is_admin: return "Zugriff verweigert", 403
-    conn = get_db()
-    users = conn.execute("SELECT * FROM users ORDER BY saldo ASC").fetchall()
-    finanzen = get_financial_health(conn)
-    # Gebe die aktuellen Settings an das Admin-Template weiter
-    try:
-        row_gramm = conn.execute("SELECT value FROM settings WHERE key='gramm_pro_tasse'").fetchone()
-        gramm_pro_tasse = float(row_gramm[0]) if row_gramm else 12.0
-    except Exception:
-        gramm_pro_tasse = 12.0
-        
-    settings = {'gramm_pro_tasse': gramm_pro_tasse}
-    conn.close()
-    return render_template('admin.html', users=users, finanzen=finanzen, settings=settings)
+    def rendern():
+        conn = get_db()
+        anzahl = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        seiten_anzahl = max(1, -(-anzahl // USER_PRO_SEITE))
+        seite = min(max(request.args.get('seite', 1, type=int), 1), seiten_anzahl)
+        users = conn.execute("SELECT * FROM users ORDER BY saldo ASC, id LIMIT ? OFFSET ?",
+                             (USER_PRO_SEITE, (seite - 1) * USER_PRO_SEITE)).fetchall()
+        finanzen = auswertungen.hole('finanzen', lambda: get_financial_health(conn))
+        # Gebe die aktuellen Settings an das Admin-Template weiter
+        settings = {'gramm_pro_tasse': get_gramm_pro_tasse(get_settings(conn))}
+        # Auswahllisten und Bearbeiten-Dialog holen ihre User per JSON (admin_users, admin_user)
+        return render_template('admin.html', users=users, seite=seite, seiten_anzahl=seiten_anzahl, finanzen=finanzen, settings=settings,
+                               kontenabgleich=kontenpflege.ergebnis,
+                               fehlscans=auswertungen.hole('fehlscans', lambda: fehlscans.top(conn)),
+                               produkte=get_produkte(conn).values(), sorten=[s for s, _, _ in statistik.SORTEN])
+    abgleich = kontenpflege.ergebnis['zeit'] if kontenpflege.ergebnis else None
+    return gerendert.antwort(seitenschluessel('admin', abgleich), rendern)
+
+@kaffee.route('/admin/users')
+@login_required
+def admin_users():
+    # Für die User-Auswahl in den Admin-Formularen; per ETag meist nur ein 304
+    if not current_user.is_admin: return "Zugriff verweigert", 403
+    def rendern():
+        users = auswertungen.hole('users', lambda: get_db().execute("SELECT id, name, is_admin FROM users ORDER BY saldo ASC").fetchall())
+        return current_app.json.dumps([{'id': u['id'], 'name': u['name'], 'is_admin': bool(u['is_admin'])} for u in users])
+    return gerendert.antwort(seitenschluessel('admin_users'), rendern, mimetype='application/json')
 
-@app.route('/admin/action', methods=['POST'])
+@kaffee.route('/admin/user/<int:user_id>')
+@login_required
+def admin_user(user_id):
+    # Inhalt des Bearbeiten-Dialogs, erst beim Öffnen geladen
+    if not current_user.is_admin: return "Zugriff verweigert", 403
+    u = get_db().execute("SELECT id, name, rfid_uid, saldo FROM users WHERE id = ?", (user_id,)).fetchone()
+    if u is None:
+        return jsonify({'status': 'error', 'message': 'Unbekannter User'}), 404
+    return jsonify({'status': 'ok', 'id': u['id'], 'name': u['name'], 'rfid_uid': u['rfid_uid'] or '', 'saldo': u['saldo']})
+
+@kaffee.route('/admin/action', methods=['POST'])
 @login_required
 def admin_action():
     if not current_user.is_admin: return "Verboten", 403
@@ -176,7 +386,7 @@ def admin_action():
         if aktion == 'new_user':
             try:
                 pw = generate_password_hash(request.form['password'])
-                rfid = request.form['rfid'] if request.form['rfid'] else None
+                rfid = normalisiere_uid(request.form['rfid'])
                 conn.execute("INSERT INTO users (name, password_hash, rfid_uid) VALUES (?,?,?)", (request.form['name'], pw, rfid))
                 flash(f"User {request.form['name']} angelegt")
             except sqlite3.IntegrityError: 
@@ -185,10 +395,12 @@ def admin_action():
         elif aktion == 'edit_user':
             uid = request.form['user_id']
             name = request.form['name']
-            rfid = request.form['rfid'] if request.form['rfid'] else None
+            rfid = normalisiere_uid(request.form['rfid'])
             saldo = float(request.form['saldo'])
             try:
-                conn.execute("UPDATE users SET name=?, rfid_uid=?, saldo=? WHERE id=?", (name, rfid, saldo, uid))
+                conn.execute("UPDATE users SET name=?, rfid_uid=?, sitzung_version = sitzung_version + 1 WHERE id=?", (name, rfid, uid))
+                # Saldo nie überschreiben: die Differenz wird als KORREKTUR ins Ledger gebucht
+                konten.korrektur_buchen(conn, uid, saldo)
                 flash(f"User {name} aktualisiert!")
             except sqlite3.IntegrityError:
                 flash("Fehler: Name oder RFID ist bereits vergeben.")
@@ -215,6 +427,7 @@ def admin_action():
             uid = request.form['user_id']
             menge, preis, sorte = int(request.form['menge']), float(request.form['preis']), request.form['sorte']
             conn.execute("INSERT INTO bohnen_log (user_id, menge_gramm, preis, sorte) VALUES (?,?,?,?)", (uid, menge, preis, sorte))
+            statistik.buche_bohnen(conn, sorte, menge)
             conn.execute("UPDATE users SET saldo = saldo + ? WHERE id=?", (preis, uid))
             conn.execute("INSERT INTO transaktionen (user_id, typ, beschreibung, betrag) VALUES (?, 'BOHNEN', ?, ?)", (uid, f'Bohnen {menge}g ({sorte})', preis))
             flash("Bohnen erfasst")
@@ -231,6 +444,22 @@ def admin_action():
             conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('gramm_pro_tasse', ?)", (neue_gramm,))
             flash(f'Gramm pro Tasse auf {neue_gramm}g aktualisiert!')
             
+        elif aktion == 'produkt_speichern':
+            # Preis/Name ändern oder neues Produkt (ohne produkt_id); Kiosks holen die Liste über /api/produkte
+            produkt_id = request.form.get('produkt_id') or None
+            werte = (request.form['name'], float(request.form['preis']), request.form['sorte'], int('aktiv' in request.form))
+            if werte[2] not in statistik.SORTE_ZU_KAUF_TYP:
+                flash(f"Unbekannte Sorte: {werte[2]}")
+            else:
+                try:
+                    if produkt_id:
+                        conn.execute("UPDATE produkte SET name=?, preis=?, sorte=?, aktiv=? WHERE id=?", (*werte, produkt_id))
+                    else:
+                        conn.execute("INSERT INTO produkte (name, preis, sorte, aktiv) VALUES (?,?,?,?)", werte)
+                    flash(f"Produkt {werte[0]} gespeichert.")
+                except sqlite3.IntegrityError:
+                    flash("Fehler: Ein Produkt mit diesem Namen existiert schon.")
+
         elif aktion == 'reset_verbrauch':
             # KORREKTUR: Nutze CURRENT_TIMESTAMP der Datenbank, statt der Python-Zeit!
             conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('reset_datum', CURRENT_TIMESTAMP)")
@@ -240,62 +469,371 @@ def admin_action():
         flash(f"Ein unerwarteter Fehler ist aufgetreten: {e}")
 
     conn.commit()
-    conn.close()
-    return redirect(url_for('admin'))
+    # Jede Aktion mit user_id kann Name, Karte oder Saldo geändert haben
+    if 'user_id' in request.form:
+        karten_cache.invalidieren(request.form['user_id'])
+    if aktion in ('edit_user', 'delete_user'):
+        user_cache.invalidieren(request.form['user_id'])
+    if aktion in ('new_user', 'edit_user'):
+        auswertungen.invalidieren('fehlscans')   # zugeordnete Karte fällt aus der Liste
+    if aktion in ('set_gramm_pro_tasse', 'reset_verbrauch'):
+        auswertungen.invalidieren('settings')
+    elif aktion == 'produkt_speichern':
+        auswertungen.invalidieren('produkte')
+    else:
+        auswertungen.invalidieren(*SALDO_ANSICHTEN)
+    if hub.aktiv():
+        if 'user_id' in request.form and aktion != 'delete_user':
+            zeile = conn.execute("SELECT saldo FROM users WHERE id = ?", (request.form['user_id'],)).fetchone()
+            if zeile:
+                hub.saldo(int(request.form['user_id']), zeile[0])
+        hub.markieren('stats', 'finanzen')
+    return redirect(url_for('kaffee.admin'))
 
-@app.route('/history')
+@kaffee.route('/admin/import', methods=['POST'])
+@login_required
+def admin_import():
+    # Massenimport: Formular-Upload (CSV/JSON-Datei) oder JSON {'art': ..., 'zeilen': [...]}
+    if not current_user.is_admin: return "Verboten", 403
+    formular = 'datei' in request.files
+    try:
+        if formular:
+            art = request.form.get('art', '')
+            datei = request.files['datei']
+            zeilen = massenimport.lesen(datei.read(), datei.filename or '')
+        elif request.is_json:
+            daten = request.get_json(silent=True)
+            if not isinstance(daten, dict):
+                raise massenimport.ImportFehler("JSON muss ein Objekt mit 'art' und 'zeilen' sein")
+            art, zeilen = daten.get('art', request.args.get('art', '')), daten.get('zeilen', [])
+            if not isinstance(zeilen, list) or not all(isinstance(z, dict) for z in zeilen):
+                raise massenimport.ImportFehler("'zeilen' muss eine Liste von Objekten sein")
+        else:
+            art, zeilen = request.args.get('art', ''), massenimport.lesen(request.get_data())
+        ergebnis = massenimport.importieren(get_db(), art, zeilen)
+    except (massenimport.ImportFehler, ValueError) as e:
+        if formular:
+            flash(f"Import fehlgeschlagen: {e}")
+            return redirect(url_for('kaffee.admin'))
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    if art == 'users':
+        karten_cache.leeren()
+    else:
+        for user_id in ergebnis['user_ids']:
+            karten_cache.invalidieren(user_id)
+    if ergebnis['importiert']:
+        auswertungen.invalidieren(*SALDO_ANSICHTEN)
+        if hub.aktiv():
+            conn = get_db()
+            for user_id in ergebnis['user_ids']:
+                hub.saldo(user_id, conn.execute("SELECT saldo FROM users WHERE id = ?", (user_id,)).fetchone()[0])
+            hub.markieren('stats', 'finanzen')
+
+    if formular:
+        flash(f"{ergebnis['importiert']} von {ergebnis['importiert'] + len(ergebnis['fehler'])} Zeilen importiert.")
+        for fehler in ergebnis['fehler'][:20]:
+            flash(f"Zeile {fehler['zeile']}: {fehler['message']}")
+        return redirect(url_for('kaffee.admin'))
+    return jsonify({'status': 'success', **ergebnis})
+
+@kaffee.route('/history')
 @login_required
 def history():
-    conn = get_db()
-    buchungen = conn.execute('''
-        SELECT t.zeitstempel, COALESCE(u.name, 'Unbekannte Karte') as name, t.beschreibung, t.betrag, t.typ 
-        FROM transaktionen t
-        LEFT JOIN users u ON t.user_id = u.id 
-        ORDER BY t.zeitstempel DESC LIMIT 50
-    ''').fetchall()
-    conn.close()
-    return render_template('history.html', buchungen=buchungen)
-
-@app.route('/api/check_card/<uid>')
-def api_check_card(uid):
-    clean_uid = uid.replace(" ", "").upper()
-    conn = get_db()
-    user = conn.execute("SELECT * FROM users WHERE replace(rfid_uid, ' ', '') = ?", (clean_uid,)).fetchone()
-    
+    def rendern():
+        buchungen, naechste = ledger.seite(get_db(), 50, request.args.get('vor'))
+        return render_template('history.html', buchungen=buchungen, naechste=naechste)
+    return gerendert.antwort(seitenschluessel('history'), rendern)
+
+@kaffee.route('/export')
+@login_required
+def export():
+    if not current_user.is_admin: return "Zugriff verweigert", 403
+    format_ = request.args.get('format', 'csv')
+    if format_ not in ('csv', 'ndjson'):
+        return "Format muss csv oder ndjson sein", 400
+    filter_ = {
+        'user_id': request.args.get('user_id', type=int),
+        'typ': request.args.get('typ') or None,
+        'von': request.args.get('von') or None,
+        'bis': request.args.get('bis') or None,
+    }
+    def erzeugen():
+        # Eigene Verbindung, weil der Generator erst nach dem Request-Handler läuft
+        conn = db.verbinden()
+        try:
+            zeilen = ledger.alle(conn, **filter_)
+            yield from (ledger.als_csv(zeilen) if format_ == 'csv' else ledger.als_ndjson(zeilen))
+        finally:
+            conn.close()
+
+    mimetype = 'text/csv' if format_ == 'csv' else 'application/x-ndjson'
+    dateiname = f"transaktionen.{format_}"
+    return Response(stream_with_context(erzeugen()), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{dateiname}"'})
+
+# Die Kiosk-Routen bestehen aus Teilen ohne Flask-Request, damit die Flask-Routen hier
+# und die asyncio-Routen unten (kiosk_api.py) dieselbe Logik und dieselben Caches nutzen.
+
+def karte_nachschlagen(conn, clean_uid, generation):
+    # rfid_uid ist beim Schreiben normalisiert -> Lookup über den UNIQUE-Index
+    user = conn.execute("SELECT id, name, saldo FROM users WHERE rfid_uid = ?", (clean_uid,)).fetchone()
     if user:
-        conn.close()
-        return jsonify({
+        eintrag = {'user_id': user['id'], 'name': user['name'], 'saldo': user['saldo']}
+        karten_cache.eintragen(clean_uid, eintrag, generation)
+        return eintrag
+    if not db.NUR_LESEN:
+        # Kein INSERT/COMMIT mehr pro Scan, und nichts davon im Ledger
+        fehlscan_log.melden(clean_uid)
+    return None
+
+def karten_antwort(eintrag, clean_uid):
+    if eintrag:
+        return {
             'status': 'ok',
-            'user_id': user['id'],
-            'name': user['name'],
-            'saldo': user['saldo']
-        })
-    else:
-        conn.execute("INSERT INTO transaktionen (user_id, typ, beschreibung, betrag) VALUES (NULL, 'WARNUNG', ?, 0.0)", 
-                     (f"RFID Scan fehlgeschlagen: {clean_uid}",))
-        conn.commit()
-        conn.close()
-        return jsonify({'status': 'unknown', 'uid': clean_uid})
+            'user_id': eintrag['user_id'],
+            'name': eintrag['name'],
+            'saldo': eintrag['saldo']
+        }
+    return {'status': 'unknown', 'uid': clean_uid}
+
+def karten_liste(conn):
+    # Alle bekannten Karten für den lokalen Cache der Kiosks (Offline-Betrieb)
+    karten = conn.execute("SELECT rfid_uid, id, name, saldo FROM users WHERE rfid_uid IS NOT NULL").fetchall()
+    return {'status': 'ok', 'karten': [
+        {'uid': k['rfid_uid'], 'user_id': k['id'], 'name': k['name'], 'saldo': k['saldo']} for k in karten
+    ]}
+
+def produkt_liste(conn):
+    # Knöpfe der Kiosks: Name, Preis und ID, die bei der Buchung zurückkommt
+    return {'status': 'ok', 'produkte': [
+        {'id': p['id'], 'name': p['name'], 'preis': p['preis'], 'sorte': p['sorte']}
+        for p in get_produkte(conn).values() if p['aktiv']
+    ]}
+
+@kaffee.route('/api/check_card/<uid>')
+def api_check_card(uid):
+    clean_uid = normalisiere_uid(uid) or ''
+    eintrag, generation = karten_cache.hole(clean_uid)
+    if eintrag is None:
+        eintrag = karte_nachschlagen(get_db(), clean_uid, generation)
+    return jsonify(karten_antwort(eintrag, clean_uid))
+
+@kaffee.route('/api/cards')
+def api_cards():
+    return jsonify(karten_liste(get_db()))
+
+@kaffee.route('/api/produkte')
+def api_produkte():
+    return jsonify(produkt_liste(get_db()))
+
+def produkt_aus_anfrage(conn, daten):
+    # Aktuelle Kiosks schicken produkt_id, ältere (bzw. deren Offline-Warteschlange) noch den Namen
+    katalog = get_produkte(conn)
+    if daten.get('produkt_id') is not None:
+        return katalog.get(int(daten['produkt_id']))
+    return produkte.fuer_namen(katalog, daten.get('product', ''))
+
+def preis_aus_anfrage(daten, produkt):
+    # Der Kiosk schickt den Preis, den der Kunde gesehen hat; ohne Angabe gilt der Produktpreis
+    return float(daten['price']) if daten.get('price') is not None else produkt['preis']
+
+def buchung_aus_anfrage(conn, daten):
+    """(user_id, produkt, preis) einer Einzelbuchung; ValueError mit Meldung bei ungültigen Angaben."""
+    # Typen hier prüfen: was erst im Schreib-Thread scheitert, trifft den ganzen Group Commit
+    if not isinstance(daten, dict):
+        raise ValueError('Ungültige Buchung')
+    try:
+        user_id = int(daten['user_id'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('Ungültige user_id') from None
+    try:
+        produkt = produkt_aus_anfrage(conn, daten)
+        preis = preis_aus_anfrage(daten, produkt) if produkt is not None else None
+    except (TypeError, ValueError):
+        raise ValueError('Ungültiges Produkt oder ungültiger Preis') from None
+    if produkt is None:
+        raise ValueError('Unbekanntes Produkt')
+    return user_id, produkt, preis
+
+def parse_zeitstempel(wert):
+    # Zeitpunkt der Offline-Buchung vom Kiosk (UTC, 'YYYY-MM-DD HH:MM:SS'), sonst Serverzeit
+    try:
+        return datetime.strptime(wert, '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d %H:%M:%S')
+    except (TypeError, ValueError):
+        return None
 
-@app.route('/api/book', methods=['POST'])
+@kaffee.route('/api/book', methods=['POST'])
 def api_book():
-    data = request.get_json()
-    user_id = data.get('user_id')
-    produkt = data.get('product', '')
-    preis = float(data.get('price'))
-    
-    kauf_typ = 'KAUF_ENTKOFFEINIERT' if 'entkoffeiniert' in produkt.lower() or 'decaf' in produkt.lower() else 'KAUF_KOFFEIN'
-    
-    conn = get_db()
-    conn.execute("UPDATE users SET saldo = saldo - ? WHERE id = ?", (preis, user_id))
-    conn.execute("INSERT INTO transaktionen (user_id, typ, beschreibung, betrag) VALUES (?, ?, ?, ?)", (user_id, kauf_typ, produkt, -preis))
-    conn.commit()
-    new_saldo = conn.execute("SELECT saldo FROM users WHERE id = ?", (user_id,)).fetchone()[0]
-    conn.close()
+    try:
+        user_id, produkt, preis = buchung_aus_anfrage(get_db(), request.get_json())
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    try:
+        new_saldo = buchungen.buchen(user_id, produkt, preis)
+    except UnbekannterUser:
+        return jsonify({'status': 'error', 'message': 'Unbekannter User'}), 404
+    nach_buchung(user_id, preis, new_saldo)
     
     return jsonify({'status': 'success', 'new_saldo': new_saldo})
 
-if __name__ == "__main__":
+def nach_buchung(user_id, preis, new_saldo):
+    karten_cache.saldo_anpassen(int(user_id), -preis)
+    auswertungen.invalidieren(*SALDO_ANSICHTEN)
+    hub.saldo(int(user_id), new_saldo)
+    hub.markieren('stats', 'finanzen')
+
+@kaffee.route('/api/book_bulk', methods=['POST'])
+def api_book_bulk():
+    data = request.get_json(silent=True) or {}
+    ergebnisse, auftraege, positionen = bulk_vorbereiten(get_db(), data)
+    return jsonify(bulk_abschliessen(ergebnisse, auftraege, positionen, buchungen.buchen_viele(auftraege)))
+
+def bulk_vorbereiten(conn, data):
+    # Nachgereichte Buchungen aus der Offline-Queue der Kiosks. Jede Buchung trägt
+    # einen Idempotenz-Schlüssel 'id' und wird genau einmal angewendet.
+    ergebnisse, auftraege, positionen = [], [], []
+    buchungen_liste = data.get('buchungen') if isinstance(data, dict) else None
+    for b in buchungen_liste if isinstance(buchungen_liste, list) else []:
+        try:
+            produkt = produkt_aus_anfrage(conn, b)
+            if produkt is None:
+                raise ValueError("unbekanntes Produkt")
+            auftraege.append({
+                'user_id': int(b['user_id']),
+                'produkt': produkt,
+                'preis': preis_aus_anfrage(b, produkt),
+                'schluessel': str(b['id']),
+                'zeitstempel': parse_zeitstempel(b.get('zeit')),
+            })
+            positionen.append(len(ergebnisse))
+            ergebnisse.append({'id': b['id']})
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            ergebnisse.append({'id': b.get('id') if isinstance(b, dict) else None, 'status': 'fehler', 'message': f"Ungültige Buchung: {e}"})
+    return ergebnisse, auftraege, positionen
+
+def bulk_abschliessen(ergebnisse, auftraege, positionen, gebucht):
+    for position, auftrag, ergebnis in zip(positionen, auftraege, gebucht):
+        ergebnisse[position].update(ergebnis)
+        if ergebnis['status'] == 'ok':
+            karten_cache.saldo_anpassen(auftrag['user_id'], -auftrag['preis'])
+            hub.saldo(auftrag['user_id'], ergebnis['new_saldo'])
+    if auftraege:
+        auswertungen.invalidieren(*SALDO_ANSICHTEN)
+        hub.markieren('stats', 'finanzen')
+    return {'status': 'success', 'ergebnisse': ergebnisse}
+
+# --- KIOSK-API IM ASYNCIO-SERVER (siehe kiosk_api.py) ---
+# Dieselben Routen wie oben, gestartet nur mit API_ASYNC_PORT. DB-Zugriffe laufen
+# im DB-Thread des Servers, Buchungen über die BuchungsEngine ohne blockierten Thread.
+kiosk_server = kiosk_api.KioskApi(messung)
+
+@kiosk_server.route('GET', '/api/check_card/<uid>')
+async def async_check_card(anfrage, uid):
+    clean_uid = normalisiere_uid(uid) or ''
+    eintrag, generation = karten_cache.hole(clean_uid)
+    if eintrag is None:
+        eintrag = await kiosk_server.db.ausfuehren(karte_nachschlagen, clean_uid, generation)
+    return karten_antwort(eintrag, clean_uid)
+
+@kiosk_server.route('GET', '/api/cards')
+async def async_cards(anfrage):
+    return await kiosk_server.db.ausfuehren(karten_liste)
+
+@kiosk_server.route('GET', '/api/produkte')
+async def async_produkte(anfrage):
+    return await kiosk_server.db.ausfuehren(produkt_liste)
+
+@kiosk_server.route('GET', '/api/health')
+async def async_health(anfrage):
+    return await kiosk_server.db.ausfuehren(gesundheit)
+
+@kiosk_server.route('POST', '/api/book')
+async def async_book(anfrage):
+    try:
+        user_id, produkt, preis = await kiosk_server.db.ausfuehren(buchung_aus_anfrage, anfrage.json())
+    except ValueError as e:
+        return {'status': 'error', 'message': str(e)}, 400
+    try:
+        new_saldo = await buchungen.buchen_async(user_id, produkt, preis)
+    except UnbekannterUser:
+        return {'status': 'error', 'message': 'Unbekannter User'}, 404
+    nach_buchung(user_id, preis, new_saldo)
+    return {'status': 'success', 'new_saldo': new_saldo}
+
+@kiosk_server.route('POST', '/api/book_bulk')
+async def async_book_bulk(anfrage):
+    data = anfrage.json(silent=True) or {}
+    ergebnisse, auftraege, positionen = await kiosk_server.db.ausfuehren(bulk_vorbereiten, data)
+    return bulk_abschliessen(ergebnisse, auftraege, positionen, await buchungen.buchen_viele_async(auftraege))
+
+def create_app(konfiguration=None):
+    """Baut die App: Standardwerte, dann KAFFEE_*-Umgebungsvariablen, dann konfiguration."""
+    app = Flask(__name__)
+    app.config.from_mapping(STANDARD_KONFIGURATION)
+    app.config.from_prefixed_env('KAFFEE')
+    app.config.from_mapping(konfiguration or {})
+
+    # Die Dienste oben sind pro Prozess einmal da und bekommen hier ihre Einstellungen
+    db.DB_NAME = app.config['DB']
+    messung.profil_ms = float(app.config['PROFIL_MS']) if app.config['PROFIL_MS'] is not None else None
+    messung.profil_verzeichnis = app.config['PROFIL_DIR']
+    kontenpflege.intervall = float(app.config['KONTENPFLEGE_S'])
+    archiv.VERZEICHNIS = app.config['ARCHIV_DIR']
+    archivierung.db_pfad, archivierung.monate = app.config['DB'], app.config['ARCHIV_MONATE']
+    archivierung.intervall = float(app.config['ARCHIV_S'])
+    hub.auth = lambda cookie_header: sse_user(app, cookie_header)
+    hub.app_port, hub.origins = int(app.config['PORT']), set(app.config['SSE_ORIGINS'])
+    snapshot_versand.pfad = app.config['SNAPSHOT_PFAD'] or app.config['DB'] + '.snapshot'
+    snapshot_versand.intervall = snapshot_abruf.intervall = float(app.config['SNAPSHOT_S'])
+    snapshot_abruf.quelle, snapshot_abruf.token = app.config['SCHREIBER_URL'], app.config['REPLIKAT_TOKEN']
+    snapshot_abruf.ziel = app.config['DB']
+    db.NUR_LESEN = app.config['ROLLE'] == 'replikat'
+    kiosk_server.schreiber_url = app.config['SCHREIBER_URL'] if db.NUR_LESEN else None
+
+    # Messung zuerst: auch weitergeleitete Requests zählen
+    app.before_request(messung_starten)
+    if db.NUR_LESEN:
+        app.before_request(replikat_weiterleiten)
+    app.teardown_appcontext(db_aufraeumen)
+    # after_request-Hooks laufen in umgekehrter Reihenfolge: Status nach der Komprimierung
+    app.after_request(messung_status)
+    app.after_request(seiten.komprimierung)
+    app.teardown_request(messung_beenden)
+    app.context_processor(sse_kontext)
+    login_manager.init_app(app)
+    app.register_blueprint(kaffee)
+    app.register_blueprint(webserver.status)
+    return app
+
+def starten(app):
+    """Server mit allen Hintergrund-Diensten. Waitress wird erst hier geladen."""
     from waitress import serve
-    print("Server startet auf Port 5000... ")
-    serve(app, host='0.0.0.0', port=5000)
+    if app.config['ROLLE'] == 'replikat':
+        # Ohne lokale Kopie erst den ersten Snapshot abwarten; danach läuft der Abruf im Hintergrund
+        try:
+            snapshot_abruf.abrufen()
+        except Exception as e:
+            if not os.path.exists(app.config['DB']):
+                raise SystemExit(f"Kein Snapshot vom Schreiber {app.config['SCHREIBER_URL']}: {e}")
+            print(f"Schreiber nicht erreichbar ({e}), starte mit vorhandener Kopie")
+        snapshot_abruf.start()
+    else:
+        get_db()  # Migrationen einmal beim Start statt beim ersten Request
+        migrationen.Nachlauf(db.verbinden).start()
+        kontenpflege.start()
+        if app.config['ARCHIV_MONATE'] is not None:
+            archivierung.start()
+        if app.config['REPLIKAT_TOKEN']:
+            snapshot_versand.start()
+    hub.starten(port=app.config['SSE_PORT'])
+    print(f"Live-Updates (SSE) auf Port {hub.port}")
+    if app.config['API_ASYNC_PORT'] is not None:
+        kiosk_server.starten(host=app.config['HOST'], port=int(app.config['API_ASYNC_PORT']))
+        print(f"Kiosk-API (asyncio) auf Port {kiosk_server.port}")
+    print(f"Server startet auf Port {app.config['PORT']}... ")
+    serve(app, host=app.config['HOST'], port=app.config['PORT'], threads=app.config['THREADS'])
+
+if __name__ == "__main__":
+    starten(create_app())
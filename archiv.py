@@ -0,0 +1,338 @@
+import argparse
+import os
+import pathlib
+import re
+import sqlite3
+import threading
+import time
+from datetime import date
+
+import konten
+
+# --- ARCHIV: ABGESCHLOSSENE MONATE IN JAHRES-DATEIEN ---
+# transaktionen wächst ohne Ende. archivieren() verschiebt Buchungen aus
+# Monaten, die länger als ARCHIV_MONATE zurückliegen, in eine Archiv-DB pro
+# Jahr (kaffee_archiv_2024.db neben kaffee.db). db.verbinden() hängt alle
+# vorhandenen Archive per ATTACH als Schema archiv_<jahr> an; History, Export,
+# Statistik und der volle Kontenabgleich lesen über quellen() aus Hot-DB und
+# Archiven, die heißen Abfragen (Dashboard, erste History-Seiten, Saldo ab dem
+# letzten Stand) bleiben in der kleinen Hot-DB.
+#
+# Archiviert wird nur, was schon in einem Saldo-Stand steckt (siehe konten.py):
+# Saldo = letzter Stand + Buchungen danach braucht so nie das Archiv.
+#
+# Verschieben in zwei Schritten pro Block, nie in einer Transaktion über beide
+# Dateien (im WAL-Modus ist die nicht über Dateigrenzen atomar):
+#   1. kopieren   INSERT OR IGNORE ins Archiv, Commit
+#   2. löschen    DELETE in der Hot-DB, nur Zeilen, die im Archiv stehen
+# Bricht es dazwischen ab, steht ein Block kurz in beiden Dateien; Leser
+# blenden solche Archivzeilen aus (NUR_ARCHIV) und der nächste Lauf löscht sie.
+# Der Append-only-Trigger erlaubt das DELETE nur, solange archiv_freigabe
+# eine Zeile enthält – das tut sie nur innerhalb von Schritt 2.
+#
+# Ein neues Archivjahr sehen andere Verbindungen erst nach einem Neuverbinden:
+# im Server ruft der Thread Archivierung dafür db.neu_verbinden() auf. Wer von
+# Hand archiviert, während ein Server läuft, startet ihn danach neu.
+# Replikate hängen Archive aus ihrem ARCHIV_DIR nur lesend an; die Snapshots
+# (replikation.py) enthalten nur die Hot-DB. Die Archivdateien müssen dort
+# also von Hand (oder per gemeinsamem Verzeichnis) hin. Welche Jahre es gibt,
+# steht in settings 'archiv_jahre'; fehlt davon eines, bricht quellen() mit
+# FehlendesArchiv ab, statt still alte Buchungen wegzulassen.
+
+BLOCK = 2000
+# Von create_app() gesetzt; None = neben der Datenbank
+VERZEICHNIS = None
+
+SCHEMA = re.compile(r'archiv_(\d{4})')
+# Archivzeile, die (nach einem abgebrochenen Lauf) noch in der Hot-DB steht, zählt dort
+NUR_ARCHIV = "NOT EXISTS (SELECT 1 FROM main.transaktionen h WHERE h.id = t.id)"
+# Vor der Grenze und schon im letzten Saldo-Stand des Users (Warnungen ohne User immer)
+ARCHIVIERBAR = '''t.zeitstempel < :grenze AND (t.user_id IS NULL OR t.id <= (
+                      SELECT MAX(s.transaktion_id) FROM saldo_stand s WHERE s.user_id = t.user_id))'''
+# Indizes im Archiv: History/Export (Zeit, User), Export mit Typ-Filter
+ARCHIV_INDIZES = {
+    'idx_transaktionen_zeit': '(zeitstempel)',
+    'idx_transaktionen_user_zeit': '(user_id, zeitstempel)',
+    'idx_transaktionen_typ_zeit': '(typ, zeitstempel)',
+}
+
+
+class FehlendesArchiv(RuntimeError):
+    pass
+
+
+def init_tabellen(conn):
+    """Freigabe-Tabelle für archivieren(); das Löschen bleibt sonst gesperrt."""
+    conn.execute("CREATE TABLE IF NOT EXISTS archiv_freigabe (aktiv INTEGER)")
+    conn.execute("DROP TRIGGER IF EXISTS transaktionen_nur_anhaengen_delete")
+    conn.execute('''CREATE TRIGGER transaktionen_nur_anhaengen_delete
+                    BEFORE DELETE ON transaktionen
+                    WHEN NOT EXISTS (SELECT 1 FROM archiv_freigabe)
+                    BEGIN SELECT RAISE(ABORT, 'transaktionen ist append-only – Korrekturen als neue Buchung'); END''')
+
+
+def schema(jahr):
+    return f"archiv_{int(jahr)}"
+
+
+def dateien(db_pfad, verzeichnis=None):
+    """{jahr: pfad} aller Archive zu db_pfad (in verzeichnis, sonst VERZEICHNIS bzw. neben der DB)."""
+    stamm = os.path.splitext(os.path.basename(db_pfad))[0]
+    verzeichnis = verzeichnis or VERZEICHNIS or os.path.dirname(os.path.abspath(db_pfad))
+    if not os.path.isdir(verzeichnis):
+        return {}
+    muster = re.compile(re.escape(stamm) + r'_archiv_(\d{4})\.db')
+    return {int(m.group(1)): os.path.join(verzeichnis, name)
+            for name in os.listdir(verzeichnis) if (m := muster.fullmatch(name))}
+
+
+def datei(db_pfad, jahr):
+    stamm = os.path.splitext(os.path.basename(db_pfad))[0]
+    return os.path.join(VERZEICHNIS or os.path.dirname(os.path.abspath(db_pfad)), f"{stamm}_archiv_{int(jahr)}.db")
+
+
+def anhaengen(conn, db_pfad, nur_lesen=False, verzeichnis=None):
+    """Hängt alle vorhandenen Archive an conn an (aus db.verbinden)."""
+    # SQLite erlaubt nur SQLITE_LIMIT_ATTACHED (meist 10) angehängte DBs; archivieren() legt nicht mehr Jahre an
+    for jahr, pfad in sorted(dateien(db_pfad, verzeichnis).items())[-conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED):]:
+        ziel = pathlib.Path(pfad).as_uri() + '?mode=ro' if nur_lesen else pfad
+        conn.execute(f"ATTACH DATABASE ? AS {schema(jahr)}", (ziel,))
+
+
+def angehaengte_jahre(conn):
+    return {int(m.group(1)) for z in conn.execute("PRAGMA database_list") if (m := SCHEMA.fullmatch(z[1]))}
+
+
+def quellen(conn, absteigend=False, pruefen=True):
+    """[(schema, jahr, bedingungen)]: zuerst die Hot-DB (jahr None), dann die angehängten Archive nach Jahr.
+
+    Abfragen lesen '{schema}.transaktionen t' und hängen bedingungen an ihr WHERE an.
+    Fehlt ein Archiv aus archiv_jahre, gibt es FehlendesArchiv (mit pruefen=False nicht).
+    """
+    jahre = angehaengte_jahre(conn)
+    fehlen = erwartete_jahre(conn) - jahre if pruefen else None
+    if fehlen:
+        raise FehlendesArchiv(f"Archiv {', '.join(map(str, sorted(fehlen)))} nicht angehängt – Buchungen vor "
+                              f"{archiviert_bis(conn)} wären unvollständig (Archivdateien in ARCHIV_DIR prüfen)")
+    return [('main', None, [])] + [(schema(jahr), jahr, [NUR_ARCHIV]) for jahr in sorted(jahre, reverse=absteigend)]
+
+
+def archiviert_bis(conn):
+    """Zeitstempel, vor dem Buchungen im Archiv liegen können; alles ab da steht nur in der Hot-DB. None = nie archiviert."""
+    zeile = conn.execute("SELECT value FROM settings WHERE key = 'archiv_bis'").fetchone()
+    return zeile[0] if zeile else None
+
+
+def erwartete_jahre(conn):
+    """Jahre, für die archivieren() ein Archiv angelegt hat."""
+    zeile = conn.execute("SELECT value FROM settings WHERE key = 'archiv_jahre'").fetchone()
+    return {int(jahr) for jahr in zeile[0].split(',') if jahr} if zeile else set()
+
+
+def _jahre_eintragen(conn, jahre):
+    jahre = erwartete_jahre(conn) | set(jahre)
+    conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('archiv_jahre', ?)", (",".join(map(str, sorted(jahre))),))
+    conn.commit()
+
+
+def jahr_moeglich(jahr, von=None, bis=None):
+    """False, wenn das Archiv eines Jahres keine Buchung zwischen von und bis (Zeitstempel-Text) enthalten kann."""
+    if jahr is None:
+        return True
+    return not ((von and von >= f"{jahr + 1}") or (bis and bis < f"{jahr}"))
+
+
+def grenze(heute, monate):
+    """Erster Tag des Monats, ab dem nichts archiviert wird: aktueller Monat minus monate."""
+    monat = heute.year * 12 + heute.month - 1 - monate
+    return f"{monat // 12:04d}-{monat % 12 + 1:02d}-01"
+
+
+def _archiv_vorbereiten(conn, db_pfad, jahr):
+    """Hängt das Archiv eines Jahres an (legt es bei Bedarf an) und gleicht die Spalten an. Gibt (spalten, neu) zurück."""
+    name = schema(jahr)
+    angehaengt = {z[1] for z in conn.execute("PRAGMA database_list")}
+    neu = False
+    if name not in angehaengt:
+        pfad = datei(db_pfad, jahr)
+        neu = not os.path.exists(pfad)
+        if neu and sum(1 for n in angehaengt if SCHEMA.fullmatch(n)) >= conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED):
+            raise RuntimeError(f"Zu viele Archivjahre für ATTACH, {pfad} wird nicht angelegt")
+        conn.execute(f"ATTACH DATABASE ? AS {name}", (pfad,))
+    spalten = conn.execute("PRAGMA main.table_info(transaktionen)").fetchall()
+    conn.execute("BEGIN")
+    try:
+        # Spalten wie in der Hot-DB; eine Migration, die transaktionen erweitert, kommt so beim nächsten Lauf mit
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {name}.transaktionen (id INTEGER PRIMARY KEY)")
+        vorhanden = {z['name'] for z in conn.execute(f"PRAGMA {name}.table_info(transaktionen)")}
+        for spalte in spalten:
+            if spalte['name'] not in vorhanden:
+                conn.execute(f"ALTER TABLE {name}.transaktionen ADD COLUMN {spalte['name']} {spalte['type']}")
+        for index, felder in ARCHIV_INDIZES.items():
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name}.{index} ON transaktionen {felder}")
+        # Archive ändern sich nur durch archivieren(), und das hängt nur an
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {name}.archiv_unveraenderlich_update BEFORE UPDATE ON transaktionen
+                         BEGIN SELECT RAISE(ABORT, 'Archiv ist unveränderlich'); END''')
+        conn.execute(f'''CREATE TRIGGER IF NOT EXISTS {name}.archiv_unveraenderlich_delete BEFORE DELETE ON transaktionen
+                         BEGIN SELECT RAISE(ABORT, 'Archiv ist unveränderlich'); END''')
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return [s['name'] for s in spalten], neu
+
+
+def archivieren(conn, db_pfad, monate, heute=None, block=BLOCK, bei_neuer_datei=None):
+    """Verschiebt alle archivierbaren Buchungen vor grenze() in die Jahresarchive. Gibt {jahr: zeilen} zurück.
+
+    bei_neuer_datei() wird nach dem Anlegen eines neuen Archivjahres aufgerufen (andere Verbindungen neu verbinden).
+    """
+    parameter = {'grenze': grenze(heute or date.today(), monate)}
+    # Aktuelle Stände zuerst, damit alles vor der Grenze archivierbar ist
+    konten.stand_schreiben(conn)
+    von, bis = conn.execute("SELECT MIN(id), MAX(id) FROM main.transaktionen WHERE zeitstempel < :grenze", parameter).fetchone()
+    verschoben, spalten = {}, {}
+    if von is None:
+        return verschoben
+    # Archive, die schon da sind, gehören auf jeden Fall dazu
+    if not angehaengte_jahre(conn) <= erwartete_jahre(conn):
+        _jahre_eintragen(conn, angehaengte_jahre(conn))
+    # Vor dem ersten Verschieben: Leser (transaktionen.seite) fragen Archive nur für Zeilen vor archiv_bis
+    if (archiviert_bis(conn) or '') < parameter['grenze']:
+        conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('archiv_bis', :grenze)", parameter)
+        conn.commit()
+    for start in range(von, bis + 1, block):
+        bereich = dict(parameter, von=start, bis=min(start + block - 1, bis))
+        jahre = [int(z[0]) for z in conn.execute(f'''SELECT DISTINCT strftime('%Y', t.zeitstempel) FROM main.transaktionen t
+                                                     WHERE t.id BETWEEN :von AND :bis AND {ARCHIVIERBAR}''', bereich)]
+        for jahr in jahre:
+            if jahr not in spalten:
+                spalten[jahr], neu = _archiv_vorbereiten(conn, db_pfad, jahr)
+                # Vor der ersten Kopie: ab jetzt vermissen Leser das Jahr, wenn seine Datei fehlt
+                if jahr not in erwartete_jahre(conn):
+                    _jahre_eintragen(conn, [jahr])
+                if neu and bei_neuer_datei:
+                    bei_neuer_datei()
+            liste = ", ".join(spalten[jahr])
+            name = schema(jahr)
+            # 1. kopieren: schreibt nur ins Archiv, Buchungen laufen weiter
+            conn.execute("BEGIN")
+            try:
+                conn.execute(f'''INSERT OR IGNORE INTO {name}.transaktionen ({liste})
+                                 SELECT {liste} FROM main.transaktionen t
+                                 WHERE t.id BETWEEN :von AND :bis AND strftime('%Y', t.zeitstempel) = :jahr AND {ARCHIVIERBAR}''',
+                             dict(bereich, jahr=f"{jahr:04d}"))
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            # 2. löschen: nur was jetzt sicher im Archiv steht
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("INSERT INTO archiv_freigabe (aktiv) VALUES (1)")
+                cur = conn.execute(f'''DELETE FROM main.transaktionen WHERE id BETWEEN :von AND :bis
+                                       AND id IN (SELECT id FROM {name}.transaktionen WHERE id BETWEEN :von AND :bis)''', bereich)
+                conn.execute("DELETE FROM archiv_freigabe")
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            if cur.rowcount:
+                verschoben[jahr] = verschoben.get(jahr, 0) + cur.rowcount
+    return verschoben
+
+
+def abgleichen(conn):
+    """Wie konten.abgleichen(), aber über das ganze Ledger in Hot-DB und Archiven statt ab dem letzten Stand."""
+    summen = {}
+    eigene_transaktion = not conn.in_transaction
+    if eigene_transaktion:
+        conn.execute("BEGIN")
+    try:
+        for name, _, bedingungen in quellen(conn):
+            where = f"WHERE {' AND '.join(bedingungen)}" if bedingungen else ""
+            for user_id, summe in conn.execute(f"SELECT t.user_id, SUM(t.betrag) FROM {name}.transaktionen t {where} GROUP BY t.user_id"):
+                summen[user_id] = summen.get(user_id, 0.0) + summe
+        users = conn.execute("SELECT id, name, saldo FROM users").fetchall()
+    finally:
+        if eigene_transaktion:
+            conn.rollback()
+    return [{'user_id': uid, 'name': name, 'saldo': saldo, 'ledger': round(summen.get(uid, 0.0), 2),
+             'differenz': round(saldo - summen.get(uid, 0.0), 2)}
+            for uid, name, saldo in users if abs(saldo - summen.get(uid, 0.0)) > konten.TOLERANZ]
+
+
+def groessen(conn):
+    """[{'schema', 'datei', 'bytes', 'belegt', 'zeilen'}] für Hot-DB und Archive; belegt ohne freie Seiten."""
+    dateipfade = {z[1]: z[2] for z in conn.execute("PRAGMA database_list")}
+    ergebnis = []
+    for name, _, _ in quellen(conn, pruefen=False):
+        seite = conn.execute(f"PRAGMA {name}.page_size").fetchone()[0]
+        seiten = conn.execute(f"PRAGMA {name}.page_count").fetchone()[0]
+        frei = conn.execute(f"PRAGMA {name}.freelist_count").fetchone()[0]
+        ergebnis.append({'schema': name, 'datei': dateipfade[name], 'bytes': seite * seiten, 'belegt': seite * (seiten - frei),
+                         'zeilen': conn.execute(f"SELECT COUNT(*) FROM {name}.transaktionen").fetchone()[0]})
+    return ergebnis
+
+
+class Archivierung(threading.Thread):
+    """Verschiebt im Hintergrund regelmäßig abgeschlossene Monate ins Archiv."""
+
+    def __init__(self, verbinden, db_pfad=None, monate=6, intervall=86400.0, bei_neuer_datei=None):
+        super().__init__(daemon=True, name='archivierung')
+        self.verbinden = verbinden
+        self.db_pfad = db_pfad
+        self.monate = monate
+        self.intervall = intervall
+        self.bei_neuer_datei = bei_neuer_datei
+        self.ergebnis = None    # {'zeit', 'verschoben'} des letzten Laufs
+
+    def run(self):
+        conn = self.verbinden()
+        while True:
+            try:
+                verschoben = archivieren(conn, self.db_pfad, self.monate, bei_neuer_datei=self.bei_neuer_datei)
+                self.ergebnis = {'zeit': time.strftime('%Y-%m-%d %H:%M:%S'), 'verschoben': verschoben}
+                for jahr, zeilen in sorted(verschoben.items()):
+                    print(f"Archiv {jahr}: {zeilen} Buchungen verschoben")
+            except Exception as e:
+                print(f"Archivierung fehlgeschlagen: {e}")
+            time.sleep(self.intervall)
+
+
+if __name__ == '__main__':
+    import db
+
+    parser = argparse.ArgumentParser(description="Alte Buchungen in Jahresarchive verschieben, Größen anzeigen, Ledger prüfen.")
+    parser.add_argument('befehl', choices=['archivieren', 'status', 'pruefen'])
+    parser.add_argument('--db', default=db.DB_NAME)
+    parser.add_argument('--verzeichnis', default=None, help="Ort der Archive (Standard: neben der DB)")
+    parser.add_argument('--monate', type=int, default=6, help="so viele abgeschlossene Monate bleiben in der Hot-DB")
+    parser.add_argument('--vacuum', action='store_true', help="Hot-DB danach verkleinern (sperrt sie kurz ganz)")
+    args = parser.parse_args()
+
+    VERZEICHNIS = args.verzeichnis
+    conn = db.verbinden(args.db, archiv_verzeichnis=args.verzeichnis)
+    db.init_schema(conn)
+    if args.befehl == 'archivieren':
+        verschoben = archivieren(conn, args.db, args.monate)
+        for jahr, zeilen in sorted(verschoben.items()):
+            print(f"✅ Archiv {jahr}: {zeilen} Buchungen verschoben")
+        if not verschoben:
+            print(f"Nichts zu archivieren vor {grenze(date.today(), args.monate)}.")
+        if args.vacuum:
+            conn.execute("VACUUM main")
+        print("Läuft ein Server, sieht er neue Archivjahre erst nach einem Neustart.")
+    if args.befehl in ('archivieren', 'status'):
+        for g in groessen(conn):
+            print(f"{g['schema']:<14}{g['zeilen']:>10} Zeilen {g['belegt'] / 1e6:>9.2f} MB belegt {g['bytes'] / 1e6:>9.2f} MB Datei  {g['datei']}")
+        for jahr in sorted(erwartete_jahre(conn) - angehaengte_jahre(conn)):
+            print(f"❌ Archiv {jahr} fehlt: {datei(args.db, jahr)}")
+    if args.befehl == 'pruefen':
+        abweichungen = abgleichen(conn)
+        for a in abweichungen:
+            print(f"❌ {a['name']} (ID {a['user_id']}): users.saldo {a['saldo']:.2f} €, Ledger {a['ledger']:.2f} € (Differenz {a['differenz']:+.2f} €)")
+        if abweichungen:
+            raise SystemExit(1)
+        print("✅ Alle Salden stimmen mit dem ganzen Ledger (Hot-DB und Archive) überein.")
+    conn.close()
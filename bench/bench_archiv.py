@@ -0,0 +1,118 @@
+"""Größe der Hot-DB und Latenz der heißen Abfragen mit und ohne Archiv (archiv.py).
+
+Legt für jede Historienlänge eine frische DB mit MONATE Monaten Buchungen an
+(PRO_MONAT je Monat, gleichmäßig auf USER verteilt) und misst einmal alles in
+der Hot-DB und einmal nach archiv.archivieren() mit --behalten Monaten:
+
+  dashboard   letzte 10 Buchungen eines Users (ledger.seite mit user_id)
+  history     erste History-Seite (50 Buchungen)
+  blaettern   10. History-Seite per Cursor
+  saldo       konten.kontostand (letzter Stand + Buchungen danach)
+  export      ganzes Ledger über ledger.alle (Hot-DB + Archive), Zeilen/s
+
+    python bench/bench_archiv.py --monate 12 36 96 --pro-monat 5000
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BASE_DIR)
+
+import archiv  # noqa: E402
+import db  # noqa: E402
+import konten  # noqa: E402
+import transaktionen as ledger  # noqa: E402
+
+
+def zeit_ms(funktion, wiederholungen=50):
+    zeiten = []
+    for _ in range(wiederholungen):
+        start = time.perf_counter()
+        funktion()
+        zeiten.append(time.perf_counter() - start)
+    return statistics.median(zeiten) * 1000
+
+
+def anlegen(pfad, monate, pro_monat, user):
+    conn = db.verbinden(pfad)
+    db.init_schema(conn)
+    conn.executemany("INSERT INTO users (name) VALUES (?)", ((f"User {i}",) for i in range(user)))
+    produkt_id = conn.execute("SELECT id FROM produkte WHERE sorte = 'Koffein'").fetchone()[0]
+    zufall = random.Random(monate)
+    heute = date.today()
+    erster = date(heute.year, heute.month, 1)
+    for m in range(monate, -1, -1):
+        jahr, monat = divmod(erster.year * 12 + erster.month - 1 - m, 12)
+        anfang = date(jahr, monat + 1, 1)
+        tage = min(28, (heute - anfang).days + 1)
+        sekunden = sorted(zufall.randrange(tage * 86400) for _ in range(pro_monat))
+        conn.executemany('''INSERT INTO transaktionen (user_id, typ, beschreibung, betrag, produkt_id, zeitstempel)
+                            VALUES (?, 'KAUF_KOFFEIN', 'Kaffee mit Koffein', -0.4, ?, datetime(?, '+' || ? || ' seconds'))''',
+                         ((zufall.randint(1, user), produkt_id, anfang.isoformat(), s) for s in sekunden))
+    conn.execute("UPDATE users SET saldo = (SELECT COALESCE(SUM(betrag), 0) FROM transaktionen t WHERE t.user_id = users.id)")
+    conn.commit()
+    konten.stand_schreiben(conn)
+    conn.close()
+
+
+def messen(pfad, user):
+    conn = db.verbinden(pfad)
+    user_id = user // 2
+    _, cursor = ledger.seite(conn, 50)
+    for _ in range(8):
+        _, cursor = ledger.seite(conn, 50, cursor)
+    start = time.perf_counter()
+    zeilen = sum(1 for _ in ledger.alle(conn))
+    export_s = time.perf_counter() - start
+    groessen = archiv.groessen(conn)
+    ergebnis = {
+        'hot_mb': groessen[0]['belegt'] / 1e6,
+        'hot_zeilen': groessen[0]['zeilen'],
+        'archiv_mb': sum(g['bytes'] for g in groessen[1:]) / 1e6,
+        'dashboard_ms': zeit_ms(lambda: ledger.seite(conn, 10, user_id=user_id)),
+        'history_ms': zeit_ms(lambda: ledger.seite(conn, 50)),
+        'blaettern_ms': zeit_ms(lambda: ledger.seite(conn, 50, cursor)),
+        'saldo_ms': zeit_ms(lambda: konten.kontostand(conn, user_id)),
+        'export_rps': zeilen / export_s,
+    }
+    conn.close()
+    return ergebnis
+
+
+def zeile(monate, art, m):
+    print(f"{monate:>7} {art:<6}{m['hot_zeilen']:>10}{m['hot_mb']:>8.1f}MB{m['archiv_mb']:>8.1f}MB"
+          f"{m['dashboard_ms']:>9.2f}ms{m['history_ms']:>8.2f}ms{m['blaettern_ms']:>8.2f}ms{m['saldo_ms']:>8.3f}ms"
+          f"{m['export_rps']:>11.0f}/s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--monate', type=int, nargs='+', default=[12, 36, 96])
+    parser.add_argument('--pro-monat', type=int, default=5000)
+    parser.add_argument('--user', type=int, default=200)
+    parser.add_argument('--behalten', type=int, default=6)
+    args = parser.parse_args()
+
+    print(f"{'Monate':>7} {'':<6}{'Hot-Zeilen':>10}{'Hot':>10}{'Archiv':>10}{'Dashboard':>11}{'History':>10}"
+          f"{'Seite 10':>10}{'Saldo':>10}{'Export':>13}")
+    for monate in args.monate:
+        verzeichnis = tempfile.mkdtemp(prefix='kaffee_archiv_')
+        try:
+            pfad = os.path.join(verzeichnis, 'kaffee.db')
+            anlegen(pfad, monate, args.pro_monat, args.user)
+            zeile(monate, 'ohne', messen(pfad, args.user))
+            conn = db.verbinden(pfad)
+            archiv.archivieren(conn, pfad, args.behalten)
+            # Freie Seiten füllen sich mit neuen Buchungen; für die Messung gleich verkleinern
+            conn.execute("VACUUM main")
+            conn.close()
+            zeile(monate, 'mit', messen(pfad, args.user))
+        finally:
+            shutil.rmtree(verzeichnis)
@@ -0,0 +1,167 @@
+"""Kiosk-API unter Waitress gegen den asyncio-Server (kiosk_api.py).
+
+Startet für jede Messung frisch `python app.py` auf einer Kopie von kaffee.db
+mit API_ASYNC_PORT (so bremst kein Rückstau der vorigen Messung) und misst
+abwechselnd über den Waitress-Port und den asyncio-Port:
+
+  leerlauf  LEERLAUF Keep-Alive-Verbindungen stellen je eine Anfrage und
+            bleiben dann offen (wie ruhende Kiosks); wie viele davon werden
+            binnen 2 s bedient? Danach scannen AKTIVE Clients /api/check_card.
+  buchen    AKTIVE Clients buchen gleichzeitig per POST /api/book.
+
+    python bench/bench_async.py --leerlauf 1000 --aktive 32 --dauer 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+TIMEOUT_S = 5
+
+
+def freier_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def server_starten(db_pfad, port, async_port):
+    env = dict(os.environ, KAFFEE_DB=db_pfad, KAFFEE_HOST='"127.0.0.1"', KAFFEE_PORT=str(port),
+               KAFFEE_SSE_PORT=str(freier_port()), KAFFEE_API_ASYNC_PORT=str(async_port))
+    proc = subprocess.Popen([sys.executable, 'app.py'], cwd=BASE_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for p in (port, async_port):
+        ende = time.perf_counter() + 30
+        while True:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{p}/api/health", timeout=1).close()
+                break
+            except OSError:
+                if time.perf_counter() > ende:
+                    proc.terminate()
+                    raise RuntimeError(f"Server auf Port {p} antwortet nicht")
+                time.sleep(0.05)
+    return proc
+
+
+class Verbindung:
+    """Minimaler HTTP/1.1-Client mit Keep-Alive, damit der Client nicht selbst der Engpass ist."""
+
+    def __init__(self, port):
+        self.port = port
+        self.reader = self.writer = None
+
+    async def oeffnen(self):
+        self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+
+    async def anfrage(self, methode, pfad, daten=None):
+        body = json.dumps(daten).encode() if daten is not None else b''
+        kopf = f"{methode} {pfad} HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Length: {len(body)}\r\n"
+        if daten is not None:
+            kopf += "Content-Type: application/json\r\n"
+        self.writer.write((kopf + "\r\n").encode() + body)
+        await self.writer.drain()
+        antwort = await self.reader.readuntil(b"\r\n\r\n")
+        status = int(antwort.split(b" ", 2)[1])
+        laenge = next(int(z.split(b":", 1)[1]) for z in antwort.split(b"\r\n") if z.lower().startswith(b"content-length:"))
+        await self.reader.readexactly(laenge)
+        return status
+
+    def schliessen(self):
+        if self.writer:
+            self.writer.close()
+
+
+async def last(port, aktive, dauer, methode, pfad, daten=None):
+    zeiten = []
+    fehler = 0
+    stop = time.perf_counter() + dauer
+
+    async def client():
+        nonlocal fehler
+        v = Verbindung(port)
+        try:
+            await asyncio.wait_for(v.oeffnen(), TIMEOUT_S)
+            while time.perf_counter() < stop:
+                start = time.perf_counter()
+                if await asyncio.wait_for(v.anfrage(methode, pfad, daten), TIMEOUT_S) != 200:
+                    fehler += 1
+                zeiten.append(time.perf_counter() - start)
+        except (asyncio.TimeoutError, OSError):
+            fehler += 1     # nicht angenommen oder nicht beantwortet: dieser Client gibt auf
+        finally:
+            v.schliessen()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(aktive)))
+    gesamt = time.perf_counter() - start
+    zeiten = sorted(zeiten) or [float('nan')]
+    return {
+        'rps': len(zeiten) / gesamt,
+        'p50_ms': statistics.median(zeiten) * 1000,
+        'p99_ms': zeiten[int(len(zeiten) * 0.99)] * 1000,
+        'fehler': fehler,
+    }
+
+
+async def leerlauf_messen(port, leerlauf, aktive, dauer):
+    ruhend = [Verbindung(port) for _ in range(leerlauf)]
+
+    async def einmal(v):
+        try:
+            await asyncio.wait_for(v.oeffnen(), 2)
+            return await asyncio.wait_for(v.anfrage('GET', '/api/check_card/123456'), 2) == 200
+        except (asyncio.TimeoutError, OSError):
+            return False
+
+    bedient = sum(await asyncio.gather(*(einmal(v) for v in ruhend)))
+    try:
+        ergebnis = await last(port, aktive, dauer, 'GET', '/api/check_card/123456')
+    finally:
+        for v in ruhend:
+            v.schliessen()
+    return dict(ergebnis, bedient=bedient)
+
+
+def zeile(name, m):
+    bedient = f"{m['bedient']:>9}" if 'bedient' in m else f"{'':>9}"
+    print(f"{name:<22}{bedient}{m['rps']:>10.0f}{m['p50_ms']:>9.1f}ms{m['p99_ms']:>9.1f}ms{m['fehler']:>8}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--leerlauf', type=int, default=1000)
+    parser.add_argument('--aktive', type=int, default=32)
+    parser.add_argument('--dauer', type=float, default=5)
+    args = parser.parse_args()
+
+    verzeichnis = tempfile.mkdtemp(prefix='kaffee_async_')
+    db_pfad = os.path.join(verzeichnis, 'kaffee.db')
+    shutil.copy(os.path.join(BASE_DIR, 'kaffee.db'), db_pfad)
+    buchung = {'user_id': 2, 'product': 'Kaffee mit Koffein', 'price': 0.0}
+    messungen = {
+        'leerlauf': lambda port: leerlauf_messen(port, args.leerlauf, args.aktive, args.dauer),
+        'buchen': lambda port: last(port, args.aktive, args.dauer, 'POST', '/api/book', buchung),
+    }
+    print(f"{'':<22}{'bedient':>9}{'req/s':>10}{'p50':>11}{'p99':>11}{'Fehler':>8}")
+    try:
+        for messung, funktion in messungen.items():
+            for server in ('waitress', 'asyncio'):
+                ports = {'waitress': freier_port(), 'asyncio': freier_port()}
+                proc = server_starten(db_pfad, ports['waitress'], ports['asyncio'])
+                try:
+                    zeile(f"{server} {messung}", asyncio.run(funktion(ports[server])))
+                finally:
+                    proc.terminate()
+                    proc.wait()
+    finally:
+        shutil.rmtree(verzeichnis)
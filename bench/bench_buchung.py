@@ -0,0 +1,74 @@
+"""Buchungen pro Sekunde bei vielen gleichzeitigen Buchern, ohne HTTP.
+
+'einzeln' bucht wie früher api_book (eigene Verbindung pro Thread, ein Commit
+pro Buchung), 'engine' geht über buchung.BuchungsEngine (Group Commit).
+
+    python bench/bench_buchung.py --bucher 50 --dauer 5 [--synchronous FULL]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BASE_DIR)
+
+
+def einzeln_buchen(conn, user_id):
+    import statistik
+    conn.execute("UPDATE users SET saldo = saldo - ? WHERE id = ?", (0.4, user_id))
+    conn.execute("INSERT INTO transaktionen (user_id, typ, beschreibung, betrag, produkt_id) VALUES (?, ?, ?, ?, ?)",
+                 (user_id, 'KAUF_KOFFEIN', 'Kaffee mit Koffein', -0.4, 1))
+    statistik.buche_tasse(conn, 'KAUF_KOFFEIN')
+    conn.commit()
+    return conn.execute("SELECT saldo FROM users WHERE id = ?", (user_id,)).fetchone()[0]
+
+
+def messen(modus, bucher, dauer):
+    import db
+    import produkte
+    from buchung import BuchungsEngine
+    engine = BuchungsEngine()
+    produkt = produkte.alle(db.verbinden())[1]
+    zaehler = [0] * bucher
+    stop = time.perf_counter() + dauer
+
+    def worker(i):
+        conn = db.verbinden() if modus == 'einzeln' else None
+        while time.perf_counter() < stop:
+            if conn is not None:
+                einzeln_buchen(conn, 2)
+            else:
+                engine.buchen(2, produkt, 0.4)
+            zaehler[i] += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(bucher)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(zaehler) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bucher', type=int, default=50)
+    parser.add_argument('--dauer', type=float, default=5.0)
+    parser.add_argument('--synchronous', default='NORMAL', choices=['OFF', 'NORMAL', 'FULL'])
+    args = parser.parse_args()
+
+    from bench_db import test_db_anlegen
+    import db
+    db.DB_NAME = test_db_anlegen(tempfile.mkdtemp(prefix='kaffee_buchung_'))
+    db.PRAGMAS = [p for p in db.PRAGMAS if 'synchronous' not in p] + [f"PRAGMA synchronous = {args.synchronous}"]
+
+    print(f"{args.bucher} gleichzeitige Bucher, synchronous={args.synchronous}")
+    for modus in ('einzeln', 'engine'):
+        print(f"  {modus:<8} {messen(modus, args.bucher, args.dauer):8.1f} Buchungen/s")
+
+
+if __name__ == '__main__':
+    main()
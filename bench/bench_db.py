@@ -0,0 +1,100 @@
+"""Requests pro Sekunde für /api/check_card und /dashboard, vorher/nachher.
+
+'alt' bildet das frühere get_db nach (neue Verbindung + CREATE TABLE + COMMIT
+bei jedem Aufruf), 'neu' nutzt die langlebigen Verbindungen aus db.py.
+
+    python bench/bench_db.py --dauer 5 --threads 4
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BASE_DIR)
+
+
+def test_db_anlegen(verzeichnis):
+    import setup_db
+    alt = os.getcwd()
+    os.chdir(verzeichnis)
+    try:
+        setup_db.init_db()
+    finally:
+        os.chdir(alt)
+    return os.path.join(verzeichnis, setup_db.DB_NAME)
+
+
+def alte_get_db_factory(pfad):
+    import statistik
+
+    def alte_get_db():
+        conn = sqlite3.connect(pfad)
+        conn.row_factory = sqlite3.Row
+        conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+        statistik.init_tabellen(conn)
+        conn.commit()
+        return conn
+    return alte_get_db
+
+
+def messen(app, pfad, threads, dauer, login=False):
+    zaehler = [0] * threads
+    stop = time.perf_counter() + dauer
+
+    def worker(i):
+        client = app.test_client()
+        if login:
+            client.post('/login', data={'name': 'Max Tester', 'password': 'user123'})
+        while time.perf_counter() < stop:
+            resp = client.get(pfad)
+            assert resp.status_code == 200, resp.status_code
+            zaehler[i] += 1
+
+    ts = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    return sum(zaehler) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dauer', type=float, default=5.0, help="Sekunden pro Messung")
+    parser.add_argument('--threads', type=int, default=4, help="gleichzeitige Clients (Waitress-Default: 4)")
+    parser.add_argument('--json', help="Ergebnisse zusätzlich als JSON in diese Datei schreiben")
+    args = parser.parse_args()
+
+    verzeichnis = tempfile.mkdtemp(prefix='kaffee_bench_')
+    os.environ['KAFFEE_DB'] = test_db_anlegen(verzeichnis)
+    import app as app_modul
+    neue_get_db = app_modul.get_db
+    flask_app = app_modul.create_app()
+
+    ergebnisse = {}
+    for modus in ('alt', 'neu'):
+        app_modul.get_db = alte_get_db_factory(os.environ['KAFFEE_DB']) if modus == 'alt' else neue_get_db
+        ergebnisse[modus] = {
+            '/api/check_card': messen(flask_app, '/api/check_card/123456', args.threads, args.dauer),
+            '/dashboard': messen(flask_app, '/dashboard', args.threads, args.dauer, login=True),
+        }
+    app_modul.get_db = neue_get_db
+
+    print(f"{'Route':<20}{'alt req/s':>12}{'neu req/s':>12}{'Faktor':>9}")
+    for route in ergebnisse['alt']:
+        alt, neu = ergebnisse['alt'][route], ergebnisse['neu'][route]
+        print(f"{route:<20}{alt:>12.1f}{neu:>12.1f}{neu / alt:>8.2f}x")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'threads': args.threads, 'dauer': args.dauer, 'req_pro_s': ergebnisse}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
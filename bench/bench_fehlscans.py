@@ -0,0 +1,69 @@
+"""Unbekannte Karten: INSERT + COMMIT pro Scan (alt) gegen FehlscanLog (fehlscans.py).
+
+Zwei Lagen auf einer frischen DB, je SCANS Fehlscans so schnell wie möglich:
+
+  liegt      eine Karte bleibt auf dem Leser liegen (immer dieselbe UID)
+  rauschen   ein wackeliger Leser liefert lauter verschiedene UIDs
+
+Gemessen: Zeit pro Scan (inkl. Schreiben), Commits und geschriebene (neue oder
+erhöhte) Zeilen. 'neu' schreibt alle --intervall Scans einmal (statt alle
+INTERVALL_S Sekunden).
+
+    python bench/bench_fehlscans.py --scans 5000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BASE_DIR)
+
+import db  # noqa: E402
+import fehlscans  # noqa: E402
+
+
+def alt(conn, uids):
+    for uid in uids:
+        conn.execute("INSERT INTO transaktionen (user_id, typ, beschreibung, betrag) VALUES (NULL, 'WARNUNG', ?, 0.0)",
+                     (f"RFID Scan fehlgeschlagen: {uid}",))
+        conn.commit()
+    return len(uids), len(uids)
+
+
+def neu(conn, uids, intervall):
+    log = fehlscans.FehlscanLog(lambda: conn)
+    log._thread = True      # kein Hintergrund-Thread, geschrieben wird hier im Takt
+    commits = zeilen = 0
+    for i, uid in enumerate(uids, 1):
+        log.melden(uid)
+        if i % intervall == 0:
+            zeilen += log.schreiben(conn)
+            commits += 1
+    zeilen += log.schreiben(conn)
+    return commits + 1, zeilen
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scans', type=int, default=5000)
+    parser.add_argument('--intervall', type=int, default=500)
+    args = parser.parse_args()
+
+    lagen = {'liegt': ['04A1B2C3'] * args.scans, 'rauschen': [f"{i:08X}" for i in range(args.scans)]}
+    print(f"{'':<16}{'µs/Scan':>10}{'Commits':>10}{'Zeilen':>10}")
+    for lage, uids in lagen.items():
+        for art in ('alt', 'neu'):
+            verzeichnis = tempfile.mkdtemp(prefix='kaffee_fehlscans_')
+            try:
+                conn = db.verbinden(os.path.join(verzeichnis, 'kaffee.db'))
+                db.init_schema(conn)
+                start = time.perf_counter()
+                commits, zeilen = alt(conn, uids) if art == 'alt' else neu(conn, uids, args.intervall)
+                dauer = time.perf_counter() - start
+                conn.close()
+            finally:
+                shutil.rmtree(verzeichnis)
+            print(f"{lage + ' ' + art:<16}{dauer / len(uids) * 1e6:>10.1f}{commits:>10}{zeilen:>10}")
@@ -0,0 +1,59 @@
+"""Massenimport gegen Einzel-Requests.
+
+'einzeln' legt jeden User bzw. jede Einzahlung so an wie admin_action
+(Hash im Request-Thread, ein Commit pro Zeile), 'stapel' nutzt
+massenimport.importieren (Hashes im Prozess-Pool, executemany, ein Commit).
+
+    python bench/bench_import.py --users 50 --einzahlungen 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BASE_DIR)
+
+
+def einzeln(conn, users, einzahlungen):
+    from werkzeug.security import generate_password_hash
+    for z in users:
+        conn.execute("INSERT INTO users (name, password_hash, rfid_uid) VALUES (?,?,?)",
+                     (z['name'], generate_password_hash(z['password']), None))
+        conn.commit()
+    for z in einzahlungen:
+        conn.execute("UPDATE users SET saldo = saldo + ? WHERE id=?", (z['betrag'], z['user']))
+        conn.execute("INSERT INTO transaktionen (user_id, typ, beschreibung, betrag) VALUES (?, 'EINZAHLUNG', 'Bar Einzahlung', ?)",
+                     (z['user'], z['betrag']))
+        conn.commit()
+
+
+def stapel(conn, users, einzahlungen):
+    import massenimport
+    massenimport.importieren(conn, 'users', users)
+    massenimport.importieren(conn, 'einzahlungen', einzahlungen)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--einzahlungen', type=int, default=2000)
+    parser.add_argument('--synchronous', default='NORMAL')
+    args = parser.parse_args()
+
+    from bench_db import test_db_anlegen
+    import db
+
+    for modus, funktion in (('einzeln', einzeln), ('stapel', stapel)):
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = db.verbinden(test_db_anlegen(tmp))
+            conn.execute(f"PRAGMA synchronous = {args.synchronous}")
+            db.init_schema(conn)
+            users = [{'name': f'{modus} {i}', 'password': f'pw{i}'} for i in range(args.users)]
+            einzahlungen = [{'user': 2, 'betrag': 1.0} for _ in range(args.einzahlungen)]
+            start = time.perf_counter()
+            funktion(conn, users, einzahlungen)
+            dauer = time.perf_counter() - start
+            conn.close()
+        print(f"{modus:8s} {args.users} User + {args.einzahlungen} Einzahlungen: {dauer:6.2f} s")
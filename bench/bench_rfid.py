@@ -0,0 +1,75 @@
+"""Latenz Karte auflegen -> Callback, ereignisgesteuert vs. altes 100-ms-Polling.
+
+Läuft komplett mit rfid_leser.SimulierterLeser, also ohne Hardware:
+
+    python bench/bench_rfid.py --karten 50
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BASE_DIR)
+
+from rfid_leser import RfidLeser, SimulierterLeser
+
+
+class PollingLeser(threading.Thread):
+    """Nachbau der alten rfid_loop: alle 100 ms nachsehen, ob eine Karte da ist."""
+
+    def __init__(self, backend, callback, intervall=0.1):
+        super().__init__(daemon=True)
+        self.backend, self.callback, self.intervall = backend, callback, intervall
+        self.running = True
+        self.aufwachen = 0
+
+    def run(self):
+        while self.running:
+            self.aufwachen += 1
+            uid = self.backend.warte_auf_karte(timeout=0.0001)
+            if uid:
+                self.callback(uid)
+            time.sleep(self.intervall)
+
+
+def messen(art, karten, pause):
+    backend = SimulierterLeser()
+    latenzen = []
+    fertig = threading.Event()
+
+    def callback(uid):
+        latenzen.append(time.perf_counter() - backend.aufgelegt_um[uid])
+        if len(latenzen) == karten:
+            fertig.set()
+
+    leser = RfidLeser(backend, callback, entprellzeit=0) if art == 'ereignis' else PollingLeser(backend, callback)
+    leser.start()
+    cpu_start = time.process_time()
+    rnd = random.Random(1)
+    for i in range(karten):
+        time.sleep(rnd.uniform(0, pause))
+        backend.karte_auflegen(f"{i:08X}")
+    fertig.wait(10)
+    leser.running = False
+    cpu = time.process_time() - cpu_start
+    latenzen.sort()
+    return latenzen[len(latenzen) // 2], latenzen[int(len(latenzen) * 0.95)], latenzen[-1], cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--karten', type=int, default=50)
+    parser.add_argument('--pause', type=float, default=0.5, help="max. Sekunden zwischen zwei Karten")
+    args = parser.parse_args()
+
+    print(f"{'Leser':<10}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'CPU s':>8}")
+    for art in ('polling', 'ereignis'):
+        p50, p95, maximum, cpu = messen(art, args.karten, args.pause)
+        print(f"{art:<10}{p50 * 1000:>9.2f}{p95 * 1000:>9.2f}{maximum * 1000:>9.2f}{cpu:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
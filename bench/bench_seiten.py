@@ -0,0 +1,91 @@
+"""Größe und Renderzeit der Admin-Seite abhängig von der Zahl der User.
+
+Legt in einer frischen DB jeweils N User an und misst /admin: Bytes
+unkomprimiert und mit gzip, Zeit fürs erste Rendern (Seiten-Cache leer), für
+einen Treffer im Seiten-Cache und für einen bedingten Request mit
+If-None-Match (304). Zum Vergleich rendert 'alt' das Template so wie früher
+mit allen Usern (drei Auswahllisten, ein Dialog pro User).
+
+    python bench/bench_seiten.py --user 10 100 1000 5000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BASE_DIR)
+
+# Template-Stück der alten admin.html pro User: 3 Optionen + Tabellenzeile + Dialog
+ALT_PRO_USER = '''<option value="{id}">{name}</option>''' * 3 + '''
+<tr><td><strong>{name}</strong></td><td id="saldo-{id}" class="text-success">0.00 €</td><td><small class="text-muted">-</small></td>
+<td class="text-end"><button type="button" class="btn btn-sm btn-outline-primary" data-bs-toggle="modal" data-bs-target="#editModal{id}">✏ Bearbeiten</button>
+<form action="/admin/action" method="POST" class="d-inline" onsubmit="return confirm('Wirklich löschen?');"><input type="hidden" name="aktion" value="delete_user"><input type="hidden" name="user_id" value="{id}"><button class="btn btn-sm btn-outline-danger">🗑</button></form>
+<div class="modal fade" id="editModal{id}" tabindex="-1"><div class="modal-dialog"><div class="modal-content"><div class="modal-header"><h5 class="modal-title">Bearbeiten: {name}</h5><button type="button" class="btn-close" data-bs-dismiss="modal"></button></div>
+<div class="modal-body"><form action="/admin/action" method="POST"><input type="hidden" name="aktion" value="edit_user"><input type="hidden" name="user_id" value="{id}">
+<div class="mb-3"><label>Name</label><input type="text" name="name" class="form-control" value="{name}" required></div>
+<div class="mb-3"><label>RFID UID</label><input type="text" name="rfid" class="form-control" value=""></div>
+<div class="mb-3"><label>Saldo (Manuelle Korrektur)</label><input type="number" step="0.01" name="saldo" class="form-control" value="0.0"><small class="text-danger">Achtung: Manuelle Änderung verfälscht die Transaktions-Historie!</small></div>
+<div class="modal-footer"><button type="button" class="btn btn-secondary" data-bs-dismiss="modal">Abbrechen</button><button type="submit" class="btn btn-primary">Speichern</button></div></form></div></div></div></div></td></tr>
+'''
+
+
+def zeit_ms(funktion, wiederholungen=20):
+    zeiten = []
+    for _ in range(wiederholungen):
+        start = time.perf_counter()
+        funktion()
+        zeiten.append(time.perf_counter() - start)
+    return statistics.median(zeiten) * 1000
+
+
+def messen(anzahl):
+    import gzip
+    import app as app_modul
+    import db
+
+    pfad = os.path.join(tempfile.mkdtemp(prefix='kaffee_seiten_'), 'kaffee.db')
+    flask_app = app_modul.create_app({'DB': pfad, 'TESTING': True})
+    from werkzeug.security import generate_password_hash
+    with flask_app.app_context():
+        conn = db.get_db()
+        conn.execute("INSERT INTO users (name, password_hash, is_admin) VALUES ('Administrator', ?, 1)",
+                     (generate_password_hash('admin123'),))
+        conn.executemany("INSERT INTO users (name) VALUES (?)", ((f"User {i}",) for i in range(anzahl)))
+        conn.commit()
+    app_modul.auswertungen.leeren()
+
+    client = flask_app.test_client()
+    client.post('/login', data={'name': 'Administrator', 'password': 'admin123'})
+    antwort = client.get('/admin', headers={'Accept-Encoding': 'gzip'})
+    roh = gzip.decompress(antwort.data)
+    etag = antwort.headers['ETag']
+
+    def kalt():
+        app_modul.auswertungen.leeren()
+        client.get('/admin')
+
+    alt = ''.join(ALT_PRO_USER.format(id=i, name=f"User {i}") for i in range(anzahl)).encode()
+    return {
+        'bytes': len(roh),
+        'gzip': len(antwort.data),
+        'alt_bytes': len(roh) + len(alt),
+        'alt_gzip': len(gzip.compress(roh + alt, 6)),
+        'rendern_ms': zeit_ms(kalt),
+        'cache_ms': zeit_ms(lambda: client.get('/admin')),
+        '304_ms': zeit_ms(lambda: client.get('/admin', headers={'If-None-Match': etag})),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--user', type=int, nargs='+', default=[10, 100, 1000, 5000])
+    args = parser.parse_args()
+
+    print(f"{'User':>6}{'Bytes':>9}{'gzip':>8}{'alt Bytes':>11}{'alt gzip':>10}{'Rendern':>10}{'Cache':>9}{'304':>8}")
+    for anzahl in args.user:
+        m = messen(anzahl)
+        print(f"{anzahl:>6}{m['bytes']:>9}{m['gzip']:>8}{m['alt_bytes']:>11}{m['alt_gzip']:>10}"
+              f"{m['rendern_ms']:>8.1f}ms{m['cache_ms']:>7.1f}ms{m['304_ms']:>6.1f}ms")
@@ -0,0 +1,77 @@
+"""Kaltstart von Server und Kiosk, so wie beim Booten des Pi.
+
+'import' misst in frischen Prozessen, wie lange `import app; app.create_app()`
+bzw. die Kiosk-Module (ohne Tk-Fenster) brauchen. 'bereit' startet
+`python app.py` auf einer Kopie von kaffee.db und misst die Zeit bis zur
+ersten Antwort auf /status/.
+
+    python bench/kaltstart.py --laeufe 5
+"""
+import argparse
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+IMPORTE = {
+    'server (import + create_app)': "import app; app.create_app()",
+    'kiosk (Module ohne Tk)': "import kiosk_speicher, kiosk_io, rfid_leser",
+}
+
+
+def freier_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def import_zeit(code, env):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], cwd=BASE_DIR, env=env, check=True)
+    return time.perf_counter() - start
+
+
+def bereit_zeit(env):
+    port = freier_port()
+    env = dict(env, KAFFEE_HOST='"127.0.0.1"', KAFFEE_PORT=str(port), KAFFEE_SSE_PORT=str(freier_port()))
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, 'app.py'], cwd=BASE_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < 30:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/status/", timeout=1) as resp:
+                    if resp.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.005)
+        raise RuntimeError("Server hat nach 30 s nicht geantwortet")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--laeufe', type=int, default=5)
+    args = parser.parse_args()
+
+    verzeichnis = tempfile.mkdtemp(prefix='kaffee_kaltstart_')
+    db_pfad = os.path.join(verzeichnis, 'kaffee.db')
+    shutil.copy(os.path.join(BASE_DIR, 'kaffee.db'), db_pfad)
+    env = dict(os.environ, KAFFEE_DB=db_pfad)
+
+    messungen = {name: [import_zeit(code, env) for _ in range(args.laeufe)] for name, code in IMPORTE.items()}
+    messungen['server bis erste Antwort'] = [bereit_zeit(env) for _ in range(args.laeufe)]
+    shutil.rmtree(verzeichnis)
+
+    print(f"{'':<32}{'Median':>10}{'Min':>10}")
+    for name, zeiten in messungen.items():
+        print(f"{name:<32}{statistics.median(zeiten) * 1000:>8.0f}ms{min(zeiten) * 1000:>8.0f}ms")
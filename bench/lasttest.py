@@ -0,0 +1,228 @@
+"""Lastgenerator für die Kiosk-API.
+
+Legt eine Test-DB mit vielen Usern und Jahren an Buchungen an, startet einen
+lokalen Waitress-Server darauf und spielt realistische Kiosk-Abläufe
+(Karte vorhalten -> Kaffee buchen) mit vielen gleichzeitigen Clients ab.
+
+    python bench/lasttest.py --users 200 --jahre 3 --clients 50 --dauer 30 --out ergebnis.json
+
+Ausgabe: p50/p95/p99-Latenz je Endpoint, Durchsatz und Fehlerquoten
+(inkl. 'database is locked' aus dem Server-Log) – zusätzlich als JSON,
+damit sich Läufe vergleichen lassen.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BASE_DIR)
+
+PRODUKTE = [(1, "Kaffee mit Koffein", 0.40), (2, "Kaffee Entkoffeiniert", 0.40)]
+
+
+def karten_uid(i):
+    return f"{0xA0000000 + i:08X}"
+
+
+def db_befuellen(pfad, users, jahre, tassen_pro_tag, seed=1):
+    """Legt eine frische DB mit users Usern und jahre Jahren Historie an."""
+    import setup_db
+    import db as db_modul
+
+    verzeichnis = os.path.dirname(pfad)
+    alt = os.getcwd()
+    os.chdir(verzeichnis)
+    try:
+        setup_db.init_db()
+    finally:
+        os.chdir(alt)
+
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(pfad)
+    # Passwort-Hash einmal berechnen und wiederverwenden – sonst dauert das Befüllen ewig
+    pw = conn.execute("SELECT password_hash FROM users WHERE name='Max Tester'").fetchone()[0]
+    conn.executemany("INSERT INTO users (name, rfid_uid, password_hash, saldo) VALUES (?, ?, ?, ?)",
+                     [(f"Last User {i}", karten_uid(i), pw, 0.0) for i in range(users)])
+    user_ids = [r[0] for r in conn.execute("SELECT id FROM users WHERE name LIKE 'Last User %'")]
+
+    tage = int(jahre * 365)
+    anzahl = int(tage * tassen_pro_tag)
+    zeilen = []
+    for _ in range(anzahl):
+        produkt_id, produkt, preis = rnd.choice(PRODUKTE)
+        typ = 'KAUF_ENTKOFFEINIERT' if 'Entkoffeiniert' in produkt else 'KAUF_KOFFEIN'
+        sekunden = rnd.randrange(tage * 86400)
+        zeilen.append((rnd.choice(user_ids), typ, produkt, -preis, produkt_id, f'-{sekunden} seconds'))
+        if len(zeilen) >= 50000:
+            conn.executemany("INSERT INTO transaktionen (user_id, typ, beschreibung, betrag, produkt_id, zeitstempel) VALUES (?, ?, ?, ?, ?, datetime('now', ?))", zeilen)
+            zeilen = []
+    conn.executemany("INSERT INTO transaktionen (user_id, typ, beschreibung, betrag, produkt_id, zeitstempel) VALUES (?, ?, ?, ?, ?, datetime('now', ?))", zeilen)
+    # Startguthaben als Einzahlung, damit users.saldo zum Ledger passt (siehe konten.py)
+    conn.executemany("INSERT INTO transaktionen (user_id, typ, beschreibung, betrag) VALUES (?, 'EINZAHLUNG', 'Startguthaben', 50)",
+                     [(uid,) for uid in user_ids])
+    conn.execute("UPDATE users SET saldo = COALESCE((SELECT SUM(betrag) FROM transaktionen t WHERE t.user_id = users.id), 0)")
+    conn.execute("INSERT INTO bohnen_log (user_id, menge_gramm, preis, sorte) VALUES (?, ?, 0, 'Koffein'), (?, ?, 0, 'Entkoffeiniert')",
+                 (user_ids[0], anzahl * 12, user_ids[0], anzahl * 12))
+
+    # Summen-Tabellen passend zu den direkt eingefügten Zeilen neu aufbauen
+    conn.row_factory = sqlite3.Row
+    db_modul.init_schema(conn)
+    import statistik
+    statistik.neu_berechnen(conn)
+    conn.commit()
+    conn.close()
+    return len(user_ids), anzahl
+
+
+def freier_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def server_starten(db_pfad, port, threads, log):
+    env = dict(os.environ, KAFFEE_DB=db_pfad)
+    code = ("import app; from waitress import serve; "
+            f"serve(app.create_app(), host='127.0.0.1', port={port}, threads={threads})")
+    proc = subprocess.Popen([sys.executable, '-c', code], cwd=BASE_DIR, env=env, stdout=log, stderr=log)
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("Server startet nicht – siehe Server-Log")
+
+
+class Client(threading.Thread):
+    def __init__(self, port, anzahl_users, stop, unbekannt, seed):
+        super().__init__(daemon=True)
+        self.port, self.anzahl_users, self.stop, self.unbekannt = port, anzahl_users, stop, unbekannt
+        self.rnd = random.Random(seed)
+        self.latenzen = {'/api/check_card': [], '/api/book': []}
+        self.gesendet = {'/api/check_card': 0, '/api/book': 0}
+        self.fehler = {'/api/check_card': 0, '/api/book': 0}
+
+    def anfrage(self, conn, route, methode, pfad, body=None):
+        kopf = {'Content-Type': 'application/json'} if body else {}
+        self.gesendet[route] += 1
+        start = time.perf_counter()
+        try:
+            conn.request(methode, pfad, body=body, headers=kopf)
+            resp = conn.getresponse()
+            daten = resp.read()
+        except (OSError, http.client.HTTPException):
+            self.fehler[route] += 1
+            conn.close()
+            return None
+        self.latenzen[route].append(time.perf_counter() - start)
+        if resp.status != 200:
+            self.fehler[route] += 1
+            return None
+        return json.loads(daten)
+
+    def run(self):
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+        while not self.stop.is_set():
+            if self.rnd.random() < self.unbekannt:
+                uid = f"FF{self.rnd.randrange(1 << 24):06X}"
+            else:
+                uid = karten_uid(self.rnd.randrange(self.anzahl_users))
+            karte = self.anfrage(conn, '/api/check_card', 'GET', f'/api/check_card/{uid}')
+            if not karte or karte.get('status') != 'ok':
+                continue
+            # Bedienzeit am Touchscreen (verkürzt)
+            time.sleep(self.rnd.uniform(0.0, 0.05))
+            produkt_id, _, preis = self.rnd.choice(PRODUKTE)
+            body = json.dumps({'user_id': karte['user_id'], 'produkt_id': produkt_id, 'price': preis})
+            self.anfrage(conn, '/api/book', 'POST', '/api/book', body)
+        conn.close()
+
+
+def perzentil(werte, p):
+    if not werte:
+        return None
+    werte = sorted(werte)
+    return werte[min(len(werte) - 1, int(round(p / 100 * (len(werte) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lastgenerator für /api/check_card und /api/book.")
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--jahre', type=float, default=2.0, help="Jahre an Historie in transaktionen")
+    parser.add_argument('--tassen-pro-tag', type=float, default=60.0)
+    parser.add_argument('--clients', type=int, default=50, help="gleichzeitige Kiosk-Clients")
+    parser.add_argument('--dauer', type=float, default=20.0, help="Sekunden Last")
+    parser.add_argument('--threads', type=int, default=4, help="Waitress-Worker-Threads")
+    parser.add_argument('--unbekannt', type=float, default=0.02, help="Anteil unbekannter Karten")
+    parser.add_argument('--db', help="vorhandene Test-DB wiederverwenden statt neu befüllen")
+    parser.add_argument('--out', help="Ergebnisse als JSON in diese Datei schreiben")
+    args = parser.parse_args()
+
+    if args.db:
+        db_pfad = os.path.abspath(args.db)
+        anzahl_users = args.users
+    else:
+        db_pfad = os.path.join(tempfile.mkdtemp(prefix='kaffee_last_'), 'kaffee.db')
+        start = time.perf_counter()
+        anzahl_users, anzahl_tx = db_befuellen(db_pfad, args.users, args.jahre, args.tassen_pro_tag)
+        print(f"DB befüllt: {anzahl_users} User, {anzahl_tx} Buchungen in {time.perf_counter() - start:.1f}s ({db_pfad})")
+
+    port = freier_port()
+    log_pfad = db_pfad + '.server.log'
+    with open(log_pfad, 'w') as log:
+        server = server_starten(db_pfad, port, args.threads, log)
+        try:
+            stop = threading.Event()
+            clients = [Client(port, anzahl_users, stop, args.unbekannt, seed=i) for i in range(args.clients)]
+            start = time.perf_counter()
+            for c in clients:
+                c.start()
+            time.sleep(args.dauer)
+            stop.set()
+            for c in clients:
+                c.join()
+            laufzeit = time.perf_counter() - start
+        finally:
+            server.terminate()
+            server.wait()
+    with open(log_pfad) as log:
+        locked = log.read().count('database is locked')
+
+    ergebnis = {'parameter': vars(args), 'laufzeit_s': laufzeit, 'database_locked': locked, 'routen': {}}
+    print(f"\n{'Route':<18}{'Anfragen':>10}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'Fehler %':>10}")
+    for route in ('/api/check_card', '/api/book'):
+        latenzen = [l for c in clients for l in c.latenzen[route]]
+        fehler = sum(c.fehler[route] for c in clients)
+        anfragen = sum(c.gesendet[route] for c in clients)
+        werte = {
+            'anfragen': anfragen,
+            'req_pro_s': anfragen / laufzeit,
+            'p50_ms': (perzentil(latenzen, 50) or 0) * 1000,
+            'p95_ms': (perzentil(latenzen, 95) or 0) * 1000,
+            'p99_ms': (perzentil(latenzen, 99) or 0) * 1000,
+            'fehler': fehler,
+            'fehlerquote': fehler / max(anfragen, 1),
+        }
+        ergebnis['routen'][route] = werte
+        print(f"{route:<18}{anfragen:>10}{werte['req_pro_s']:>9.1f}{werte['p50_ms']:>9.1f}"
+              f"{werte['p95_ms']:>9.1f}{werte['p99_ms']:>9.1f}{werte['fehlerquote'] * 100:>9.2f}%")
+    print(f"'database is locked' im Server-Log: {locked}")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(ergebnis, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""Query-Plan-Check: jede SQL-Anweisung aus app.py (und den Hilfsmodulen) per
+EXPLAIN QUERY PLAN gegen eine befüllte Test-DB (mit einem Jahresarchiv) prüfen.
+Die zur Laufzeit zusammengesetzten Abfragen aus transaktionen.py werden mit
+typischen Filtern ausgeführt und mitgeschnitten.
+
+Schlägt fehl (Exit-Code 1), sobald eine Abfrage auf einer wachsenden Tabelle
+(transaktionen) einen Full-Table-Scan oder eine Sortierung im Temp-B-Tree
+braucht. Gedacht als Regressionstest vor jedem Deploy:
+
+    python bench/query_plans.py
+"""
+import ast
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+from datetime import date, timedelta
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BASE_DIR)
+
+MODULE = ['app.py', 'statistik.py', 'db.py', 'prognose.py', 'produkte.py', 'konten.py', 'migrationen.py',
+          'transaktionen.py', 'buchung.py', 'archiv.py', 'fehlscans.py']
+
+# Alte Buchungen der Test-DB (so viele Tage zurück), die ins Archiv wandern
+ALT_TAGE = (400, 700)
+
+# Tabellen, die mit der Zeit unbegrenzt wachsen (inkl. Alias in app.py)
+HEISSE_TABELLEN = {'transaktionen', 't'}
+
+# Anweisungen, die bewusst alles lesen (Neuberechnung/Prüfung der Summen)
+ERLAUBT = [
+    'FROM bohnen_log GROUP BY sorte',
+    'GROUP BY 1',
+]
+
+
+def sql_aus_modul(pfad):
+    """Sammelt alle konstanten SQL-Strings, die an execute/executemany übergeben werden."""
+    with open(pfad, encoding='utf-8') as f:
+        baum = ast.parse(f.read(), pfad)
+    for knoten in ast.walk(baum):
+        if (isinstance(knoten, ast.Call) and isinstance(knoten.func, ast.Attribute)
+                and knoten.func.attr in ('execute', 'executemany') and knoten.args
+                and isinstance(knoten.args[0], ast.Constant) and isinstance(knoten.args[0].value, str)):
+            yield knoten.lineno, ' '.join(knoten.args[0].value.split())
+
+
+class Mitschnitt:
+    """Reicht alles an conn durch und merkt sich jede Anweisung mit ihren Parametern."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.anweisungen = []
+
+    def execute(self, sql, parameter=()):
+        self.anweisungen.append((' '.join(sql.split()), list(parameter)))
+        return self.conn.execute(sql, parameter)
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+
+def test_db_anlegen(verzeichnis, zeilen=5000):
+    import archiv
+    import db
+    import setup_db
+    alt = os.getcwd()
+    os.chdir(verzeichnis)
+    try:
+        setup_db.init_db()
+    finally:
+        os.chdir(alt)
+    pfad = os.path.join(verzeichnis, setup_db.DB_NAME)
+    conn = db.verbinden(pfad)
+    conn.executemany("INSERT INTO transaktionen (user_id, typ, beschreibung, betrag, produkt_id, zeitstempel) VALUES (?, ?, ?, ?, ?, datetime('now', ?))",
+                     [(2, 'KAUF_KOFFEIN' if i % 3 else 'KAUF_ENTKOFFEINIERT', 'Kaffee', -0.4, 1 if i % 3 else 2,
+                       f'-{ALT_TAGE[0] + i % (ALT_TAGE[1] - ALT_TAGE[0])} days') for i in range(zeilen)])
+    conn.commit()
+    archiv.archivieren(conn, pfad, 6)
+    conn.executemany("INSERT INTO transaktionen (user_id, typ, beschreibung, betrag, produkt_id, zeitstempel) VALUES (?, ?, ?, ?, ?, datetime('now', ?))",
+                     [(2, 'KAUF_KOFFEIN' if i % 3 else 'KAUF_ENTKOFFEINIERT', 'Kaffee', -0.4, 1 if i % 3 else 2, f'-{i} minutes') for i in range(zeilen)])
+    conn.commit()
+    conn.close()
+    # Neu verbinden, damit alle Archivjahre angehängt sind
+    conn = db.verbinden(pfad)
+    conn.execute("ANALYZE")
+    conn.commit()
+    return conn
+
+
+def ledger_sql(conn):
+    """Führt transaktionen.seite/alle mit typischen Filtern aus: [(beschreibung, sql, parameter)]."""
+    import transaktionen
+    heute = date.today()
+    von, bis = (str(heute - timedelta(days=tage)) for tage in (600, 500))
+    filter_liste = [{}, {'user_id': 2}, {'typ': 'KAUF_KOFFEIN'}, {'von': von, 'bis': bis},
+                    {'user_id': 2, 'bis': bis}, {'typ': 'KAUF_KOFFEIN', 'von': von, 'bis': bis}]
+    gesehen, ergebnis = set(), []
+    for filter in filter_liste:
+        mitschnitt = Mitschnitt(conn)
+        _, cursor = transaktionen.seite(mitschnitt, 50, **filter)
+        transaktionen.seite(mitschnitt, 50, cursor, **filter)
+        for _ in transaktionen.alle(mitschnitt, **filter):
+            pass
+        for sql, parameter in mitschnitt.anweisungen:
+            if sql.upper().startswith('SELECT') and (sql, len(parameter)) not in gesehen:
+                gesehen.add((sql, len(parameter)))
+                ergebnis.append((f"transaktionen({', '.join(f'{k}={v}' for k, v in filter.items())})", sql, parameter))
+    return ergebnis
+
+
+def pruefe_plan(conn, sql, parameter=None):
+    """Gibt (Planzeilen, Fehlerliste) zurück."""
+    if parameter is None:
+        benannt = re.findall(r':([A-Za-z_]\w*)', sql)
+        parameter = dict.fromkeys(benannt) if benannt else [None] * sql.count('?')
+    plan = [zeile[3] for zeile in conn.execute(f"EXPLAIN QUERY PLAN {sql}", parameter)]
+    fehler = []
+    for detail in plan:
+        scan = re.match(r'SCAN (\w+)(.*)', detail)
+        if scan and scan.group(1) in HEISSE_TABELLEN and 'USING' not in scan.group(2):
+            fehler.append(f"Full-Table-Scan: {detail}")
+        if 'USE TEMP B-TREE FOR ORDER BY' in detail and HEISSE_TABELLEN & set(re.findall(r'\w+', sql)):
+            fehler.append(f"Sortierung ohne Index: {detail}")
+    return plan, fehler
+
+
+def main():
+    conn = test_db_anlegen(tempfile.mkdtemp(prefix='kaffee_plan_'))
+    anweisungen = [(f"{modul}:{zeile}", sql, None) for modul in MODULE
+                   for zeile, sql in sorted(sql_aus_modul(os.path.join(BASE_DIR, modul)))]
+    anweisungen += ledger_sql(conn)
+    anzahl_fehler = 0
+    for herkunft, sql, parameter in anweisungen:
+        if not sql.upper().startswith(('SELECT', 'INSERT', 'UPDATE', 'DELETE')):
+            continue
+        try:
+            plan, fehler = pruefe_plan(conn, sql, parameter)
+        except sqlite3.Error as e:
+            plan, fehler = [], [f"EXPLAIN fehlgeschlagen: {e}"]
+        if any(muster in sql for muster in ERLAUBT):
+            fehler = []
+        status = "❌" if fehler else "✅"
+        print(f"{status} {herkunft}: {sql[:100]}")
+        for detail in plan:
+            print(f"      {detail}")
+        for f in fehler:
+            print(f"   -> {f}")
+        anzahl_fehler += bool(fehler)
+    conn.close()
+
+    if anzahl_fehler:
+        print(f"\n{anzahl_fehler} Abfrage(n) ohne passenden Index.")
+        raise SystemExit(1)
+    print("\nAlle heißen Abfragen nutzen einen Index.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""Sync-Check: Buchungen aus der Offline-Warteschlange des Kiosks gehen bei
+vorübergehenden Server-Fehlern nicht verloren und werden genau einmal gebucht.
+
+Ein Kiosk-Speicher (kiosk_speicher.py) schickt über SyncWorker.warteschlange_senden
+an /api/book_bulk einer Test-App. Zwei Lagen:
+
+  gesperrt   der erste Batch scheitert im Schreib-Thread (database is locked)
+  timeout    der Schreib-Thread ist langsamer als der Timeout von buchen_viele,
+             bucht die Buchungen aber danach trotzdem
+
+Nach dem ersten Lauf müssen die Buchungen noch 'offen' sein, nach dem zweiten
+'gesendet', jede genau einmal im Ledger, und der Kiosk-Saldo muss dem Server
+entsprechen. Exit-Code 1 bei einer Abweichung:
+
+    python bench/sync_wiederholung.py
+"""
+import functools
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BASE_DIR)
+
+BUCHUNGEN = 3
+
+
+class TestAntwort:
+    def __init__(self, antwort):
+        self.antwort = antwort
+
+    def raise_for_status(self):
+        if self.antwort.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.antwort.status_code}")
+
+    def json(self):
+        return self.antwort.get_json()
+
+
+class TestSession:
+    """Gerade so viel von requests.Session, wie SyncWorker.warteschlange_senden braucht."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def post(self, url, json=None, timeout=None):
+        return TestAntwort(self.client.post(url, json=json))
+
+
+def server_anlegen(verzeichnis):
+    import setup_db
+    alt = os.getcwd()
+    os.chdir(verzeichnis)
+    try:
+        setup_db.init_db()
+    finally:
+        os.chdir(alt)
+    import app as appmod
+    pfad = os.path.join(verzeichnis, setup_db.DB_NAME)
+    return appmod, appmod.create_app({'DB': pfad, 'TESTING': True})
+
+
+def lage_pruefen(client, verzeichnis, name, stoeren):
+    import db
+    from kiosk_speicher import KioskSpeicher, SyncWorker
+    conn = db.verbinden()
+    user_id, saldo = conn.execute("SELECT id, saldo FROM users WHERE name = 'Max Tester'").fetchone()
+    speicher = KioskSpeicher(os.path.join(verzeichnis, f"kiosk_{name}.db"))
+    speicher.karte_merken('LAGE' + name.upper(), user_id, 'Max Tester', saldo)
+    produkt = speicher.produkte()[0]
+    for _ in range(BUCHUNGEN):
+        speicher.buchung_vormerken(user_id, produkt)
+    schluessel = [b['id'] for b in speicher.offene_buchungen()]
+    sync = SyncWorker(speicher, server=None)
+    sync.session, sync.server_url = TestSession(client), ''
+
+    fehler = []
+    with stoeren():
+        sync.warteschlange_senden()
+    if speicher.anzahl_offen() != BUCHUNGEN:
+        fehler.append(f"nach dem gestörten Lauf {speicher.anzahl_offen()} statt {BUCHUNGEN} offen")
+    time.sleep(0.5)     # nach einem Timeout bucht der Schreib-Thread noch zu Ende
+    sync.warteschlange_senden()
+    if speicher.anzahl_offen():
+        fehler.append(f"nach dem zweiten Lauf noch {speicher.anzahl_offen()} offen")
+    gebucht = conn.execute(f"SELECT COUNT(*) FROM idempotenz WHERE schluessel IN ({','.join('?' * len(schluessel))})",
+                           schluessel).fetchone()[0]
+    if gebucht != BUCHUNGEN:
+        fehler.append(f"{gebucht} statt {BUCHUNGEN} Buchungen im Ledger")
+    server_saldo = conn.execute("SELECT saldo FROM users WHERE id = ?", (user_id,)).fetchone()[0]
+    kiosk_saldo = speicher.karte('LAGE' + name.upper())['saldo']
+    if abs(server_saldo - kiosk_saldo) > 1e-9 or abs(server_saldo - (saldo - BUCHUNGEN * produkt['preis'])) > 1e-9:
+        fehler.append(f"Saldo Kiosk {kiosk_saldo:.2f}, Server {server_saldo:.2f}, erwartet {saldo - BUCHUNGEN * produkt['preis']:.2f}")
+    conn.close()
+    return fehler
+
+
+def main():
+    import contextlib
+    verzeichnis = tempfile.mkdtemp(prefix='kaffee_sync_')
+    try:
+        with contextlib.redirect_stdout(open(os.devnull, 'w')):
+            appmod, app = server_anlegen(verzeichnis)
+        client = app.test_client()
+        engine = appmod.buchungen
+        schreiben = engine._batch_schreiben
+
+        @contextlib.contextmanager
+        def gesperrt():
+            def einmal_gesperrt(conn, batch):
+                engine._batch_schreiben = schreiben
+                conn.execute("BEGIN IMMEDIATE")
+                raise sqlite3.OperationalError("database is locked")
+            engine._batch_schreiben = einmal_gesperrt
+            try:
+                yield
+            finally:
+                engine._batch_schreiben = schreiben
+
+        @contextlib.contextmanager
+        def timeout():
+            def langsam(conn, batch):
+                time.sleep(0.2)
+                schreiben(conn, batch)
+            engine._batch_schreiben = langsam
+            buchen_viele = engine.buchen_viele
+            engine.buchen_viele = functools.partial(buchen_viele, timeout=0.05)
+            try:
+                yield
+            finally:
+                engine.buchen_viele = buchen_viele
+                engine._batch_schreiben = schreiben
+
+        anzahl_fehler = 0
+        for name, stoeren in (('gesperrt', gesperrt), ('timeout', timeout)):
+            fehler = lage_pruefen(client, verzeichnis, name, stoeren)
+            print(f"{'❌' if fehler else '✅'} {name}")
+            for f in fehler:
+                print(f"   -> {f}")
+            anzahl_fehler += bool(fehler)
+    finally:
+        shutil.rmtree(verzeichnis)
+
+    if anzahl_fehler:
+        raise SystemExit(1)
+    print("\nVorübergehende Fehler: Buchungen bleiben offen und kommen genau einmal an.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+import asyncio
+import functools
+import queue
+import sqlite3
+import threading
+
+import db
+import statistik
+
+# --- BUCHUNGS-ENGINE FÜR /api/book ---
+# Alle Kiosk-Buchungen laufen über einen einzigen Schreib-Thread mit eigener
+# Verbindung. Jede Buchung ist atomar (Saldo, Ledger-Eintrag, Statistik) und
+# liefert den Saldo direkt nach *ihrer* Buchung zurück. Kommen mehrere
+# Buchungen gleichzeitig an, werden sie in einer Transaktion gesammelt
+# committet (Group Commit) – das fsync teilen sich dann alle.
+#
+# Buchungen mit Idempotenz-Schlüssel (Offline-Queue der Kiosks) werden genau
+# einmal angewendet: Der Schlüssel landet in derselben Transaktion in der
+# Tabelle idempotenz, eine Wiederholung liefert nur den aktuellen Saldo.
+#
+# buchen_viele() unterscheidet deshalb zwei Arten von Fehlschlag:
+#   'fehler'   die Buchung selbst ist ungültig (unbekannter User, falsche Typen) –
+#              eine Wiederholung scheitert genauso
+#   'spaeter'  Timeout, gesperrte oder kaputte Transaktion – der Kiosk schickt sie
+#              mit demselben Schlüssel noch einmal (nach einem Timeout kann sie
+#              schon gebucht sein, dann kommt 'duplikat' zurück)
+
+
+class UnbekannterUser(Exception):
+    pass
+
+
+class _Auftrag:
+    __slots__ = ('user_id', 'produkt', 'preis', 'schluessel', 'zeitstempel',
+                 'fertig', 'saldo', 'fehler', 'duplikat', 'rueckruf')
+
+    def __init__(self, user_id, produkt, preis, schluessel=None, zeitstempel=None):
+        # produkt: Eintrag aus produkte.alle() (id, name, sorte, kauf_typ)
+        self.user_id, self.produkt, self.preis = user_id, produkt, preis
+        self.schluessel, self.zeitstempel = schluessel, zeitstempel
+        self.fertig = threading.Event()
+        self.saldo = None
+        self.fehler = None
+        self.duplikat = False
+        self.rueckruf = None    # aus dem Schreib-Thread aufgerufen, sobald fertig (für die asyncio-API)
+
+
+# Fehler, die an der Buchung selbst liegen; alle anderen gelten als vorübergehend
+ENDGUELTIG = (UnbekannterUser, TypeError, ValueError, sqlite3.IntegrityError, sqlite3.InterfaceError, sqlite3.ProgrammingError)
+TIMEOUT = {'status': 'spaeter', 'message': 'Timeout'}
+
+
+def _ergebnis(auftrag):
+    if auftrag.fehler:
+        return {'status': 'fehler' if isinstance(auftrag.fehler, ENDGUELTIG) else 'spaeter', 'message': str(auftrag.fehler)}
+    return {'status': 'duplikat' if auftrag.duplikat else 'ok', 'new_saldo': auftrag.saldo}
+
+
+def _erledigen(future):
+    if not future.done():   # nach einem Timeout ist das Future schon abgebrochen
+        future.set_result(None)
+
+
+class BuchungsEngine:
+    def __init__(self, max_batch=64, sammelzeit=0.0):
+        self.max_batch = max_batch      # höchstens so viele Buchungen pro Commit
+        # Zusätzliche Wartezeit auf weitere Buchungen (Sekunden). 0 = nur mitnehmen,
+        # was während des letzten Commits schon aufgelaufen ist.
+        self.sammelzeit = sammelzeit
+        self._auftraege = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def buchen(self, user_id, produkt, preis, timeout=10):
+        """Bucht einen Kauf und gibt den neuen Saldo zurück."""
+        self._starten()
+        auftrag = _Auftrag(user_id, produkt, preis)
+        self._auftraege.put(auftrag)
+        if not auftrag.fertig.wait(timeout):
+            raise TimeoutError("Buchung nicht rechtzeitig bestätigt")
+        if auftrag.fehler:
+            raise auftrag.fehler
+        return auftrag.saldo
+
+    def buchen_viele(self, buchungen, timeout=30):
+        """Bucht eine Liste von Dicts (user_id, produkt, preis, schluessel, zeitstempel).
+
+        Gibt pro Buchung {'status': 'ok'|'duplikat'|'fehler'|'spaeter', 'new_saldo', 'message'} zurück.
+        Eine fehlerhafte Buchung bricht die anderen nicht ab; 'spaeter' darf wiederholt werden.
+        """
+        self._starten()
+        auftraege = [_Auftrag(**b) for b in buchungen]
+        for auftrag in auftraege:
+            self._auftraege.put(auftrag)
+        return [_ergebnis(auftrag) if auftrag.fertig.wait(timeout) else dict(TIMEOUT)
+                for auftrag in auftraege]
+
+    # --- Für Coroutinen (kiosk_api.py): warten, ohne einen Thread zu blockieren ---
+
+    async def buchen_async(self, user_id, produkt, preis, timeout=10):
+        """Wie buchen(), aber awaitable."""
+        auftrag = _Auftrag(user_id, produkt, preis)
+        try:
+            await self._einreichen([auftrag], timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError("Buchung nicht rechtzeitig bestätigt") from None
+        if auftrag.fehler:
+            raise auftrag.fehler
+        return auftrag.saldo
+
+    async def buchen_viele_async(self, buchungen, timeout=30):
+        """Wie buchen_viele(), aber awaitable."""
+        auftraege = [_Auftrag(**b) for b in buchungen]
+        try:
+            await self._einreichen(auftraege, timeout)
+        except asyncio.TimeoutError:
+            pass
+        return [_ergebnis(auftrag) if auftrag.fertig.is_set() else dict(TIMEOUT)
+                for auftrag in auftraege]
+
+    async def _einreichen(self, auftraege, timeout):
+        loop = asyncio.get_running_loop()
+        futures = []
+        for auftrag in auftraege:
+            future = loop.create_future()
+            auftrag.rueckruf = functools.partial(loop.call_soon_threadsafe, _erledigen, future)
+            futures.append(future)
+        self._starten()
+        for auftrag in auftraege:
+            self._auftraege.put(auftrag)
+        await asyncio.wait_for(asyncio.gather(*futures), timeout)
+
+    def _starten(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._schleife, name='buchungen', daemon=True)
+                    self._thread.start()
+
+    def _sammeln(self):
+        batch = [self._auftraege.get()]
+        while len(batch) < self.max_batch:
+            try:
+                if self.sammelzeit:
+                    batch.append(self._auftraege.get(timeout=self.sammelzeit))
+                else:
+                    batch.append(self._auftraege.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _schleife(self):
+        conn = db.verbinden()
+        conn.isolation_level = None  # BEGIN/COMMIT steuern wir selbst
+        while True:
+            batch = self._sammeln()
+            try:
+                self._batch_schreiben(conn, batch)
+            except Exception as e:
+                # Der Schreib-Thread darf nie sterben, sonst hängt jede weitere Buchung
+                try:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                except sqlite3.Error:
+                    pass
+                for auftrag in batch:
+                    auftrag.saldo, auftrag.fehler = None, e
+            for auftrag in batch:
+                auftrag.fertig.set()
+                if auftrag.rueckruf:
+                    try:
+                        auftrag.rueckruf()
+                    except RuntimeError:
+                        pass    # Event-Loop schon beendet, niemand wartet mehr
+
+    def _batch_schreiben(self, conn, batch):
+        # IMMEDIATE: Schreibsperre sofort holen statt erst beim ersten UPDATE
+        conn.execute("BEGIN IMMEDIATE")
+        for auftrag in batch:
+            # Savepoint pro Buchung: eine fehlerhafte Buchung reißt den Rest nicht mit
+            conn.execute("SAVEPOINT buchung")
+            try:
+                if auftrag.schluessel and conn.execute("SELECT 1 FROM idempotenz WHERE schluessel = ?", (auftrag.schluessel,)).fetchone():
+                    # Schon einmal gebucht (z.B. Antwort ging beim Kiosk verloren)
+                    auftrag.duplikat = True
+                    zeile = conn.execute("SELECT saldo FROM users WHERE id = ?", (auftrag.user_id,)).fetchone()
+                    auftrag.saldo = zeile[0] if zeile else None
+                    conn.execute("RELEASE buchung")
+                    continue
+                cur = conn.execute("UPDATE users SET saldo = saldo - ? WHERE id = ?", (auftrag.preis, auftrag.user_id))
+                if cur.rowcount == 0:
+                    raise UnbekannterUser(f"User {auftrag.user_id} existiert nicht")
+                produkt = auftrag.produkt
+                cur = conn.execute("INSERT INTO transaktionen (user_id, typ, beschreibung, betrag, produkt_id, zeitstempel) VALUES (?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))",
+                                   (auftrag.user_id, produkt['kauf_typ'], produkt['name'], -auftrag.preis, produkt['id'], auftrag.zeitstempel))
+                if auftrag.schluessel:
+                    conn.execute("INSERT INTO idempotenz (schluessel, transaktion_id) VALUES (?, ?)", (auftrag.schluessel, cur.lastrowid))
+                statistik.buche_tasse(conn, produkt['kauf_typ'], auftrag.zeitstempel)
+                auftrag.saldo = conn.execute("SELECT saldo FROM users WHERE id = ?", (auftrag.user_id,)).fetchone()[0]
+                conn.execute("RELEASE buchung")
+            except (UnbekannterUser, sqlite3.Error, TypeError, ValueError) as e:
+                # Nur diese Buchung scheitert, die anderen im Batch werden trotzdem committet
+                conn.execute("ROLLBACK TO buchung")
+                conn.execute("RELEASE buchung")
+                auftrag.fehler = e
+        conn.execute("COMMIT")
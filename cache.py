@@ -0,0 +1,241 @@
+import threading
+import time
+from collections import OrderedDict
+
+# --- IN-PROZESS CACHES ---
+# Alle Caches leben im Server-Prozess und werden von den Schreibpfaden in app.py
+# gezielt invalidiert. Wer an app.py vorbei in die DB schreibt, muss den Server
+# neu starten (oder den Cache leeren).
+
+
+class KartenCache:
+    """RFID-UID -> {'user_id', 'name', 'saldo'}, damit ein Karten-Scan nicht auf die Platte muss.
+
+    Jede Änderung erhöht eine Generation. Ein Leser merkt sich die Generation vor
+    der DB-Abfrage und trägt sein Ergebnis nur ein, wenn sich seitdem nichts
+    geändert hat – so landet kein veralteter Saldo im Cache.
+    """
+
+    def __init__(self):
+        self.treffer = 0
+        self.fehlschlaege = 0
+        self._lock = threading.Lock()
+        self._nach_uid = {}
+        self._uid_von_user = {}
+        self._generation = 0
+
+    def hole(self, uid):
+        """Gibt (Eintrag oder None, Generation) zurück."""
+        with self._lock:
+            eintrag = self._nach_uid.get(uid)
+            if eintrag:
+                self.treffer += 1
+            else:
+                self.fehlschlaege += 1
+            return (dict(eintrag) if eintrag else None), self._generation
+
+    def eintragen(self, uid, eintrag, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._nach_uid[uid] = dict(eintrag)
+            self._uid_von_user[eintrag['user_id']] = uid
+
+    def saldo_anpassen(self, user_id, delta):
+        """Nach einer Buchung: Saldo im Cache um delta verschieben (reihenfolgeunabhängig)."""
+        with self._lock:
+            self._generation += 1
+            uid = self._uid_von_user.get(user_id)
+            if uid is not None:
+                self._nach_uid[uid]['saldo'] += delta
+
+    def invalidieren(self, user_id):
+        """Nach Bearbeiten/Löschen eines Users oder Admin-Buchungen."""
+        with self._lock:
+            self._generation += 1
+            uid = self._uid_von_user.pop(int(user_id), None)
+            if uid is not None:
+                self._nach_uid.pop(uid, None)
+
+    def leeren(self):
+        with self._lock:
+            self._generation += 1
+            self._nach_uid.clear()
+            self._uid_von_user.clear()
+
+    def statistik(self):
+        with self._lock:
+            anfragen = self.treffer + self.fehlschlaege
+            return {
+                'treffer': self.treffer,
+                'fehlschlaege': self.fehlschlaege,
+                'trefferquote': self.treffer / anfragen if anfragen else 0.0,
+                'eintraege': len(self._nach_uid),
+            }
+
+
+class UserCache:
+    """User-ID -> User-Objekt für Flask-Logins load_user, als LRU mit fester Größe.
+
+    Gleiches Generationsprinzip wie KartenCache, aber je User: Wer vor der
+    DB-Abfrage die Generation holt, trägt nur ein, wenn der User seitdem nicht
+    bearbeitet oder gelöscht wurde.
+    """
+
+    def __init__(self, groesse=1024):
+        self.groesse = groesse
+        self.treffer = 0
+        self.fehlschlaege = 0
+        self._lock = threading.Lock()
+        self._eintraege = OrderedDict()   # user_id -> User, zuletzt benutzt am Ende
+        self._generationen = {}           # user_id -> Zähler, erhöht bei invalidieren()
+        self._epoche = 0
+
+    def hole(self, user_id):
+        """Gibt (User oder None, Generation) zurück."""
+        with self._lock:
+            user = self._eintraege.get(user_id)
+            if user is not None:
+                self._eintraege.move_to_end(user_id)
+                self.treffer += 1
+            else:
+                self.fehlschlaege += 1
+            return user, (self._epoche, self._generationen.get(user_id, 0))
+
+    def eintragen(self, user_id, user, generation):
+        with self._lock:
+            if generation != (self._epoche, self._generationen.get(user_id, 0)):
+                return
+            self._eintraege[user_id] = user
+            self._eintraege.move_to_end(user_id)
+            if len(self._eintraege) > self.groesse:
+                self._eintraege.popitem(last=False)
+
+    def invalidieren(self, user_id):
+        """Nach Bearbeiten/Löschen eines Users."""
+        user_id = int(user_id)
+        with self._lock:
+            self._eintraege.pop(user_id, None)
+            self._generationen[user_id] = self._generationen.get(user_id, 0) + 1
+
+    def leeren(self):
+        with self._lock:
+            self._epoche += 1
+            self._eintraege.clear()
+            self._generationen.clear()
+
+    def statistik(self):
+        with self._lock:
+            anfragen = self.treffer + self.fehlschlaege
+            return {
+                'treffer': self.treffer,
+                'fehlschlaege': self.fehlschlaege,
+                'trefferquote': self.treffer / anfragen if anfragen else 0.0,
+                'eintraege': len(self._eintraege),
+            }
+
+
+class Cache:
+    """Kleiner Schlüssel/Wert-Cache für abgeleitete Ansichten (Summen, Settings, ...).
+
+    Einträge werden von den Schreibpfaden gezielt invalidiert; die TTL ist nur
+    das Sicherheitsnetz für Änderungen, die an app.py vorbei in die DB kommen.
+    """
+
+    def __init__(self, ttl=60.0):
+        self.ttl = ttl
+        self.treffer = 0
+        self.fehlschlaege = 0
+        self._lock = threading.Lock()
+        self._eintraege = {}      # schluessel -> (wert, ablaufzeit)
+        self._generationen = {}   # schluessel -> Zähler, erhöht bei jeder Invalidierung
+        self._epoche = 0          # erhöht bei leeren()
+        # Erhöht bei jeder Invalidierung: Datenstand für Seiten-Cache und ETags (siehe seiten.py)
+        self.stand = 0
+
+    def hole(self, schluessel, laden):
+        """Liefert den gecachten Wert oder ruft laden() auf und merkt sich das Ergebnis."""
+        jetzt = time.monotonic()
+        with self._lock:
+            eintrag = self._eintraege.get(schluessel)
+            if eintrag and eintrag[1] > jetzt:
+                self.treffer += 1
+                return eintrag[0]
+            self.fehlschlaege += 1
+            generation = (self._epoche, self._generationen.get(schluessel, 0))
+
+        wert = laden()
+        with self._lock:
+            # Nur speichern, wenn währenddessen niemand invalidiert hat
+            if (self._epoche, self._generationen.get(schluessel, 0)) == generation:
+                self._eintraege[schluessel] = (wert, jetzt + self.ttl)
+        return wert
+
+    def invalidieren(self, *schluessel):
+        with self._lock:
+            for s in schluessel:
+                self._eintraege.pop(s, None)
+                self._generationen[s] = self._generationen.get(s, 0) + 1
+            self.stand += 1
+
+    def leeren(self):
+        with self._lock:
+            self._epoche += 1
+            self._eintraege.clear()
+            self.stand += 1
+
+    def statistik(self):
+        with self._lock:
+            anfragen = self.treffer + self.fehlschlaege
+            return {
+                'treffer': self.treffer,
+                'fehlschlaege': self.fehlschlaege,
+                'trefferquote': self.treffer / anfragen if anfragen else 0.0,
+                'eintraege': len(self._eintraege),
+            }
+
+
+class SeitenCache:
+    """Fertig gerenderte Seiten als LRU mit fester Größe (siehe seiten.py).
+
+    Der Schlüssel enthält den Datenstand, invalidiert wird also nie: Nach einer
+    Änderung fragt niemand mehr nach dem alten Schlüssel, er fällt hinten raus.
+    """
+
+    def __init__(self, groesse=256):
+        self.groesse = groesse
+        self.treffer = 0
+        self.fehlschlaege = 0
+        self._lock = threading.Lock()
+        self._eintraege = OrderedDict()
+
+    def hole(self, schluessel):
+        with self._lock:
+            eintrag = self._eintraege.get(schluessel)
+            if eintrag is not None:
+                self._eintraege.move_to_end(schluessel)
+                self.treffer += 1
+            else:
+                self.fehlschlaege += 1
+            return eintrag
+
+    def eintragen(self, schluessel, eintrag):
+        with self._lock:
+            self._eintraege[schluessel] = eintrag
+            self._eintraege.move_to_end(schluessel)
+            if len(self._eintraege) > self.groesse:
+                self._eintraege.popitem(last=False)
+
+    def leeren(self):
+        with self._lock:
+            self._eintraege.clear()
+
+    def statistik(self):
+        with self._lock:
+            anfragen = self.treffer + self.fehlschlaege
+            return {
+                'treffer': self.treffer,
+                'fehlschlaege': self.fehlschlaege,
+                'trefferquote': self.treffer / anfragen if anfragen else 0.0,
+                'eintraege': len(self._eintraege),
+            }
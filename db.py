@@ -0,0 +1,102 @@
+import os
+import pathlib
+import sqlite3
+import threading
+
+import archiv
+import metriken
+import migrationen
+
+# --- ABSOLUTER PFAD ZUR DATENBANK (WICHTIG FÜR ECHTE SERVER) ---
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+DB_NAME = os.environ.get('KAFFEE_DB', os.path.join(BASE_DIR, "kaffee.db"))
+
+# Einmal pro Verbindung gesetzt. WAL erlaubt Lesen während geschrieben wird,
+# synchronous=NORMAL spart im WAL-Modus das fsync bei jedem Commit.
+PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -8000",      # 8 MB Page-Cache
+    "PRAGMA mmap_size = 67108864",    # 64 MB memory-mapped I/O
+    "PRAGMA busy_timeout = 5000",
+]
+# Replikate öffnen ihren Snapshot nur lesend: kein WAL, kein Schreiben (siehe replikation.py)
+PRAGMAS_NUR_LESEN = [
+    "PRAGMA cache_size = -8000",
+    "PRAGMA mmap_size = 67108864",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA query_only = 1",
+]
+# Von create_app() gesetzt, wenn der Prozess als Replikat läuft
+NUR_LESEN = False
+
+# Jeder Waitress-Worker-Thread behält seine eigene Verbindung (sqlite3-Verbindungen
+# dürfen nicht zwischen Threads geteilt werden).
+_lokal = threading.local()
+_schema_lock = threading.Lock()
+_schema_bereit = set()
+# Erhöht, wenn ein Replikat einen neuen Snapshot eingespielt hat: get_db() verbindet dann neu
+_stand = 0
+
+
+def verbinden(pfad=None, nur_lesen=False, archiv_verzeichnis=None):
+    """Öffnet eine neue Verbindung mit allen Pragmas. Für Skripte und Hintergrund-Threads.
+
+    archiv_verzeichnis: Ort der Archive, sonst archiv.VERZEICHNIS bzw. neben der DB.
+    """
+    # MessendeVerbindung zählt SQL-Anweisungen für /metrics, außerhalb von Requests ohne Aufwand
+    if nur_lesen:
+        conn = sqlite3.connect(pathlib.Path(os.path.abspath(pfad or DB_NAME)).as_uri() + '?mode=ro', uri=True,
+                               factory=metriken.MessendeVerbindung)
+    else:
+        conn = sqlite3.connect(pfad or DB_NAME, factory=metriken.MessendeVerbindung)
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS_NUR_LESEN if nur_lesen else PRAGMAS:
+        conn.execute(pragma)
+    # Alte Jahre von transaktionen liegen in eigenen Dateien (siehe archiv.py)
+    archiv.anhaengen(conn, pfad or DB_NAME, nur_lesen, archiv_verzeichnis)
+    return conn
+
+
+def neu_verbinden():
+    """Alle Threads holen sich beim nächsten get_db() eine frische Verbindung (neuer Snapshot)."""
+    global _stand
+    _stand += 1
+
+
+def normalisiere_uid(uid):
+    # Einheitliche Schreibweise für rfid_uid: ohne Leerzeichen, Großbuchstaben, leer = NULL
+    uid = (uid or '').replace(" ", "").upper()
+    return uid or None
+
+
+def init_schema(conn, nachlauf=True):
+    """Bringt das Schema auf den neuesten Stand (siehe migrationen.py)."""
+    migrationen.migrieren(conn, nachlauf=nachlauf)
+
+
+def get_db():
+    """Liefert die langlebige Verbindung des aktuellen Threads. Nicht schließen!"""
+    pfad = DB_NAME
+    conn = getattr(_lokal, 'conn', None)
+    if conn is None or _lokal.pfad != pfad or _lokal.stand != _stand:
+        if conn is not None:
+            conn.close()
+        conn = verbinden(pfad, nur_lesen=NUR_LESEN)
+        _lokal.conn, _lokal.pfad, _lokal.stand = conn, pfad, _stand
+
+    # Replikate migrieren nicht – ihr Schema kommt mit dem Snapshot vom Schreiber
+    if pfad not in _schema_bereit and not NUR_LESEN:
+        with _schema_lock:
+            if pfad not in _schema_bereit:
+                # Nachläufe der letzten Migration übernimmt im Server der Thread migrationen.Nachlauf
+                init_schema(conn, nachlauf=False)
+                _schema_bereit.add(pfad)
+    return conn
+
+
+def aufraeumen():
+    """Am Ende jedes Requests: offene Transaktion verwerfen, damit keine Sperre hängen bleibt."""
+    conn = getattr(_lokal, 'conn', None)
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
@@ -0,0 +1,142 @@
+import sqlite3
+import threading
+import time
+
+# --- FEHLGESCHLAGENE RFID-SCANS ---
+# Früher schrieb /api/check_card für jede unbekannte Karte eine WARNUNG-Zeile
+# mit eigenem Commit in transaktionen. Eine liegen gelassene Karte (der Kiosk
+# scannt alle 2 s neu) oder ein wackeliger Leser erzeugte so einen Strom von
+# fsyncs und Rauschen im Ledger, das jede Finanzabfrage mitlesen musste.
+#
+# Jetzt zählt FehlscanLog nur im Speicher: pro UID höchstens ein Ereignis je
+# FENSTER_S Sekunden, weitere Scans im selben Fenster erhöhen nur dessen
+# Zähler. Ein Hintergrund-Thread schreibt alle INTERVALL_S Sekunden alle
+# offenen Zähler in einer Transaktion nach scan_ereignisse (eigene Tabelle,
+# nicht im Ledger). Mehr als MAX_UIDS gleichzeitig verfolgte UIDs werden nur
+# noch als verworfen gezählt, damit ein Leser mit Zufalls-UIDs den Speicher
+# nicht füllt. Beim Beenden gehen höchstens die Zähler eines Intervalls verloren.
+
+FENSTER_S = 60
+INTERVALL_S = 30.0
+MAX_UIDS = 10000
+AUFBEWAHREN_TAGE = 90
+# Beschreibung der alten WARNUNG-Zeilen in transaktionen
+ALT_PRAEFIX = 'RFID Scan fehlgeschlagen: '
+
+
+def init_tabelle(conn):
+    """Legt scan_ereignisse an und übernimmt die alten WARNUNG-Zeilen (die selbst im Ledger bleiben)."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS scan_ereignisse (
+                        uid TEXT NOT NULL,
+                        beginn DATETIME NOT NULL,
+                        letzter DATETIME NOT NULL,
+                        anzahl INTEGER NOT NULL,
+                        PRIMARY KEY (uid, beginn)
+                    ) WITHOUT ROWID''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_scan_ereignisse_beginn ON scan_ereignisse (beginn)")
+    conn.execute('''INSERT OR IGNORE INTO scan_ereignisse (uid, beginn, letzter, anzahl)
+                    SELECT substr(beschreibung, ?), zeitstempel, zeitstempel, COUNT(*) FROM transaktionen
+                    WHERE typ = 'WARNUNG' AND beschreibung LIKE ? GROUP BY 1, 2''',
+                 (len(ALT_PRAEFIX) + 1, ALT_PRAEFIX + '%'))
+
+
+def _zeit(sekunden):
+    # Wie CURRENT_TIMESTAMP in SQLite: UTC, auf die Sekunde
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(sekunden))
+
+
+def top(conn, limit=20, tage=30):
+    """Häufigste unbekannte UIDs der letzten tage: [{'uid', 'scans', 'ereignisse', 'erster', 'letzter'}].
+
+    UIDs, die inzwischen einem User gehören, fallen heraus.
+    """
+    return conn.execute('''SELECT e.uid, SUM(e.anzahl) AS scans, COUNT(*) AS ereignisse,
+                                  MIN(e.beginn) AS erster, MAX(e.letzter) AS letzter
+                           FROM scan_ereignisse e
+                           WHERE e.beginn >= datetime('now', ?)
+                             AND e.uid NOT IN (SELECT rfid_uid FROM users WHERE rfid_uid IS NOT NULL)
+                           GROUP BY e.uid ORDER BY scans DESC LIMIT ?''', (f"-{int(tage)} days", limit)).fetchall()
+
+
+class FehlscanLog:
+    def __init__(self, verbinden, fenster=FENSTER_S, intervall=INTERVALL_S, max_uids=MAX_UIDS):
+        self.verbinden = verbinden
+        self.fenster = fenster
+        self.intervall = intervall
+        self.max_uids = max_uids
+        self.gemeldet = 0       # alle gemeldeten Scans
+        self.verworfen = 0      # wegen max_uids nicht erfasst
+        self.geschrieben = 0    # neue oder erhöhte Zeilen in scan_ereignisse
+        self._lock = threading.Lock()
+        self._fenster = {}      # uid -> Beginn des laufenden Fensters (time.time())
+        self._offen = {}        # (uid, beginn) -> [anzahl, letzter Scan], noch nicht geschrieben
+        self._thread = None
+
+    def melden(self, uid):
+        """Ein fehlgeschlagener Scan. Nur Speicher, kein DB-Zugriff."""
+        jetzt = time.time()
+        with self._lock:
+            self.gemeldet += 1
+            beginn = self._fenster.get(uid)
+            if beginn is None or jetzt - beginn >= self.fenster:
+                if beginn is None and len(self._fenster) >= self.max_uids:
+                    self.verworfen += 1
+                    return
+                beginn = self._fenster[uid] = jetzt
+            eintrag = self._offen.setdefault((uid, beginn), [0, jetzt])
+            eintrag[0] += 1
+            eintrag[1] = jetzt
+        self._starten()
+
+    def statistik(self):
+        with self._lock:
+            return {'gemeldet': self.gemeldet, 'verworfen': self.verworfen, 'geschrieben': self.geschrieben,
+                    'offen': len(self._offen)}
+
+    def schreiben(self, conn):
+        """Schreibt alle offenen Zähler in einer Transaktion. Gibt die Anzahl Zeilen zurück."""
+        jetzt = time.time()
+        with self._lock:
+            offen, self._offen = self._offen, {}
+            # Abgelaufene Fenster vergessen; der nächste Scan der UID beginnt ein neues
+            self._fenster = {uid: beginn for uid, beginn in self._fenster.items() if jetzt - beginn < self.fenster}
+        if not offen:
+            return 0
+        zeilen = [(uid, _zeit(beginn), _zeit(letzter), anzahl) for (uid, beginn), (anzahl, letzter) in offen.items()]
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Ein Fenster über zwei Intervalle hinweg landet in derselben Zeile
+            conn.executemany('''INSERT INTO scan_ereignisse (uid, beginn, letzter, anzahl) VALUES (?, ?, ?, ?)
+                                ON CONFLICT(uid, beginn) DO UPDATE SET anzahl = anzahl + excluded.anzahl,
+                                                                       letzter = excluded.letzter''', zeilen)
+            conn.execute("DELETE FROM scan_ereignisse WHERE beginn < datetime('now', ?)", (f"-{AUFBEWAHREN_TAGE} days",))
+            conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            # Zähler zurücklegen, der nächste Lauf versucht es erneut
+            with self._lock:
+                for schluessel, (anzahl, letzter) in offen.items():
+                    eintrag = self._offen.setdefault(schluessel, [0, letzter])
+                    eintrag[0] += anzahl
+                    eintrag[1] = max(eintrag[1], letzter)
+            raise
+        with self._lock:
+            self.geschrieben += len(zeilen)
+        return len(zeilen)
+
+    def _starten(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._schleife, name='fehlscans', daemon=True)
+                    self._thread.start()
+
+    def _schleife(self):
+        conn = self.verbinden()
+        while True:
+            time.sleep(self.intervall)
+            try:
+                self.schreiben(conn)
+            except sqlite3.Error as e:
+                print(f"Fehlscans schreiben fehlgeschlagen: {e}")
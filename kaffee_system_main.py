@@ -1,14 +1,16 @@
 import tkinter as tk
 from tkinter import messagebox
-from smartcard.System import readers
-from smartcard.util import toHexString
-import threading
-import time
-import requests
+import os
 import socket
+from kiosk_speicher import KioskSpeicher, SyncWorker
+from kiosk_io import UiQueue, HttpWorker, ServerListe, StallMonitor
+from rfid_leser import RfidLeser, PcscLeser, SimulierterLeser, stdin_einspeisen
 
 # --- KONFIGURATION ---
-SERVER_URL = "http://localhost:5000"
+# Mehrere Server kommagetrennt, bevorzugter zuerst (Schreiber, dann Replikate – siehe replikation.py)
+SERVER_URLS = os.environ.get('KAFFEE_SERVER', "http://localhost:5000").split(',')
+# Knopffarbe je Sorte (Produkte selbst kommen vom Server, siehe /api/produkte)
+SORTEN_FARBEN = {'Koffein': "#6f4e37", 'Entkoffeiniert': "#16a085"}
 
 def get_ip_address():
     """Ermittelt die lokale IP-Adresse im Netzwerk."""
@@ -21,6 +23,14 @@ def get_ip_address():
     except Exception:
         return "127.0.0.1 (Offline)"
 
+def rfid_backend():
+    # KAFFEE_RFID=sim: ohne Leser testen, UIDs kommen zeilenweise über stdin
+    if os.environ.get('KAFFEE_RFID') == 'sim':
+        leser = SimulierterLeser()
+        stdin_einspeisen(leser)
+        return leser
+    return PcscLeser()
+
 class KaffeeSystem:
     def __init__(self, master):
         self.master = master
@@ -33,15 +43,28 @@ class KaffeeSystem:
 
         # 2. Notausgang (Beenden mit ESC)
         def beenden(event=None):
+            self.rfid.stoppen()
             master.destroy()
         master.bind("<Escape>", beenden)
 
         # Variablen
         self.current_user = None 
-        self.running = True
-        self.rfid_cooldown = False
         self.timeout_job = None
 
+        # Lokaler Karten-Cache + Buchungs-Warteschlange, Sync läuft im Hintergrund
+        self.speicher = KioskSpeicher()
+        self.server = ServerListe(SERVER_URLS)
+        self.server.starten()
+        self.sync = SyncWorker(self.speicher, self.server)
+        self.sync.start()
+
+        # HTTP läuft nie im Tk-Thread: Ergebnisse kommen über die UiQueue zurück
+        self.ui_queue = UiQueue(master)
+        self.http = HttpWorker(self.server, self.ui_queue)
+        self.http.start()
+        if os.environ.get('KAFFEE_STALL_MONITOR'):
+            self.stall_monitor = StallMonitor(master)
+
         # --- NEU: DAUERHAFTER FOOTER (Immer sichtbar) ---
         # Dieser Balken wird ganz unten am Hauptfenster fixiert
         aktuelle_ip = get_ip_address()
@@ -64,81 +87,80 @@ class KaffeeSystem:
         self.lbl_start.pack(expand=True)
 
         # 2. AUSWAHLSEITE
-        self.frame_auswahl.columnconfigure(0, weight=1)
-        self.frame_auswahl.columnconfigure(1, weight=1)
         self.frame_auswahl.rowconfigure(1, weight=1)
 
         self.lbl_info = tk.Label(self.frame_auswahl, text="Lade...", 
                                  font=("Arial", 14, "bold"), bg="#bdc3c7", height=2)
-        self.lbl_info.grid(row=0, column=0, columnspan=2, sticky="nsew")
-
-        # Buttons
-        self.btn_schwarz = tk.Button(self.frame_auswahl, text="Kaffee\nmit Koffein\n(0.40€)", bg="#6f4e37", fg="white",
-                                     font=("Arial", 16, "bold"), command=lambda: self.buche_produkt("Kaffee mit Koffein", 0.40))
-        self.btn_schwarz.grid(row=1, column=0, sticky="nsew", padx=5, pady=5)
 
-        self.btn_decaf = tk.Button(self.frame_auswahl, text="Kaffee\nEntkoffeiniert\n(0.40€)", bg="#16a085", fg="white",
-                                   font=("Arial", 16, "bold"), command=lambda: self.buche_produkt("Kaffee Entkoffeiniert", 0.40))
-        self.btn_decaf.grid(row=1, column=1, sticky="nsew", padx=5, pady=5)
+        # Produkt-Buttons werden aus der lokalen Produktliste gebaut (siehe produkt_buttons_bauen)
+        self.produkt_buttons = []
+        self.angezeigte_produkte = None
         
         self.btn_logout = tk.Button(self.frame_auswahl, text="Abbrechen", bg="#c0392b", fg="white",
                                     font=("Arial", 14), command=self.logout)
-        self.btn_logout.grid(row=2, column=0, columnspan=2, sticky="ew", padx=5, pady=5)
+        self.produkt_buttons_bauen()
 
         # Startbildschirm initial anzeigen
         self.frame_start.pack(fill="both", expand=True)
 
-        # RFID Thread starten
-        self.rfid_thread = threading.Thread(target=self.rfid_loop, daemon=True)
-        self.rfid_thread.start()
+        # RFID-Leser starten: wartet blockierend auf aufgelegte Karten statt zu pollen
+        self.rfid = RfidLeser(rfid_backend(), lambda uid: self.ui_queue.post(self.karte_erkannt, uid))
+        self.rfid.start()
 
-    def rfid_loop(self):
-        while self.running:
-            if self.rfid_cooldown:
-                time.sleep(0.5)
-                continue
-                
-            try:
-                r = readers()
-                if not r:
-                    time.sleep(1)
-                    continue
-                
-                connection = r[0].createConnection()
-                connection.connect()
-                
-                data, sw1, sw2 = connection.transmit([0xFF, 0xCA, 0x00, 0x00, 0x00])
-                if sw1 == 0x90:
-                    uid_hex = toHexString(data).replace(" ", "")
-                    
-                    if self.current_user is None:
-                        self.master.after(0, lambda: self.check_karte_am_server(uid_hex))
-                        self.rfid_cooldown = True
-                        time.sleep(2)
-                        self.rfid_cooldown = False
-                        
-            except Exception:
-                pass
-            time.sleep(0.1)
+    def karte_erkannt(self, uid):
+        if self.current_user is None:
+            self.check_karte_am_server(uid)
 
     def check_karte_am_server(self, uid):
         print(f"Prüfe Karte: {uid}")
-        try:
-            response = requests.get(f"{SERVER_URL}/api/check_card/{uid}", timeout=2)
-            data = response.json()
-            
-            if data['status'] == 'ok':
-                self.current_user = data
-                self.show_auswahl()
-            else:
-                self.lbl_start.config(text=f"Karte Unbekannt!\nUID: {uid}", fg="red")
-                self.master.after(3000, lambda: self.lbl_start.config(text="Bitte Chip\nvorhalten...", fg="white"))
-                
-        except requests.exceptions.ConnectionError:
+        # Bekannte Karten werden lokal beantwortet – egal ob der Server erreichbar ist
+        lokal = self.speicher.karte(uid)
+        if lokal:
+            self.current_user = lokal
+            self.show_auswahl()
+            return
+
+        # Unbekannt im lokalen Cache: beim Server nachfragen, ohne den Touchscreen zu blockieren
+        self.lbl_start.config(text="Prüfe Karte...", fg="white")
+        self.http.anfrage('GET', f"/api/check_card/{uid}", lambda data, fehler: self.karte_antwort(uid, data, fehler))
+
+    def karte_antwort(self, uid, data, fehler):
+        if self.current_user is not None:
+            return
+        if fehler is not None:
             self.lbl_start.config(text="Server Fehler!", fg="orange")
             self.master.after(3000, lambda: self.lbl_start.config(text="Bitte Chip\nvorhalten...", fg="white"))
+        elif data['status'] == 'ok':
+            self.speicher.karte_merken(uid, data['user_id'], data['name'], data['saldo'])
+            self.current_user = self.speicher.karte(uid)
+            self.show_auswahl()
+        else:
+            self.lbl_start.config(text=f"Karte Unbekannt!\nUID: {uid}", fg="red")
+            self.master.after(3000, lambda: self.lbl_start.config(text="Bitte Chip\nvorhalten...", fg="white"))
+
+    def produkt_buttons_bauen(self):
+        produkte = self.speicher.produkte()
+        if produkte == self.angezeigte_produkte:
+            return
+        for btn in self.produkt_buttons:
+            btn.destroy()
+        self.produkt_buttons = []
+        spalten = max(len(produkte), 1)
+        for spalte in range(spalten):
+            self.frame_auswahl.columnconfigure(spalte, weight=1)
+        for spalte, produkt in enumerate(produkte):
+            text = f"{produkt['name'].replace(' ', chr(10), 1)}\n({produkt['preis']:.2f}€)"
+            btn = tk.Button(self.frame_auswahl, text=text, bg=SORTEN_FARBEN.get(produkt['sorte'], "#7f8c8d"), fg="white",
+                            font=("Arial", 16, "bold"), command=lambda p=produkt: self.buche_produkt(p))
+            btn.grid(row=1, column=spalte, sticky="nsew", padx=5, pady=5)
+            self.produkt_buttons.append(btn)
+        self.lbl_info.grid(row=0, column=0, columnspan=spalten, sticky="nsew")
+        self.btn_logout.grid(row=2, column=0, columnspan=spalten, sticky="ew", padx=5, pady=5)
+        self.angezeigte_produkte = produkte
 
     def show_auswahl(self):
+        # Preise/Produkte können sich beim Hintergrund-Abgleich geändert haben
+        self.produkt_buttons_bauen()
         self.frame_start.pack_forget()
         self.frame_auswahl.pack(fill="both", expand=True)
         
@@ -150,27 +172,19 @@ class KaffeeSystem:
             self.master.after_cancel(self.timeout_job)
         self.timeout_job = self.master.after(20000, self.logout)
 
-    def buche_produkt(self, produkt_name, preis):
+    def buche_produkt(self, produkt):
         if not self.current_user: return
         
         if self.timeout_job:
             self.master.after_cancel(self.timeout_job)
             self.timeout_job = None
         
-        payload = {
-            'user_id': self.current_user['user_id'],
-            'product': produkt_name,
-            'price': preis
-        }
-        
+        # Erst lokal vormerken, der SyncWorker reicht die Buchung an /api/book_bulk weiter
         try:
-            resp = requests.post(f"{SERVER_URL}/api/book", json=payload)
-            result = resp.json()
-            
-            if result['status'] == 'success':
-                new_saldo = result['new_saldo']
-                self.lbl_info.config(text=f"✅ {produkt_name}\nRest: {new_saldo:.2f} €", bg="#ffffaa")
-                self.master.after(2000, self.logout)
+            new_saldo = self.speicher.buchung_vormerken(self.current_user['user_id'], produkt)
+            self.sync.anstossen()
+            self.lbl_info.config(text=f"✅ {produkt['name']}\nRest: {new_saldo:.2f} €", bg="#ffffaa")
+            self.master.after(2000, self.logout)
                 
         except Exception as e:
             self.lbl_info.config(text="Buchungsfehler!", bg="red")
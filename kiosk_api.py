@@ -0,0 +1,224 @@
+import asyncio
+import json
+import queue
+import threading
+import time
+from http import HTTPStatus
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+import db
+
+# --- ASYNCIO-SERVER FÜR DIE KIOSK-API ---
+# Unter Waitress hält jeder laufende Request einen der THREADS Worker-Threads
+# fest, auch während er nur auf SQLite oder den Group Commit der Buchungen
+# wartet; mehr als connection_limit (100) Verbindungen nimmt Waitress gar
+# nicht erst an. Mit API_ASYNC_PORT startet app.py zusätzlich diesen Server:
+# ein asyncio-Thread, der beliebig viele ruhende Keep-Alive-Verbindungen hält
+# und die JSON-Routen der Kiosks (/api/check_card, /api/book, /api/book_bulk,
+# /api/cards, /api/produkte, /api/health) direkt bedient. Alles andere
+# (Seiten, Admin, Export) bleibt bei Waitress.
+#
+# Datenbankzugriffe laufen nicht im Event-Loop, sondern in einem einzigen
+# DB-Thread mit Warteschlange (DbThread); Coroutinen warten auf ein Future.
+# Buchungen gehen wie bisher an die BuchungsEngine, die ihr Ergebnis per
+# Callback in den Loop meldet – so landen viele gleichzeitige Buchungen im
+# selben Group Commit, statt sich hinter den Worker-Threads anzustellen.
+#
+# Die Routen selbst stehen in app.py (@kiosk_server.route) und teilen sich
+# Caches und Invalidierung mit den Flask-Routen.
+
+LEERLAUF_S = 75             # so lange darf eine Keep-Alive-Verbindung ruhen
+BODY_TIMEOUT_S = 10
+MAX_BODY = 1024 * 1024
+
+
+class HttpFehler(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Anfrage:
+    __slots__ = ('methode', 'ziel', 'pfad', 'args', 'kopf', 'body')
+
+    def __init__(self, methode, ziel, kopf, body=b''):
+        self.methode, self.ziel, self.kopf, self.body = methode, ziel, kopf, body
+        teile = urlsplit(ziel)
+        self.pfad = unquote(teile.path)
+        self.args = dict(parse_qsl(teile.query))
+
+    def json(self, silent=False):
+        """Body als JSON; wie Flasks get_json() 400 bei kaputtem JSON, mit silent=True None."""
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            if silent:
+                return None
+            raise HttpFehler(400, 'Ungültiges JSON') from None
+
+
+class DbThread:
+    """Ein Thread mit eigener Verbindung (db.get_db) führt funktion(conn, *args) nacheinander aus."""
+
+    def __init__(self):
+        self._auftraege = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    async def ausfuehren(self, funktion, *args):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._schleife, daemon=True, name='kiosk-api-db')
+                    self._thread.start()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._auftraege.put((funktion, args, loop, future))
+        return await future
+
+    def _schleife(self):
+        while True:
+            funktion, args, loop, future = self._auftraege.get()
+            try:
+                ergebnis, fehler = funktion(db.get_db(), *args), None
+            except Exception as e:
+                ergebnis, fehler = None, e
+            finally:
+                db.aufraeumen()
+            loop.call_soon_threadsafe(_setzen, future, ergebnis, fehler)
+
+
+def _setzen(future, ergebnis, fehler):
+    if future.done():
+        return
+    if fehler is not None:
+        future.set_exception(fehler)
+    else:
+        future.set_result(ergebnis)
+
+
+class KioskApi:
+    def __init__(self, messung=None):
+        self.messung = messung      # metriken.Metriken, Dauer und Status je Route
+        self.db = DbThread()
+        self.schreiber_url = None   # Replikat: schreibende Requests per 307 dorthin (siehe replikation.py)
+        self.port = None
+        self._routen = {}           # (methode, pfad) -> (funktion, route)
+        self._praefixe = []         # (methode, präfix, funktion, route) für Routen mit <parameter>
+
+    def route(self, methode, route):
+        """Decorator für async def funktion(anfrage[, parameter]) -> daten oder (daten, status).
+
+        route wie bei Flask; ein abschließendes '<name>' wird als Argument übergeben.
+        """
+        def registrieren(funktion):
+            if '<' in route:
+                self._praefixe.append((methode, route[:route.index('<')], funktion, route))
+            else:
+                self._routen[(methode, route)] = (funktion, route)
+            return funktion
+        return registrieren
+
+    def starten(self, host='0.0.0.0', port=5002):
+        """Startet den Server in einem Hintergrund-Thread mit eigenem Event-Loop."""
+        bereit = threading.Event()
+
+        def laufen():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            server = loop.run_until_complete(asyncio.start_server(self._verbindung, host, port, backlog=1024))
+            self.port = server.sockets[0].getsockname()[1]
+            bereit.set()
+            loop.run_forever()
+
+        threading.Thread(target=laufen, daemon=True, name='kiosk-api').start()
+        bereit.wait(5)
+
+    def _finden(self, methode, pfad):
+        treffer = self._routen.get((methode, pfad))
+        if treffer:
+            return treffer[0], treffer[1], ()
+        for m, praefix, funktion, route in self._praefixe:
+            if m == methode and pfad.startswith(praefix) and '/' not in pfad[len(praefix):]:
+                return funktion, route, (pfad[len(praefix):],)
+        return None, 'unbekannt', ()
+
+    async def _verbindung(self, reader, writer):
+        try:
+            while True:
+                try:
+                    # Eine ruhende Verbindung ist nur dieser wartende Task, kein Thread
+                    kopfdaten = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), LEERLAUF_S)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    break
+                zeilen = kopfdaten.decode('latin-1').split("\r\n")
+                teile = zeilen[0].split(" ")
+                if len(teile) != 3:
+                    await self._senden(writer, 400, {'status': 'error', 'message': 'Ungültige Anfrage'}, False)
+                    break
+                methode, ziel, version = teile
+                kopf = {}
+                for zeile in zeilen[1:]:
+                    if ":" in zeile:
+                        name, wert = zeile.split(":", 1)
+                        kopf[name.strip().lower()] = wert.strip()
+                verbindung = kopf.get('connection', '').lower()
+                keep_alive = verbindung != 'close' if version == 'HTTP/1.1' else verbindung == 'keep-alive'
+
+                try:
+                    laenge = int(kopf.get('content-length') or 0)
+                except ValueError:
+                    laenge = -1
+                if 'transfer-encoding' in kopf or not 0 <= laenge <= MAX_BODY:
+                    await self._senden(writer, 411, {'status': 'error', 'message': 'Content-Length fehlt oder zu groß'}, False)
+                    break
+                try:
+                    body = await asyncio.wait_for(reader.readexactly(laenge), BODY_TIMEOUT_S) if laenge else b''
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+                    break
+
+                daten, status, extra = await self._bearbeiten(Anfrage(methode, ziel, kopf, body))
+                await self._senden(writer, status, daten, keep_alive, extra)
+                if not keep_alive:
+                    break
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+    async def _bearbeiten(self, anfrage):
+        start = time.perf_counter()
+        funktion, route, args = self._finden(anfrage.methode, anfrage.pfad)
+        extra = {}
+        if self.schreiber_url and anfrage.methode not in ('GET', 'HEAD'):
+            daten, status = {'status': 'redirect'}, 307
+            extra['Location'] = self.schreiber_url.rstrip('/') + anfrage.ziel
+        elif funktion is None:
+            daten, status = {'status': 'error', 'message': 'Nicht gefunden'}, 404
+        else:
+            try:
+                ergebnis = await funktion(anfrage, *args)
+                daten, status = ergebnis if isinstance(ergebnis, tuple) else (ergebnis, 200)
+            except HttpFehler as e:
+                daten, status = {'status': 'error', 'message': str(e)}, e.status
+            except Exception as e:
+                print(f"Kiosk-API: {anfrage.methode} {route} fehlgeschlagen: {e}")
+                daten, status = {'status': 'error', 'message': 'Interner Fehler'}, 500
+        if self.messung:
+            self.messung.erfassen(route, anfrage.methode, status, time.perf_counter() - start)
+        return daten, status, extra
+
+    @staticmethod
+    async def _senden(writer, status, daten, keep_alive, extra=None):
+        body = json.dumps(daten, ensure_ascii=False).encode()
+        kopf = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+                "Content-Type: application/json", f"Content-Length: {len(body)}"]
+        kopf += [f"{name}: {wert}" for name, wert in (extra or {}).items()]
+        if not keep_alive:
+            kopf.append("Connection: close")
+        writer.write(("\r\n".join(kopf) + "\r\n\r\n").encode('latin-1') + body)
+        await writer.drain()
@@ -0,0 +1,161 @@
+import functools
+import queue
+import threading
+import time
+
+
+# --- NICHT-BLOCKIERENDE I/O FÜR DEN KIOSK ---
+# Tkinter ist nicht thread-sicher und friert ein, solange ein Callback läuft.
+# Deshalb macht ein eigener Thread alle HTTP-Anfragen (mit einer langlebigen
+# Keep-Alive-Session) und legt die Ergebnisse als Callbacks in eine Queue.
+# Der Tk-Thread holt sie alle paar Millisekunden per after() ab.
+
+
+class UiQueue:
+    """Thread-sichere Queue für Aufgaben, die im Tk-Thread laufen müssen."""
+
+    def __init__(self, master, intervall_ms=20):
+        self.master = master
+        self.intervall_ms = intervall_ms
+        self._queue = queue.Queue()
+        self.master.after(self.intervall_ms, self._abholen)
+
+    def post(self, funktion, *args):
+        """Aus beliebigen Threads aufrufbar."""
+        self._queue.put(functools.partial(funktion, *args))
+
+    def _abholen(self):
+        try:
+            while True:
+                self._queue.get_nowait()()
+        except queue.Empty:
+            pass
+        self.master.after(self.intervall_ms, self._abholen)
+
+
+class ServerListe:
+    """Mehrere Server-Endpunkte (Schreiber und Replikate) mit Health-Check und Failover.
+
+    aktuell() liefert den ersten gesunden Server in der konfigurierten Reihenfolge,
+    also den bevorzugten, sobald er wieder antwortet. Wer bei einer Anfrage einen
+    Fehler bekommt, meldet das mit fehler(url); der Server gilt dann bis zum
+    nächsten erfolgreichen Health-Check (/api/health) als ausgefallen.
+    """
+
+    def __init__(self, urls, pruef_intervall=10.0, timeout=1.0):
+        self.urls = [url.rstrip('/') for url in urls]
+        self.pruef_intervall = pruef_intervall
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._gesund = {url: True for url in self.urls}
+
+    def aktuell(self):
+        with self._lock:
+            # Sind alle ausgefallen, trotzdem den bevorzugten probieren statt gar nichts
+            return next((url for url in self.urls if self._gesund[url]), self.urls[0])
+
+    def alle_ab_aktuell(self):
+        """Reihenfolge für einen Versuch mit Failover: erst der aktuelle, dann die übrigen."""
+        erster = self.aktuell()
+        return [erster] + [url for url in self.urls if url != erster]
+
+    def fehler(self, url):
+        with self._lock:
+            if url in self._gesund:
+                self._gesund[url] = False
+
+    def starten(self):
+        if len(self.urls) > 1:
+            threading.Thread(target=self._pruefen, daemon=True, name='kiosk-health').start()
+
+    def _pruefen(self):
+        import requests
+        session = requests.Session()
+        while True:
+            for url in self.urls:
+                try:
+                    gesund = session.get(f"{url}/api/health", timeout=self.timeout).status_code == 200
+                except requests.exceptions.RequestException:
+                    gesund = False
+                with self._lock:
+                    self._gesund[url] = gesund
+            time.sleep(self.pruef_intervall)
+
+
+class HttpWorker(threading.Thread):
+    """Führt HTTP-Anfragen nacheinander aus und meldet Ergebnisse über die UiQueue.
+
+    callback(daten, fehler) wird im Tk-Thread aufgerufen: daten ist das JSON der
+    Antwort oder None, fehler die Exception oder None.
+    """
+
+    def __init__(self, server, ui_queue, timeout=2):
+        super().__init__(daemon=True, name='kiosk-http')
+        self.server = server    # ServerListe
+        self.ui_queue = ui_queue
+        self.timeout = timeout
+        self.session = None   # erst in run(), siehe dort
+        self._auftraege = queue.Queue()
+
+    def anfrage(self, methode, pfad, callback, **kwargs):
+        self._auftraege.put((methode, pfad, callback, kwargs))
+
+    def run(self):
+        # requests erst im Worker-Thread laden: spart beim Booten ~150 ms bis zur Oberfläche
+        import requests
+        self.session = requests.Session()
+        while True:
+            methode, pfad, callback, kwargs = self._auftraege.get()
+            kwargs.setdefault('timeout', self.timeout)
+            # Failover: bei Verbindungsfehlern gleich der nächste Server (nur GETs, also wiederholbar)
+            for url in self.server.alle_ab_aktuell():
+                try:
+                    resp = self.session.request(methode, f"{url}{pfad}", **kwargs)
+                    ergebnis, fehler = resp.json(), None
+                    break
+                except requests.exceptions.RequestException as e:
+                    self.server.fehler(url)
+                    ergebnis, fehler = None, e
+                except ValueError as e:
+                    ergebnis, fehler = None, e
+                    break
+            self.ui_queue.post(callback, ergebnis, fehler)
+
+
+class StallMonitor:
+    """Misst, wie lange der Tk-Event-Loop hängt.
+
+    Plant alle intervall_ms einen Tick ein; kommt der Tick zu spät, war der
+    Loop so lange blockiert. Alle bericht_s Sekunden wird eine Zusammenfassung
+    ausgegeben (Aktivierung in kaffee_system_main.py über KAFFEE_STALL_MONITOR=1).
+    """
+
+    def __init__(self, master, intervall_ms=16, schwelle_ms=50, bericht_s=60):
+        self.master = master
+        self.intervall = intervall_ms / 1000
+        self.schwelle = schwelle_ms / 1000
+        self.bericht_s = bericht_s
+        self.verzoegerungen = []
+        self._erwartet = time.perf_counter() + self.intervall
+        self._letzter_bericht = time.perf_counter()
+        self.master.after(intervall_ms, self._tick)
+
+    def _tick(self):
+        jetzt = time.perf_counter()
+        self.verzoegerungen.append(max(0.0, jetzt - self._erwartet))
+        if jetzt - self._letzter_bericht >= self.bericht_s:
+            print(self.bericht())
+            self.verzoegerungen = []
+            self._letzter_bericht = jetzt
+        self._erwartet = time.perf_counter() + self.intervall
+        self.master.after(int(self.intervall * 1000), self._tick)
+
+    def bericht(self):
+        werte = sorted(self.verzoegerungen)
+        if not werte:
+            return "UI-Stalls: keine Messwerte"
+        stalls = [w for w in werte if w >= self.schwelle]
+        p99 = werte[min(len(werte) - 1, int(0.99 * len(werte)))]
+        return (f"UI-Stalls: {len(stalls)} über {self.schwelle * 1000:.0f} ms, "
+                f"max {werte[-1] * 1000:.0f} ms, p99 {p99 * 1000:.1f} ms, "
+                f"Summe {sum(stalls):.2f} s in {len(werte)} Frames")
@@ -0,0 +1,201 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from standardprodukte import STANDARD
+
+# --- LOKALER SPEICHER DES KIOSKS (OFFLINE-BETRIEB) ---
+# Der Kiosk beantwortet einen Karten-Scan aus seinem lokalen Karten-Cache und
+# schreibt Buchungen zuerst in eine lokale Warteschlange (append-only).
+# Ein Hintergrund-Thread schickt die Warteschlange an /api/book_bulk. Jede
+# Buchung trägt eine UUID als Idempotenz-Schlüssel, der Server wendet sie
+# also genau einmal an – auch wenn eine Antwort unterwegs verloren geht.
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+KIOSK_DB = os.path.join(BASE_DIR, "kiosk.db")
+
+
+class KioskSpeicher:
+    def __init__(self, pfad=KIOSK_DB):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(pfad, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute('''CREATE TABLE IF NOT EXISTS karten (
+                                      uid TEXT PRIMARY KEY,
+                                      user_id INTEGER NOT NULL,
+                                      name TEXT,
+                                      saldo REAL,
+                                      aktualisiert DATETIME DEFAULT CURRENT_TIMESTAMP
+                                  )''')
+            self._conn.execute('''CREATE TABLE IF NOT EXISTS warteschlange (
+                                      id TEXT PRIMARY KEY,
+                                      user_id INTEGER NOT NULL,
+                                      produkt TEXT,
+                                      preis REAL,
+                                      zeit TEXT,
+                                      status TEXT DEFAULT 'offen',
+                                      meldung TEXT
+                                  )''')
+            if 'produkt_id' not in {row[1] for row in self._conn.execute("PRAGMA table_info(warteschlange)")}:
+                self._conn.execute("ALTER TABLE warteschlange ADD COLUMN produkt_id INTEGER")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_warteschlange_status ON warteschlange (status, zeit)")
+            # Knöpfe des Kiosks; bis zum ersten Abgleich mit /api/produkte die Standard-Produkte
+            self._conn.execute('''CREATE TABLE IF NOT EXISTS produkte (
+                                      id INTEGER PRIMARY KEY,
+                                      name TEXT,
+                                      preis REAL,
+                                      sorte TEXT
+                                  )''')
+            if not self._conn.execute("SELECT 1 FROM produkte").fetchone():
+                self._conn.executemany("INSERT INTO produkte (id, name, preis, sorte) VALUES (?, ?, ?, ?)", STANDARD)
+
+    def _offen_summe(self, user_id):
+        # Noch nicht beim Server angekommene Buchungen sind im gespeicherten Saldo nicht enthalten
+        return self._conn.execute("SELECT COALESCE(SUM(preis), 0) FROM warteschlange WHERE user_id = ? AND status = 'offen'",
+                                  (user_id,)).fetchone()[0]
+
+    def karte(self, uid):
+        """Lokaler Lookup: {'user_id', 'name', 'saldo'} inkl. offener Buchungen, oder None."""
+        with self._lock:
+            zeile = self._conn.execute("SELECT user_id, name, saldo FROM karten WHERE uid = ?", (uid,)).fetchone()
+            if zeile is None:
+                return None
+            return {'status': 'ok', 'user_id': zeile['user_id'], 'name': zeile['name'],
+                    'saldo': zeile['saldo'] - self._offen_summe(zeile['user_id'])}
+
+    def karte_merken(self, uid, user_id, name, saldo):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO karten (uid, user_id, name, saldo) VALUES (?, ?, ?, ?)",
+                               (uid, user_id, name, saldo))
+
+    def karten_ersetzen(self, karten):
+        """Kompletter Abgleich mit /api/cards (gelöschte User verschwinden lokal)."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM karten")
+            self._conn.executemany("INSERT OR REPLACE INTO karten (uid, user_id, name, saldo) VALUES (?, ?, ?, ?)",
+                                   [(k['uid'], k['user_id'], k['name'], k['saldo']) for k in karten])
+
+    def produkte(self):
+        with self._lock:
+            return [dict(z) for z in self._conn.execute("SELECT id, name, preis, sorte FROM produkte ORDER BY id")]
+
+    def produkte_ersetzen(self, produkte):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM produkte")
+            self._conn.executemany("INSERT INTO produkte (id, name, preis, sorte) VALUES (?, ?, ?, ?)",
+                                   [(p['id'], p['name'], p['preis'], p['sorte']) for p in produkte])
+
+    def buchung_vormerken(self, user_id, produkt):
+        """Legt die Buchung (produkt aus produkte()) in die Warteschlange und gibt den neuen (lokalen) Saldo zurück."""
+        zeit = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        preis = produkt['preis']
+        with self._lock, self._conn:
+            self._conn.execute("INSERT INTO warteschlange (id, user_id, produkt_id, produkt, preis, zeit) VALUES (?, ?, ?, ?, ?, ?)",
+                               (uuid.uuid4().hex, user_id, produkt['id'], produkt['name'], preis, zeit))
+            zeile = self._conn.execute("SELECT saldo FROM karten WHERE user_id = ?", (user_id,)).fetchone()
+            basis = zeile['saldo'] if zeile else 0.0
+            return basis - self._offen_summe(user_id)
+
+    def offene_buchungen(self, limit=50):
+        with self._lock:
+            return [dict(z) for z in self._conn.execute(
+                "SELECT id, user_id, produkt_id, produkt, preis, zeit FROM warteschlange WHERE status = 'offen' ORDER BY zeit LIMIT ?", (limit,))]
+
+    def bestaetigen(self, buchung_id, user_id, new_saldo, status='gesendet', meldung=None):
+        """Markiert eine Buchung als beim Server angekommen und übernimmt dessen Saldo."""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE warteschlange SET status = ?, meldung = ? WHERE id = ?", (status, meldung, buchung_id))
+            if new_saldo is not None:
+                self._conn.execute("UPDATE karten SET saldo = ?, aktualisiert = CURRENT_TIMESTAMP WHERE user_id = ?",
+                                   (new_saldo, user_id))
+
+    def anzahl_offen(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM warteschlange WHERE status = 'offen'").fetchone()[0]
+
+
+class SyncWorker(threading.Thread):
+    """Schickt die Warteschlange an den Server und hält den Karten-Cache aktuell."""
+
+    def __init__(self, speicher, server, intervall=5.0, karten_intervall=60.0):
+        super().__init__(daemon=True, name='kiosk-sync')
+        self.speicher = speicher
+        self.server = server    # kiosk_io.ServerListe
+        self.server_url = None
+        self.intervall = intervall
+        self.karten_intervall = karten_intervall
+        self.session = None   # erst in run(), siehe dort
+        self._wecker = threading.Event()
+        self._letzter_kartenabgleich = 0.0
+        self.online = False
+
+    def anstossen(self):
+        """Nach einer neuen Buchung sofort syncen statt auf das Intervall zu warten."""
+        self._wecker.set()
+
+    def run(self):
+        # requests erst im Worker-Thread laden: spart beim Booten ~150 ms bis zur Oberfläche
+        import requests
+        self.session = requests.Session()
+        while True:
+            # Pro Runde ein Server; Buchungen sind über ihre id idempotent, ein Wechsel mittendrin schadet nicht
+            self.server_url = self.server.aktuell()
+            try:
+                self.warteschlange_senden()
+                if time.monotonic() - self._letzter_kartenabgleich > self.karten_intervall:
+                    self.produkte_abgleichen()
+                    self.karten_abgleichen()
+                self.online = True
+            except requests.exceptions.RequestException:
+                self.server.fehler(self.server_url)
+                self.online = False
+            except ValueError:
+                self.online = False
+            self._wecker.wait(self.intervall)
+            self._wecker.clear()
+
+    def warteschlange_senden(self):
+        while True:
+            offen = self.speicher.offene_buchungen()
+            if not offen:
+                return
+            payload = {'buchungen': [{'id': b['id'], 'user_id': b['user_id'], 'produkt_id': b['produkt_id'],
+                                      'product': b['produkt'], 'price': b['preis'], 'zeit': b['zeit']} for b in offen]}
+            resp = self.session.post(f"{self.server_url}/api/book_bulk", json=payload, timeout=10)
+            resp.raise_for_status()
+            nach_id = {b['id']: b for b in offen}
+            erledigt = 0
+            for ergebnis in resp.json()['ergebnisse']:
+                buchung = nach_id.get(ergebnis.get('id'))
+                if buchung is None:
+                    continue
+                if ergebnis['status'] in ('ok', 'duplikat'):
+                    self.speicher.bestaetigen(buchung['id'], buchung['user_id'], ergebnis.get('new_saldo'))
+                    erledigt += 1
+                elif ergebnis['status'] == 'fehler':
+                    # Vom Server endgültig abgelehnt (z.B. User gelöscht) – nicht endlos wiederholen
+                    self.speicher.bestaetigen(buchung['id'], buchung['user_id'], None,
+                                              status='abgelehnt', meldung=ergebnis.get('message'))
+                    erledigt += 1
+                # 'spaeter' (Timeout, DB gesperrt) bleibt offen und geht in der nächsten Runde noch einmal raus
+            if erledigt < len(offen):
+                return
+
+    def produkte_abgleichen(self):
+        resp = self.session.get(f"{self.server_url}/api/produkte", timeout=10)
+        resp.raise_for_status()
+        self.speicher.produkte_ersetzen(resp.json()['produkte'])
+
+    def karten_abgleichen(self):
+        # Nur wenn nichts mehr offen ist, sonst würden offene Buchungen doppelt abgezogen
+        if self.speicher.anzahl_offen():
+            return
+        resp = self.session.get(f"{self.server_url}/api/cards", timeout=10)
+        resp.raise_for_status()
+        self.speicher.karten_ersetzen(resp.json()['karten'])
+        self._letzter_kartenabgleich = time.monotonic()
@@ -0,0 +1,172 @@
+import argparse
+import threading
+import time
+
+# --- KONTEN: LEDGER ALS WAHRHEIT, SALDO-STÄNDE ALS ABKÜRZUNG ---
+# transaktionen ist die Quelle der Wahrheit: Der Saldo eines Users ist die
+# Summe seiner Buchungen. users.saldo bleibt als schnell lesbare Kopie (Kiosk,
+# Admin-Übersicht) und wird bei jeder Buchung in derselben Transaktion
+# mitgeführt.
+#
+# Damit niemand die ganze Historie aufsummieren muss, schreibt stand_schreiben()
+# regelmäßig pro User einen Stand (Saldo bis einschließlich transaktion_id).
+# Saldo = letzter Stand + Summe der Buchungen danach – das sind nur die
+# Zeilen seit dem letzten Stand (Index idx_transaktionen_user_konto).
+#
+# abgleichen() vergleicht so users.saldo mit dem Ledger und meldet Abweichungen.
+
+TOLERANZ = 0.005
+
+# Saldo laut Ledger je User, jeweils ab dem letzten Stand gerechnet
+_LEDGER_SALDO = '''
+    SELECT u.id, u.name, u.saldo,
+           COALESCE(s.saldo, 0) + COALESCE((SELECT SUM(t.betrag) FROM transaktionen t
+                                            WHERE t.user_id = u.id AND t.id > COALESCE(s.transaktion_id, 0)
+                                              AND t.id <= :bis), 0) AS ledger
+    FROM users u
+    LEFT JOIN saldo_stand s ON s.user_id = u.id
+         AND s.transaktion_id = (SELECT MAX(transaktion_id) FROM saldo_stand WHERE user_id = u.id)
+'''
+
+
+def init_tabellen(conn):
+    """Legt saldo_stand an. Beim ersten Mal wird der Altbestand ins Ledger übernommen."""
+    vorhanden = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='saldo_stand'").fetchone()
+    conn.execute('''CREATE TABLE IF NOT EXISTS saldo_stand (
+                        user_id INTEGER NOT NULL,
+                        transaktion_id INTEGER NOT NULL,
+                        saldo REAL NOT NULL,
+                        zeitstempel DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        PRIMARY KEY (user_id, transaktion_id)
+                    ) WITHOUT ROWID''')
+    # Buchungen eines Users ab einer ID, deckend für SUM(betrag)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transaktionen_user_konto ON transaktionen (user_id, id, betrag)")
+    # Append-only: Beträge und Zuordnung gebuchter Zeilen ändern sich nie, Korrekturen sind neue Zeilen
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS transaktionen_nur_anhaengen_update
+                    BEFORE UPDATE OF user_id, betrag ON transaktionen
+                    BEGIN SELECT RAISE(ABORT, 'transaktionen ist append-only – Korrekturen als neue Buchung'); END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS transaktionen_nur_anhaengen_delete
+                    BEFORE DELETE ON transaktionen
+                    BEGIN SELECT RAISE(ABORT, 'transaktionen ist append-only – Korrekturen als neue Buchung'); END''')
+    if not vorhanden:
+        altbestand_uebernehmen(conn)
+        stand_schreiben(conn, alle=True)
+
+
+def altbestand_uebernehmen(conn):
+    """Einmalig: Saldo-Differenzen aus der Zeit vor dem Ledger (z.B. alte edit_user-Überschreibungen)
+    als KORREKTUR-Buchung festhalten, damit Summe(transaktionen) = users.saldo gilt."""
+    conn.execute('''INSERT INTO transaktionen (user_id, typ, beschreibung, betrag)
+                    SELECT u.id, 'KORREKTUR', 'Übernahme Altbestand', u.saldo - COALESCE(SUM(t.betrag), 0)
+                    FROM users u LEFT JOIN transaktionen t ON t.user_id = u.id
+                    GROUP BY u.id
+                    HAVING abs(u.saldo - COALESCE(SUM(t.betrag), 0)) > ?''', (TOLERANZ,))
+
+
+def korrektur_buchen(conn, user_id, neuer_saldo, beschreibung='Saldo-Korrektur (Admin)'):
+    """Setzt den Saldo über eine KORREKTUR-Buchung statt ihn zu überschreiben. Gibt die Differenz zurück."""
+    zeile = conn.execute("SELECT saldo FROM users WHERE id = ?", (user_id,)).fetchone()
+    if zeile is None:
+        return 0.0
+    differenz = round(neuer_saldo - zeile[0], 2)
+    if abs(differenz) > TOLERANZ:
+        conn.execute("UPDATE users SET saldo = saldo + ? WHERE id = ?", (differenz, user_id))
+        conn.execute("INSERT INTO transaktionen (user_id, typ, beschreibung, betrag) VALUES (?, 'KORREKTUR', ?, ?)",
+                     (user_id, beschreibung, differenz))
+    return differenz
+
+
+def kontostand(conn, user_id):
+    """Saldo laut Ledger: letzter Stand + Buchungen danach."""
+    stand = conn.execute('''SELECT transaktion_id, saldo FROM saldo_stand WHERE user_id = ?
+                            ORDER BY transaktion_id DESC LIMIT 1''', (user_id,)).fetchone()
+    bis_id, saldo = (stand[0], stand[1]) if stand else (0, 0.0)
+    delta = conn.execute("SELECT COALESCE(SUM(betrag), 0) FROM transaktionen WHERE user_id = ? AND id > ?",
+                         (user_id, bis_id)).fetchone()[0]
+    return saldo + delta
+
+
+def stand_schreiben(conn, alle=False):
+    """Neuer Stand für jeden User mit Buchungen seit seinem letzten Stand. Gibt die Anzahl zurück.
+
+    Läuft in einer Transaktion, damit die obere Grenze (höchste ID) zu den Summen passt.
+    """
+    eigene_transaktion = not conn.in_transaction
+    if eigene_transaktion:
+        conn.execute("BEGIN IMMEDIATE")
+    try:
+        bis = conn.execute("SELECT COALESCE(MAX(id), 0) FROM transaktionen").fetchone()[0]
+        neu = []
+        for user_id, _, _, ledger in conn.execute(_LEDGER_SALDO, {'bis': bis}).fetchall():
+            letzter = conn.execute("SELECT MAX(transaktion_id) FROM saldo_stand WHERE user_id = ?", (user_id,)).fetchone()[0]
+            if alle or letzter is None or conn.execute(
+                    "SELECT 1 FROM transaktionen WHERE user_id = ? AND id > ? AND id <= ? LIMIT 1", (user_id, letzter, bis)).fetchone():
+                neu.append((user_id, bis, ledger))
+        conn.executemany("INSERT OR REPLACE INTO saldo_stand (user_id, transaktion_id, saldo) VALUES (?, ?, ?)", neu)
+        if eigene_transaktion:
+            conn.commit()
+    except BaseException:
+        if eigene_transaktion:
+            conn.rollback()
+        raise
+    return len(neu)
+
+
+def abgleichen(conn):
+    """Vergleicht users.saldo mit dem Ledger. Gibt [{'user_id', 'name', 'saldo', 'ledger', 'differenz'}] zurück."""
+    # Ein Lese-Snapshot: Saldo-Update und Ledger-Zeile einer Buchung sind entweder beide drin oder beide nicht
+    eigene_transaktion = not conn.in_transaction
+    if eigene_transaktion:
+        conn.execute("BEGIN")
+    try:
+        bis = conn.execute("SELECT COALESCE(MAX(id), 0) FROM transaktionen").fetchone()[0]
+        zeilen = conn.execute(_LEDGER_SALDO, {'bis': bis}).fetchall()
+    finally:
+        if eigene_transaktion:
+            conn.rollback()
+    return [{'user_id': uid, 'name': name, 'saldo': saldo, 'ledger': round(ledger, 2), 'differenz': round(saldo - ledger, 2)}
+            for uid, name, saldo, ledger in zeilen if abs(saldo - ledger) > TOLERANZ]
+
+
+class Kontenpflege(threading.Thread):
+    """Schreibt im Hintergrund regelmäßig Saldo-Stände und gleicht danach ab."""
+
+    def __init__(self, verbinden, intervall=3600.0):
+        super().__init__(daemon=True, name='kontenpflege')
+        self.verbinden = verbinden
+        self.intervall = intervall
+        self.ergebnis = None    # {'zeit', 'staende', 'abweichungen'} des letzten Laufs
+
+    def run(self):
+        conn = self.verbinden()
+        while True:
+            try:
+                staende = stand_schreiben(conn)
+                abweichungen = abgleichen(conn)
+                self.ergebnis = {'zeit': time.strftime('%Y-%m-%d %H:%M:%S'), 'staende': staende, 'abweichungen': abweichungen}
+                for a in abweichungen:
+                    print(f"WARNUNG Kontenabgleich: {a['name']} (ID {a['user_id']}) weicht um {a['differenz']:+.2f} € vom Ledger ab")
+            except Exception as e:
+                print(f"Kontenpflege fehlgeschlagen: {e}")
+            time.sleep(self.intervall)
+
+
+if __name__ == '__main__':
+    import db
+
+    parser = argparse.ArgumentParser(description="Saldo-Stände schreiben und users.saldo gegen das Ledger prüfen.")
+    parser.add_argument('befehl', choices=['stand', 'abgleich'])
+    parser.add_argument('--db', default=db.DB_NAME)
+    args = parser.parse_args()
+
+    conn = db.verbinden(args.db)
+    db.init_schema(conn)
+    if args.befehl == 'stand':
+        print(f"✅ {stand_schreiben(conn)} neue Saldo-Stände geschrieben.")
+    abweichungen = abgleichen(conn)
+    conn.close()
+    for a in abweichungen:
+        print(f"❌ {a['name']} (ID {a['user_id']}): users.saldo {a['saldo']:.2f} €, Ledger {a['ledger']:.2f} € (Differenz {a['differenz']:+.2f} €)")
+    if abweichungen:
+        raise SystemExit(1)
+    print("✅ Alle Salden stimmen mit dem Ledger überein.")
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import threading
+from urllib.parse import urlsplit
+
+# --- LIVE-UPDATES PER SERVER-SENT EVENTS ---
+# Waitress hat nur wenige Worker-Threads; ein offener Event-Stream pro Tab würde
+# je einen davon dauerhaft blockieren. Deshalb laufen alle Streams in einem
+# einzigen asyncio-Thread mit eigenem Port, der beliebig viele ruhende
+# Verbindungen hält. app.py veröffentlicht Ereignisse thread-sicher über den Hub.
+#
+# Ereignisse:
+#   saldo     {'user_id', 'saldo'}        -> an diesen User und alle Admins
+#   stats     get_prediction_stats(...)   -> an alle (max. 1x pro Sekunde)
+#   finanzen  get_financial_health(...)   -> nur Admins (max. 1x pro Sekunde)
+
+HEARTBEAT_S = 15
+QUEUE_GROESSE = 100
+
+
+class _Abonnent:
+    __slots__ = ('user_id', 'is_admin', 'queue')
+
+    def __init__(self, user_id, is_admin):
+        self.user_id, self.is_admin = user_id, is_admin
+        self.queue = asyncio.Queue(QUEUE_GROESSE)
+
+
+class Hub:
+    def __init__(self, auth, quellen, intervall=1.0):
+        """auth(cookie_header) -> (user_id, is_admin) oder None. Läuft in einem Executor-Thread.
+        quellen: {name: (funktion, nur_admin)} für die gebündelt neu berechneten Ereignisse."""
+        self.auth = auth
+        self.quellen = quellen
+        self.intervall = intervall
+        self._loop = None
+        self._abonnenten = set()
+        self._veraltet = set()
+        self.port = None
+        # CORS nur für die eigene App (gleicher Hostname, Port app_port) und diese Origins
+        self.app_port = None
+        self.origins = set()
+
+    # --- Aufrufe aus den Flask-Threads ---
+
+    def aktiv(self):
+        return self._loop is not None and bool(self._abonnenten)
+
+    def saldo(self, user_id, saldo):
+        if self.aktiv():
+            self._loop.call_soon_threadsafe(self._verteilen, 'saldo', {'user_id': user_id, 'saldo': saldo}, user_id, False)
+
+    def markieren(self, *namen):
+        """Merkt Ereignisse zur Neuberechnung vor – mehrere Buchungen ergeben ein Update."""
+        if self.aktiv():
+            self._loop.call_soon_threadsafe(self._veraltet.update, namen)
+
+    # --- asyncio-Seite ---
+
+    def starten(self, host='0.0.0.0', port=5001):
+        """Startet den SSE-Server in einem Hintergrund-Thread."""
+        bereit = threading.Event()
+
+        def laufen():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            server = self._loop.run_until_complete(asyncio.start_server(self._verbindung, host, port))
+            self.port = server.sockets[0].getsockname()[1]
+            self._loop.create_task(self._neu_berechnen())
+            bereit.set()
+            self._loop.run_forever()
+
+        threading.Thread(target=laufen, daemon=True, name='sse').start()
+        bereit.wait(5)
+
+    def _verteilen(self, name, daten, user_id=None, nur_admin=False):
+        nachricht = f"event: {name}\ndata: {json.dumps(daten, ensure_ascii=False)}\n\n".encode()
+        for abonnent in list(self._abonnenten):
+            if nur_admin and not abonnent.is_admin:
+                continue
+            if user_id is not None and abonnent.user_id != user_id and not abonnent.is_admin:
+                continue
+            try:
+                abonnent.queue.put_nowait(nachricht)
+            except asyncio.QueueFull:
+                pass  # Langsamer Client: er bekommt beim nächsten Update wieder aktuelle Zahlen
+
+    async def _neu_berechnen(self):
+        while True:
+            await asyncio.sleep(self.intervall)
+            if not self._veraltet or not self._abonnenten:
+                continue
+            namen, self._veraltet = self._veraltet, set()
+            for name in namen:
+                funktion, nur_admin = self.quellen[name]
+                try:
+                    daten = await self._loop.run_in_executor(None, funktion)
+                except Exception as e:
+                    print(f"SSE: {name} konnte nicht berechnet werden: {e}")
+                    continue
+                self._verteilen(name, daten, nur_admin=nur_admin)
+
+    def _origin_erlaubt(self, origin, host):
+        if origin in self.origins:
+            return True
+        # Die Seite kommt von der App auf demselben Host (so baut app.sse_kontext die URL)
+        teile = urlsplit(origin)
+        try:
+            port = teile.port or {'http': 80, 'https': 443}.get(teile.scheme)
+        except ValueError:
+            return False
+        return self.app_port is not None and port == self.app_port and teile.hostname == urlsplit('//' + host).hostname
+
+    async def _verbindung(self, reader, writer):
+        try:
+            anfrage = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 10)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            writer.close()
+            return
+        zeilen = anfrage.decode('latin-1').split("\r\n")
+        teile = zeilen[0].split(" ")
+        kopf = {}
+        for zeile in zeilen[1:]:
+            if ":" in zeile:
+                name, wert = zeile.split(":", 1)
+                kopf[name.strip().lower()] = wert.strip()
+
+        cors = ""
+        if 'origin' in kopf and self._origin_erlaubt(kopf['origin'], kopf.get('host', '')):
+            cors = f"Access-Control-Allow-Origin: {kopf['origin']}\r\nAccess-Control-Allow-Credentials: true\r\nVary: Origin\r\n"
+        if len(teile) < 2 or teile[0] != 'GET' or teile[1].split('?')[0] != '/api/stream':
+            writer.write(f"HTTP/1.1 404 Not Found\r\n{cors}Content-Length: 0\r\nConnection: close\r\n\r\n".encode())
+            await self._schliessen(writer)
+            return
+
+        user = await self._loop.run_in_executor(None, self.auth, kopf.get('cookie', ''))
+        if user is None:
+            writer.write(f"HTTP/1.1 401 Unauthorized\r\n{cors}Content-Length: 0\r\nConnection: close\r\n\r\n".encode())
+            await self._schliessen(writer)
+            return
+
+        writer.write(("HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                      f"{cors}Connection: keep-alive\r\n\r\nretry: 5000\n\n").encode())
+        abonnent = _Abonnent(*user)
+        self._abonnenten.add(abonnent)
+        try:
+            while True:
+                try:
+                    nachricht = await asyncio.wait_for(abonnent.queue.get(), HEARTBEAT_S)
+                except asyncio.TimeoutError:
+                    nachricht = b": ping\n\n"
+                writer.write(nachricht)
+                await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self._abonnenten.discard(abonnent)
+            await self._schliessen(writer)
+
+    @staticmethod
+    async def _schliessen(writer):
+        try:
+            writer.close()
+            await writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+    def anzahl_abonnenten(self):
+        return len(self._abonnenten)
@@ -0,0 +1,214 @@
+import argparse
+import csv
+import io
+import json
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import generate_password_hash
+
+import db
+import statistik
+
+# --- MASSENIMPORT (USER, EINZAHLUNGEN, BOHNEN) ---
+# Statt jede Zeile einzeln über admin_action zu schicken (eigener Request,
+# eigener Commit), wird eine ganze Datei in EINER Transaktion eingespielt.
+# Jede Zeile wird vorab geprüft; fehlerhafte Zeilen landen mit Zeilennummer
+# in der Fehlerliste, der Rest des Stapels wird trotzdem gebucht.
+#
+# Spalten (CSV mit Kopfzeile oder JSON-Liste von Objekten):
+#   users         name, password, rfid (optional), is_admin (optional)
+#   einzahlungen  user (Name oder ID), betrag, beschreibung (optional)
+#   bohnen        user (Name oder ID), menge, preis, sorte
+
+ARTEN = ('users', 'einzahlungen', 'bohnen')
+SORTEN_NAMEN = {sorte for sorte, _, _ in statistik.SORTEN}
+
+# Ab so vielen Passwörtern lohnt sich der Start eines Prozess-Pools
+POOL_AB = 4
+
+
+class ImportFehler(ValueError):
+    pass
+
+
+def lesen(inhalt, dateiname=''):
+    """Liest CSV oder JSON (nach Endung bzw. erstem Zeichen) zu einer Liste von dicts."""
+    if isinstance(inhalt, bytes):
+        inhalt = inhalt.decode('utf-8-sig')
+    if dateiname.lower().endswith('.json') or inhalt.lstrip().startswith(('[', '{')):
+        daten = json.loads(inhalt)
+        if isinstance(daten, dict):
+            daten = daten.get('zeilen', [])
+        if not isinstance(daten, list) or not all(isinstance(z, dict) for z in daten):
+            raise ImportFehler("JSON muss eine Liste von Objekten sein")
+        return daten
+    return list(csv.DictReader(io.StringIO(inhalt), delimiter=';' if inhalt.split('\n', 1)[0].count(';') else ','))
+
+
+def passwoerter_hashen(passwoerter, prozesse=None):
+    """generate_password_hash ist absichtlich langsam – große Stapel laufen parallel auf allen Kernen."""
+    if len(passwoerter) < POOL_AB:
+        return [generate_password_hash(pw) for pw in passwoerter]
+    prozesse = prozesse or min(os.cpu_count() or 1, len(passwoerter))
+    # spawn statt fork: der Server hat zu diesem Zeitpunkt Threads (Waitress, Buchungen,
+    # Hub), ein geforktes Kind erbt deren gehaltene Locks und kann ewig hängen
+    with ProcessPoolExecutor(prozesse, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return list(pool.map(generate_password_hash, passwoerter, chunksize=max(1, len(passwoerter) // (prozesse * 4))))
+
+
+def _text(zeile, feld, pflicht=True):
+    wert = zeile.get(feld)
+    wert = '' if wert is None else str(wert).strip()
+    if pflicht and not wert:
+        raise ImportFehler(f"'{feld}' fehlt")
+    return wert
+
+
+def _zahl(zeile, feld, typ=float):
+    try:
+        wert = typ(str(zeile.get(feld, '')).strip().replace(',', '.'))
+    except ValueError:
+        raise ImportFehler(f"'{feld}' ist keine Zahl: {zeile.get(feld)!r}")
+    # float() nimmt auch 'nan' und 'inf'; NaN landet als NULL in saldo, inf macht ihn unbrauchbar
+    if not math.isfinite(wert):
+        raise ImportFehler(f"'{feld}' ist keine endliche Zahl: {zeile.get(feld)!r}")
+    return wert
+
+
+def _user_finden(zeile, nach_name, ids):
+    ref = _text(zeile, 'user')
+    if ref.isdigit() and int(ref) in ids:
+        return int(ref)
+    if ref in nach_name:
+        return nach_name[ref]
+    raise ImportFehler(f"Unbekannter User: {ref}")
+
+
+def _pruefen(zeilen, pruefer):
+    """Ruft pruefer(zeile) für jede Zeile auf und trennt gültige Ergebnisse von Fehlern."""
+    gueltig, fehler = [], []
+    for nr, zeile in enumerate(zeilen, start=1):
+        try:
+            gueltig.append(pruefer(zeile))
+        except ImportFehler as e:
+            fehler.append({'zeile': nr, 'message': str(e)})
+    return gueltig, fehler
+
+
+def _users(conn, zeilen, hashes):
+    namen = {r[0] for r in conn.execute("SELECT name FROM users")}
+    karten = {r[0] for r in conn.execute("SELECT rfid_uid FROM users WHERE rfid_uid IS NOT NULL")}
+
+    def pruefer(nr_zeile):
+        nr, zeile = nr_zeile
+        name, _ = _text(zeile, 'name'), _text(zeile, 'password')
+        rfid = db.normalisiere_uid(_text(zeile, 'rfid', pflicht=False))
+        if name in namen:
+            raise ImportFehler(f"Name existiert schon: {name}")
+        if rfid is not None and rfid in karten:
+            raise ImportFehler(f"RFID existiert schon: {rfid}")
+        namen.add(name)
+        if rfid is not None:
+            karten.add(rfid)
+        is_admin = _text(zeile, 'is_admin', pflicht=False).lower() in ('1', 'true', 'ja')
+        return name, hashes[nr], rfid, int(is_admin)
+
+    gueltig, fehler = _pruefen(list(enumerate(zeilen)), pruefer)
+    conn.executemany("INSERT INTO users (name, password_hash, rfid_uid, is_admin) VALUES (?, ?, ?, ?)", gueltig)
+    return len(gueltig), fehler, []
+
+
+def _einzahlungen(conn, zeilen, nach_name, ids):
+    def pruefer(zeile):
+        uid, betrag = _user_finden(zeile, nach_name, ids), _zahl(zeile, 'betrag')
+        if betrag == 0:
+            raise ImportFehler("'betrag' ist 0")
+        # Gleiche Typen und Texte wie geld_ein in admin_action
+        if betrag < 0:
+            return uid, betrag, 'AUSZAHLUNG', _text(zeile, 'beschreibung', pflicht=False) or 'Barauszahlung'
+        return uid, betrag, 'EINZAHLUNG', _text(zeile, 'beschreibung', pflicht=False) or 'Bar Einzahlung'
+
+    gueltig, fehler = _pruefen(zeilen, pruefer)
+    conn.executemany("UPDATE users SET saldo = saldo + ? WHERE id = ?", [(b, uid) for uid, b, _, _ in gueltig])
+    conn.executemany("INSERT INTO transaktionen (user_id, typ, beschreibung, betrag) VALUES (?, ?, ?, ?)",
+                     [(uid, typ, text, b) for uid, b, typ, text in gueltig])
+    return len(gueltig), fehler, [uid for uid, _, _, _ in gueltig]
+
+
+def _bohnen(conn, zeilen, nach_name, ids):
+    def pruefer(zeile):
+        uid = _user_finden(zeile, nach_name, ids)
+        menge, preis, sorte = _zahl(zeile, 'menge', int), _zahl(zeile, 'preis'), _text(zeile, 'sorte')
+        if menge <= 0:
+            raise ImportFehler("'menge' muss positiv sein")
+        if sorte not in SORTEN_NAMEN:
+            raise ImportFehler(f"Unbekannte Sorte: {sorte}")
+        return uid, menge, preis, sorte
+
+    gueltig, fehler = _pruefen(zeilen, pruefer)
+    conn.executemany("INSERT INTO bohnen_log (user_id, menge_gramm, preis, sorte) VALUES (?, ?, ?, ?)", gueltig)
+    conn.executemany("UPDATE users SET saldo = saldo + ? WHERE id = ?", [(p, uid) for uid, _, p, _ in gueltig])
+    conn.executemany("INSERT INTO transaktionen (user_id, typ, beschreibung, betrag) VALUES (?, 'BOHNEN', ?, ?)",
+                     [(uid, f'Bohnen {m}g ({s})', p) for uid, m, p, s in gueltig])
+    # Summen-Tabelle einmal pro Sorte statt einmal pro Lieferung anfassen
+    je_sorte = {}
+    for _, menge, _, sorte in gueltig:
+        je_sorte[sorte] = je_sorte.get(sorte, 0) + menge
+    for sorte, menge in je_sorte.items():
+        statistik.buche_bohnen(conn, sorte, menge)
+    return len(gueltig), fehler, [uid for uid, _, _, _ in gueltig]
+
+
+def importieren(conn, art, zeilen):
+    """Spielt einen Stapel in einer Transaktion ein.
+
+    Ergebnis: {'importiert': n, 'fehler': [{'zeile', 'message'}], 'user_ids': [...]}.
+    """
+    if art not in ARTEN:
+        raise ImportFehler(f"Unbekannte Art: {art}")
+    if art == 'users':
+        # Hashen vor der Schreibsperre: das dauert Sekunden, in der Zeit soll der Kiosk weiter buchen können
+        hashes = passwoerter_hashen([_text(z, 'password', pflicht=False) for z in zeilen])
+    if conn.in_transaction:
+        conn.commit()
+    # IMMEDIATE: Schreibsperre vor der Prüfung, damit niemand zwischen Prüfen und Schreiben dazwischenfunkt
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if art == 'users':
+            anzahl, fehler, user_ids = _users(conn, zeilen, hashes)
+        else:
+            nach_name, ids = {}, set()
+            for uid, name in conn.execute("SELECT id, name FROM users"):
+                nach_name[name] = uid
+                ids.add(uid)
+            funktion = _einzahlungen if art == 'einzahlungen' else _bohnen
+            anzahl, fehler, user_ids = funktion(conn, zeilen, nach_name, ids)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return {'importiert': anzahl, 'fehler': fehler, 'user_ids': sorted(set(user_ids))}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="User, Einzahlungen oder Bohnen-Lieferungen aus CSV/JSON importieren.")
+    parser.add_argument('art', choices=ARTEN)
+    parser.add_argument('datei')
+    parser.add_argument('--db', default=db.DB_NAME)
+    args = parser.parse_args()
+
+    with open(args.datei, 'rb') as f:
+        zeilen = lesen(f.read(), args.datei)
+    conn = db.verbinden(args.db)
+    db.init_schema(conn)
+    ergebnis = importieren(conn, args.art, zeilen)
+    conn.close()
+    for f in ergebnis['fehler']:
+        print(f"❌ Zeile {f['zeile']}: {f['message']}")
+    print(f"✅ {ergebnis['importiert']} von {len(zeilen)} Zeilen importiert.")
+    # Ein laufender Server hält Karten und Salden im Cache – dort besser /admin/import nutzen
+    if ergebnis['fehler']:
+        raise SystemExit(1)
@@ -0,0 +1,215 @@
+import bisect
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+
+# --- METRIKEN & PROFILER ---
+# Pro Request werden Dauer, Anzahl und Zeit der SQL-Anweisungen gemessen und
+# je Route aufsummiert; /metrics gibt alles im Prometheus-Textformat aus.
+# Die SQL-Messung steckt in MessendeVerbindung: db.verbinden() legt alle
+# Verbindungen mit dieser Klasse an, gezählt wird aber nur, solange im
+# aktuellen Thread ein Request läuft.
+#
+# Profiler (nur mit KAFFEE_PROFIL_MS=<Schwelle>): Ein Hintergrund-Thread tastet
+# alle paar Millisekunden die Stacks der laufenden Requests ab. Dauert ein
+# Request länger als die Schwelle, landen seine Stacks im "collapsed"-Format
+# (flamegraph.pl, speedscope) in profile/.
+
+DAUER_GRENZEN = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SQL_GRENZEN = (0, 1, 2, 5, 10, 20, 50, 100)
+
+_lokal = threading.local()
+
+
+class _Histogramm:
+    __slots__ = ('grenzen', 'eimer', 'summe', 'anzahl')
+
+    def __init__(self, grenzen):
+        self.grenzen = grenzen
+        self.eimer = [0] * (len(grenzen) + 1)   # letzter Eimer = +Inf
+        self.summe = 0.0
+        self.anzahl = 0
+
+    def beobachten(self, wert):
+        self.eimer[bisect.bisect_left(self.grenzen, wert)] += 1
+        self.summe += wert
+        self.anzahl += 1
+
+    def zeilen(self, name, labels):
+        kumuliert = 0
+        for grenze, n in zip(list(self.grenzen) + ['+Inf'], self.eimer):
+            kumuliert += n
+            yield f'{name}_bucket{{{labels},le="{grenze}"}} {kumuliert}'
+        yield f'{name}_sum{{{labels}}} {self.summe:.6f}'
+        yield f'{name}_count{{{labels}}} {self.anzahl}'
+
+
+class _Anfrage:
+    __slots__ = ('start', 'sql_anzahl', 'sql_zeit', 'stacks')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sql_anzahl = 0
+        self.sql_zeit = 0.0
+        self.stacks = None
+
+
+class MessendeVerbindung(sqlite3.Connection):
+    """sqlite3-Verbindung, die execute/executemany dem laufenden Request zurechnet."""
+
+    def execute(self, *args, **kwargs):
+        anfrage = getattr(_lokal, 'anfrage', None)
+        if anfrage is None:
+            return super().execute(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return super().execute(*args, **kwargs)
+        finally:
+            anfrage.sql_anzahl += 1
+            anfrage.sql_zeit += time.perf_counter() - start
+
+    def executemany(self, *args, **kwargs):
+        anfrage = getattr(_lokal, 'anfrage', None)
+        if anfrage is None:
+            return super().executemany(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return super().executemany(*args, **kwargs)
+        finally:
+            anfrage.sql_anzahl += 1
+            anfrage.sql_zeit += time.perf_counter() - start
+
+
+def _label(wert):
+    return str(wert).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metriken:
+    def __init__(self, profil_ms=None, profil_verzeichnis='profile', abtastung_ms=5):
+        self.profil_ms = profil_ms
+        self.profil_verzeichnis = profil_verzeichnis
+        self.abtastung = abtastung_ms / 1000
+        self._lock = threading.Lock()
+        self._dauer = {}        # (route, methode) -> _Histogramm
+        self._sql = {}          # route -> _Histogramm (Anweisungen pro Request)
+        self._sql_zeit = Counter()
+        self._status = Counter()  # (route, methode, status) -> Anzahl
+        self._caches = {}
+        self._laufend = {}      # Thread-ID -> _Anfrage (nur mit Profiler)
+        self._abtaster = None
+
+    def cache_registrieren(self, name, cache):
+        """cache braucht eine Methode statistik() -> {'treffer', 'fehlschlaege', 'eintraege', ...}."""
+        self._caches[name] = cache
+
+    # --- Request-Hooks (before_request / teardown_request in app.py) ---
+
+    def anfrage_start(self):
+        anfrage = _lokal.anfrage = _Anfrage()
+        if self.profil_ms is not None:
+            anfrage.stacks = Counter()
+            with self._lock:
+                self._laufend[threading.get_ident()] = anfrage
+            self._abtaster_starten()
+
+    def anfrage_ende(self, route, methode, status):
+        anfrage = getattr(_lokal, 'anfrage', None)
+        if anfrage is None:
+            return None
+        _lokal.anfrage = None
+        dauer = time.perf_counter() - anfrage.start
+        with self._lock:
+            self._laufend.pop(threading.get_ident(), None)
+            self._dauer_erfassen(route, methode, status, dauer)
+            if route not in self._sql:
+                self._sql[route] = _Histogramm(SQL_GRENZEN)
+            self._sql[route].beobachten(anfrage.sql_anzahl)
+            self._sql_zeit[route] += anfrage.sql_zeit
+        if anfrage.stacks is not None and dauer * 1000 >= self.profil_ms:
+            self._profil_schreiben(route, dauer, anfrage)
+        return dauer, anfrage.sql_anzahl, anfrage.sql_zeit
+
+    def erfassen(self, route, methode, status, dauer):
+        """Für Requests außerhalb von Flask (kiosk_api.py): nur Dauer und Status, keine SQL-Messung."""
+        with self._lock:
+            self._dauer_erfassen(route, methode, status, dauer)
+
+    def _dauer_erfassen(self, route, methode, status, dauer):
+        histogramm = self._dauer.get((route, methode))
+        if histogramm is None:
+            histogramm = self._dauer[(route, methode)] = _Histogramm(DAUER_GRENZEN)
+        histogramm.beobachten(dauer)
+        self._status[(route, methode, status)] += 1
+
+    # --- Profiler ---
+
+    def _abtaster_starten(self):
+        if self._abtaster is None:
+            with self._lock:
+                if self._abtaster is None:
+                    self._abtaster = threading.Thread(target=self._abtasten, daemon=True, name='profiler')
+                    self._abtaster.start()
+
+    def _abtasten(self):
+        while True:
+            time.sleep(self.abtastung)
+            with self._lock:
+                laufend = dict(self._laufend)
+            if not laufend:
+                continue
+            frames = sys._current_frames()
+            for ident, anfrage in laufend.items():
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if stack:
+                    anfrage.stacks[';'.join(reversed(stack))] += 1
+
+    def _profil_schreiben(self, route, dauer, anfrage):
+        os.makedirs(self.profil_verzeichnis, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}_{route.strip('/').replace('/', '_') or 'root'}_{dauer * 1000:.0f}ms.folded"
+        pfad = os.path.join(self.profil_verzeichnis, name.replace('<', '').replace('>', ''))
+        with open(pfad, 'w', encoding='utf-8') as f:
+            for stack, anzahl in anfrage.stacks.most_common():
+                f.write(f"{stack} {anzahl}\n")
+        print(f"Profil: {route} {dauer * 1000:.0f} ms, {anfrage.sql_anzahl} SQL-Anweisungen "
+              f"({anfrage.sql_zeit * 1000:.1f} ms) -> {pfad}")
+
+    # --- Ausgabe ---
+
+    def text(self):
+        """Alle Metriken im Prometheus-Textformat (Version 0.0.4)."""
+        zeilen = []
+        with self._lock:
+            zeilen += ["# HELP kaffee_http_request_duration_seconds Dauer der Requests je Route.",
+                       "# TYPE kaffee_http_request_duration_seconds histogram"]
+            for (route, methode), histogramm in sorted(self._dauer.items()):
+                zeilen += histogramm.zeilen('kaffee_http_request_duration_seconds',
+                                            f'route="{_label(route)}",method="{methode}"')
+            zeilen += ["# HELP kaffee_http_requests_total Requests je Route und Status.",
+                       "# TYPE kaffee_http_requests_total counter"]
+            for (route, methode, status), anzahl in sorted(self._status.items()):
+                zeilen.append(f'kaffee_http_requests_total{{route="{_label(route)}",method="{methode}",status="{status}"}} {anzahl}')
+            zeilen += ["# HELP kaffee_sql_statements_per_request SQL-Anweisungen pro Request je Route.",
+                       "# TYPE kaffee_sql_statements_per_request histogram"]
+            for route, histogramm in sorted(self._sql.items()):
+                zeilen += histogramm.zeilen('kaffee_sql_statements_per_request', f'route="{_label(route)}"')
+            zeilen += ["# HELP kaffee_sql_seconds_total Zeit in SQL-Anweisungen je Route.",
+                       "# TYPE kaffee_sql_seconds_total counter"]
+            for route, sekunden in sorted(self._sql_zeit.items()):
+                zeilen.append(f'kaffee_sql_seconds_total{{route="{_label(route)}"}} {sekunden:.6f}')
+
+        statistiken = {name: cache.statistik() for name, cache in self._caches.items()}
+        for metrik, feld, typ, hilfe in (('kaffee_cache_hits_total', 'treffer', 'counter', 'Cache-Treffer.'),
+                                         ('kaffee_cache_misses_total', 'fehlschlaege', 'counter', 'Cache-Fehlschläge.'),
+                                         ('kaffee_cache_entries', 'eintraege', 'gauge', 'Einträge im Cache.')):
+            zeilen += [f"# HELP {metrik} {hilfe}", f"# TYPE {metrik} {typ}"]
+            for name, statistik in sorted(statistiken.items()):
+                zeilen.append(f'{metrik}{{cache="{_label(name)}"}} {statistik[feld]}')
+        return '\n'.join(zeilen) + '\n'
@@ -0,0 +1,230 @@
+import argparse
+import threading
+import time
+
+import archiv
+import fehlscans
+import konten
+import produkte
+import statistik
+
+# --- SCHEMA-MIGRATIONEN ---
+# Früher hat setup_db.py die Datenbank gelöscht und neu angelegt, und
+# db.init_schema hat bei jedem Start per CREATE ... IF NOT EXISTS / ALTER
+# nachgebessert. Jetzt ist jede Schemaänderung eine nummerierte Migration;
+# PRAGMA user_version merkt sich, welche schon gelaufen sind. Jede Migration
+# läuft genau einmal, in einer Transaktion zusammen mit dem Hochzählen der
+# Version – bricht sie ab, bleibt die DB auf dem alten Stand.
+#
+# Datenänderungen über ganz transaktionen (Backfills) laufen nicht in dieser
+# Transaktion, sondern als "Nachlauf" in Blöcken von BLOCK IDs mit je eigener
+# kurzer Transaktion, damit Buchungen dazwischen durchkommen. Der Fortschritt
+# steht in schema_nachlauf, ein abgebrochener Nachlauf macht beim nächsten
+# Start weiter. Der Nachlauf einer Migration ist fertig, bevor die nächste
+# Migration startet; nur der Nachlauf der jeweils letzten Migration läuft im
+# laufenden Server (Thread Nachlauf) – Code muss also mit halb nachgefüllten
+# Daten dieser Migration zurechtkommen.
+#
+# Neue Migration: hinten an MIGRATIONEN anhängen, nie bestehende ändern.
+
+BLOCK = 2000
+
+
+def _grundschema(conn):
+    # Die Tabellen aus dem alten setup_db.py; bestehende DBs haben sie schon
+    conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute('''CREATE TABLE IF NOT EXISTS users (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        name TEXT NOT NULL UNIQUE,
+                        rfid_uid TEXT UNIQUE,
+                        password_hash TEXT,
+                        is_admin INTEGER DEFAULT 0,
+                        saldo REAL DEFAULT 0.0
+                    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS transaktionen (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        user_id INTEGER,
+                        typ TEXT,
+                        beschreibung TEXT,
+                        betrag REAL,
+                        zeitstempel DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        FOREIGN KEY(user_id) REFERENCES users(id)
+                    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS bohnen_log (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        user_id INTEGER,
+                        menge_gramm INTEGER,
+                        preis REAL,
+                        sorte TEXT,
+                        zeitstempel DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )''')
+    conn.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('gramm_pro_tasse', '12')")
+    conn.execute("INSERT OR IGNORE INTO settings (key, value) VALUES ('reset_datum', '2000-01-01 00:00:00')")
+
+
+def _idempotenz_und_indizes(conn):
+    # Idempotenz-Schlüssel der Offline-Buchungen von den Kiosks (siehe buchung.py)
+    conn.execute('''CREATE TABLE IF NOT EXISTS idempotenz (
+                        schluessel TEXT PRIMARY KEY,
+                        transaktion_id INTEGER,
+                        zeitstempel DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )''')
+    # Indizes für die heißen Abfragen auf transaktionen:
+    #   Dashboard: WHERE user_id = ? ORDER BY zeitstempel DESC
+    #   History:   ORDER BY zeitstempel DESC
+    #   Vorhersage/Statistik: WHERE typ = ? AND zeitstempel >= ? (deckend für COUNT)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transaktionen_user_zeit ON transaktionen (user_id, zeitstempel)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transaktionen_zeit ON transaktionen (zeitstempel)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transaktionen_typ_zeit ON transaktionen (typ, zeitstempel)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bohnen_log_sorte ON bohnen_log (sorte, menge_gramm)")
+
+
+def _rfid_normalisieren(conn):
+    # RFID-UIDs einheitlich speichern (ohne Leerzeichen, groß), damit /api/check_card
+    # direkt über den UNIQUE-Index auf rfid_uid suchen kann
+    conn.execute("UPDATE users SET rfid_uid = NULL WHERE trim(rfid_uid) = ''")
+    # Zwei Schreibweisen derselben Karte bei verschiedenen Usern: wem sie gehört, muss ein
+    # Admin entscheiden. Diese UIDs bleiben, wie sie sind (die Karte wird dann nicht erkannt).
+    kollisionen = conn.execute('''SELECT upper(replace(rfid_uid, ' ', '')), group_concat(name || ' (ID ' || id || ')', ', ')
+                                  FROM users WHERE rfid_uid IS NOT NULL
+                                  GROUP BY 1 HAVING COUNT(*) > 1''').fetchall()
+    for uid, users in kollisionen:
+        print(f"⚠️ RFID-UID {uid} mehrfach vergeben: {users} – nicht normalisiert, bitte im Admin-Bereich bereinigen")
+    conn.execute('''UPDATE users SET rfid_uid = upper(replace(rfid_uid, ' ', ''))
+                    WHERE rfid_uid != upper(replace(rfid_uid, ' ', ''))
+                      AND upper(replace(rfid_uid, ' ', '')) NOT IN (
+                          SELECT upper(replace(rfid_uid, ' ', '')) FROM users WHERE rfid_uid IS NOT NULL
+                          GROUP BY 1 HAVING COUNT(*) > 1)''')
+
+
+def _sitzung_version(conn):
+    # Sitzungs-Stempel: wird beim Bearbeiten eines Users erhöht (siehe load_user in app.py)
+    if 'sitzung_version' not in {row[1] for row in conn.execute("PRAGMA table_info(users)")}:
+        conn.execute("ALTER TABLE users ADD COLUMN sitzung_version INTEGER NOT NULL DEFAULT 0")
+
+
+def _users_saldo_index(conn):
+    # Admin-Bereich: User seitenweise nach Saldo, Finanzen: SUM(saldo) WHERE saldo > 0 bzw. < 0
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_users_saldo ON users (saldo)")
+
+
+# (Version, Name, Schema-Schritt, Nachlauf oder None). Nachlauf = (Tabelle, funktion(conn, von_id, bis_id)),
+# wird über alle IDs aufgerufen, die beim Migrieren schon da waren – neue Zeilen schreibt der Code richtig.
+MIGRATIONEN = [
+    (1, 'grundschema', _grundschema, None),
+    (2, 'idempotenz_und_indizes', _idempotenz_und_indizes, None),
+    (3, 'produkte', produkte.init_tabelle, ('transaktionen', produkte.altdaten_zuordnen)),
+    # Summen über transaktionen.produkt_id – braucht den fertigen Nachlauf von 3
+    (4, 'statistik', statistik.init_tabellen, None),
+    (5, 'konten', konten.init_tabellen, None),
+    (6, 'rfid_normalisieren', _rfid_normalisieren, None),
+    (7, 'sitzung_version', _sitzung_version, None),
+    (8, 'users_saldo_index', _users_saldo_index, None),
+    (9, 'archiv', archiv.init_tabellen, None),
+    (10, 'scan_ereignisse', fehlscans.init_tabelle, None),
+]
+
+
+def version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrieren(conn, nachlauf=True):
+    """Führt alle offenen Migrationen aus. Gibt die Namen der ausgeführten zurück.
+
+    nachlauf=False lässt den Nachlauf der letzten Migration liegen (für den Thread Nachlauf).
+    """
+    conn.execute('''CREATE TABLE IF NOT EXISTS schema_nachlauf (
+                        version INTEGER PRIMARY KEY,
+                        tabelle TEXT NOT NULL,
+                        naechste_id INTEGER NOT NULL,
+                        bis_id INTEGER NOT NULL
+                    )''')
+    conn.commit()
+    ausgefuehrt = []
+    for nummer, name, schema, nachlauf_def in MIGRATIONEN:
+        if nummer <= version(conn):
+            continue
+        nachlaeufe_abarbeiten(conn)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Ein zweiter Prozess kann die Migration inzwischen erledigt haben
+            if nummer <= version(conn):
+                conn.rollback()
+                continue
+            schema(conn)
+            if nachlauf_def:
+                von, bis = conn.execute(f"SELECT MIN(id), MAX(id) FROM {nachlauf_def[0]}").fetchone()
+                if von is not None:
+                    conn.execute("INSERT OR REPLACE INTO schema_nachlauf (version, tabelle, naechste_id, bis_id) VALUES (?, ?, ?, ?)",
+                                 (nummer, nachlauf_def[0], von, bis))
+            conn.execute(f"PRAGMA user_version = {int(nummer)}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        ausgefuehrt.append(name)
+        print(f"Migration {nummer} ({name}) ausgeführt.")
+    if nachlauf:
+        nachlaeufe_abarbeiten(conn)
+    return ausgefuehrt
+
+
+def nachlaeufe_abarbeiten(conn, block=BLOCK, pause=0.0):
+    """Arbeitet alle offenen Nachläufe blockweise ab. Gibt die Anzahl der Blöcke zurück."""
+    funktionen = {nummer: n[1] for nummer, _, _, n in MIGRATIONEN if n}
+    bloecke = 0
+    for (nummer,) in conn.execute("SELECT version FROM schema_nachlauf ORDER BY version").fetchall():
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                zeile = conn.execute("SELECT naechste_id, bis_id FROM schema_nachlauf WHERE version = ?", (nummer,)).fetchone()
+                if zeile is None or zeile[0] > zeile[1]:
+                    conn.execute("DELETE FROM schema_nachlauf WHERE version = ?", (nummer,))
+                    conn.commit()
+                    break
+                von, bis = zeile[0], min(zeile[0] + block - 1, zeile[1])
+                funktionen[nummer](conn, von, bis)
+                conn.execute("UPDATE schema_nachlauf SET naechste_id = ? WHERE version = ?", (bis + 1, nummer))
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            bloecke += 1
+            if pause:
+                time.sleep(pause)
+    return bloecke
+
+
+class Nachlauf(threading.Thread):
+    """Arbeitet offene Nachläufe im laufenden Server ab, mit Pausen für die Buchungen."""
+
+    def __init__(self, verbinden, pause=0.05):
+        super().__init__(daemon=True, name='schema-nachlauf')
+        self.verbinden = verbinden
+        self.pause = pause
+
+    def run(self):
+        conn = self.verbinden()
+        try:
+            bloecke = nachlaeufe_abarbeiten(conn, pause=self.pause)
+            if bloecke:
+                print(f"Schema-Nachlauf fertig ({bloecke} Blöcke).")
+        except Exception as e:
+            print(f"Schema-Nachlauf fehlgeschlagen: {e}")
+        finally:
+            conn.close()
+
+
+if __name__ == '__main__':
+    import db
+
+    parser = argparse.ArgumentParser(description="Schema auf den neuesten Stand bringen.")
+    parser.add_argument('--db', default=db.DB_NAME)
+    args = parser.parse_args()
+
+    conn = db.verbinden(args.db)
+    vorher = version(conn)
+    ausgefuehrt = migrieren(conn)
+    print(f"✅ Schema-Version {vorher} -> {version(conn)} ({len(ausgefuehrt)} Migrationen).")
+    conn.close()
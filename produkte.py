@@ -0,0 +1,59 @@
+import statistik
+from standardprodukte import STANDARD
+
+# --- PRODUKTE ---
+# Früher wurde die Sorte einer Buchung aus dem Produktnamen geraten
+# ('entkoffeiniert' im Namen) und alte 'KAUF'-Zeilen per LIKE auf die
+# Beschreibung sortiert. Jetzt verweist jede Kauf-Buchung über
+# transaktionen.produkt_id auf einen Eintrag hier; Sorte und Preis stehen
+# an genau einer Stelle, Auswertungen laufen über den Integer-Schlüssel.
+
+
+def _spalten(conn, tabelle):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({tabelle})")}
+
+
+def init_tabelle(conn):
+    """Legt produkte an (Migration 3). Die Zuordnung der alten Buchungen macht altdaten_zuordnen als Nachlauf."""
+    vorhanden = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='produkte'").fetchone()
+    conn.execute('''CREATE TABLE IF NOT EXISTS produkte (
+                        id INTEGER PRIMARY KEY,
+                        name TEXT NOT NULL UNIQUE,
+                        preis REAL NOT NULL,
+                        sorte TEXT NOT NULL,
+                        aktiv INTEGER NOT NULL DEFAULT 1
+                    )''')
+    if 'produkt_id' not in _spalten(conn, 'transaktionen'):
+        conn.execute("ALTER TABLE transaktionen ADD COLUMN produkt_id INTEGER REFERENCES produkte(id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_transaktionen_produkt_zeit ON transaktionen (produkt_id, zeitstempel)")
+    if not vorhanden:
+        conn.executemany("INSERT OR IGNORE INTO produkte (id, name, preis, sorte) VALUES (?, ?, ?, ?)", STANDARD)
+
+
+def altdaten_zuordnen(conn, von_id, bis_id):
+    """Nachlauf von Migration 3: alte 'KAUF'-Zeilen typisieren und allen Käufen eine produkt_id geben."""
+    for sorte, kauf_typ, text_match in statistik.SORTEN:
+        conn.execute("UPDATE transaktionen SET typ = ? WHERE id BETWEEN ? AND ? AND typ = 'KAUF' AND beschreibung LIKE ?",
+                     (kauf_typ, von_id, bis_id, f'%{text_match}%'))
+        # Gleicher Name -> dieses Produkt, sonst das erste Produkt der Sorte
+        conn.execute('''UPDATE transaktionen SET produkt_id = COALESCE(
+                            (SELECT id FROM produkte WHERE name = transaktionen.beschreibung AND sorte = ?),
+                            (SELECT MIN(id) FROM produkte WHERE sorte = ?))
+                        WHERE id BETWEEN ? AND ? AND typ = ? AND produkt_id IS NULL''', (sorte, sorte, von_id, bis_id, kauf_typ))
+
+
+def alle(conn, nur_aktive=False):
+    """{id: {'id', 'name', 'preis', 'sorte', 'kauf_typ', 'aktiv'}}"""
+    sql = "SELECT id, name, preis, sorte, aktiv FROM produkte" + (" WHERE aktiv = 1" if nur_aktive else "") + " ORDER BY id"
+    return {row[0]: {'id': row[0], 'name': row[1], 'preis': row[2], 'sorte': row[3],
+                     'kauf_typ': statistik.SORTE_ZU_KAUF_TYP[row[3]], 'aktiv': bool(row[4])}
+            for row in conn.execute(sql)}
+
+
+def fuer_namen(katalog, name):
+    """Nur für Buchungen alter Kiosks, die noch den Produktnamen statt der ID schicken."""
+    for produkt in katalog.values():
+        if produkt['name'] == name:
+            return produkt
+    sorte = 'Entkoffeiniert' if 'entkoffeiniert' in name.lower() or 'decaf' in name.lower() else 'Koffein'
+    return next((p for p in katalog.values() if p['sorte'] == sorte), None)
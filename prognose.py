@@ -0,0 +1,106 @@
+import threading
+from datetime import date, timedelta
+
+import statistik
+
+# --- VERBRAUCHSPROGNOSE ---
+# Der alte Ø-Verbrauch (Tassen seit Start / Tage) kennt keine Wochentage: am
+# Freitag sah der Bestand für das Wochenende viel zu knapp aus, am Montag zu
+# üppig. Hier wird pro Sorte ein Wochentagsprofil aus statistik_tage gebildet
+# (jüngere Wochen zählen exponentiell mehr) und der Bestand Tag für Tag gegen
+# die erwarteten Tassen gerechnet. Alle Sorten laufen gemeinsam als Matrix
+# (Sorten x Tage) durch NumPy – keine Python-Schleife über Tage.
+#
+# NumPy wird erst bei der ersten Berechnung geladen (~90 ms), nicht beim Serverstart.
+
+HORIZONT_TAGE = 365
+# Gewicht einer Woche relativ zur nächstjüngeren
+WOCHEN_GEWICHT = 0.7
+
+
+def tagesmatrix(conn, sorten, von, bis):
+    """Tassen pro Sorte und Tag als Matrix (len(sorten) x Tage von..bis inkl.), fehlende Tage = 0."""
+    import numpy as np
+    tage = (bis - von).days + 1
+    matrix = np.zeros((len(sorten), max(tage, 0)))
+    if tage <= 0:
+        return matrix
+    index = {sorte: i for i, sorte in enumerate(sorten)}
+    zeilen = conn.execute("SELECT tag, sorte, tassen FROM statistik_tage WHERE tag >= ? AND tag <= ?",
+                          (von.isoformat(), bis.isoformat())).fetchall()
+    zeilen = [(index[s], (date.fromisoformat(t) - von).days, n) for t, s, n in zeilen if s in index]
+    if zeilen:
+        i, j, n = np.array(zeilen).T
+        np.add.at(matrix, (i.astype(int), j.astype(int)), n)
+    return matrix
+
+
+def wochenprofil(matrix, von, wochen_gewicht=WOCHEN_GEWICHT):
+    """Gewichteter Mittelwert je Wochentag (Sorten x 7, Montag = 0)."""
+    import numpy as np
+    sorten, tage = matrix.shape
+    if tage == 0:
+        return np.zeros((sorten, 7))
+    wochentag = (np.arange(tage) + von.weekday()) % 7
+    alter_wochen = (tage - 1 - np.arange(tage)) // 7
+    gewicht = wochen_gewicht ** alter_wochen
+    one_hot = np.eye(7)[wochentag]                      # Tage x 7
+    summe = (matrix * gewicht) @ one_hot                # Sorten x 7
+    norm = gewicht @ one_hot                            # 7
+    # Wochentage ohne Messung (Zeitraum kürzer als eine Woche) bekommen den Gesamtschnitt
+    mittel = (matrix * gewicht).sum(axis=1, keepdims=True) / gewicht.sum()
+    return np.where(norm > 0, summe / np.where(norm > 0, norm, 1), mittel)
+
+
+def reichweite(bestand_gramm, profil, heute, heute_schon, gramm_pro_tasse, horizont=HORIZONT_TAGE):
+    """Tage bis leer je Sorte (0 = heute, None = länger als horizont).
+
+    heute_schon: bereits heute verkaufte Tassen – vom Tagesbedarf heute wird nur der Rest angesetzt.
+    """
+    import numpy as np
+    wochentag = (np.arange(horizont) + heute.weekday()) % 7
+    bedarf = profil[:, wochentag] * gramm_pro_tasse     # Sorten x horizont
+    bedarf[:, 0] = np.maximum(bedarf[:, 0] - heute_schon * gramm_pro_tasse, 0)
+    verbraucht = np.cumsum(bedarf, axis=1)
+    leer = verbraucht >= bestand_gramm[:, None]
+    tage = np.argmax(leer, axis=1)
+    return [0 if b <= 0 else (int(t) if l.any() else None) for b, t, l in zip(bestand_gramm, tage, leer)]
+
+
+class Prognose:
+    """Berechnet die Prognose für alle Sorten und hält sie, bis neue Daten kommen."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._schluessel = None
+        self._ergebnis = None
+
+    def berechnen(self, conn, start_tag, gramm_pro_tasse):
+        """start_tag: ältester Tag, der ins Profil eingeht (reset_datum bzw. vor 100 Tagen)."""
+        import numpy as np
+        heute = date.fromisoformat(conn.execute("SELECT date('now')").fetchone()[0])
+        schluessel = (statistik.datenstand(conn), heute, start_tag, gramm_pro_tasse)
+        with self._lock:
+            if schluessel == self._schluessel:
+                return self._ergebnis
+
+        sorten = [sorte for sorte, _, _ in statistik.SORTEN]
+        verbrauch = statistik.lese_verbrauch(conn, start_tag.isoformat())
+        bestand = np.array([verbrauch[s][0] - verbrauch[s][1] * gramm_pro_tasse for s in sorten], dtype=float)
+        # Der angebrochene heutige Tag würde das Profil nach unten ziehen, er zählt nur als "schon verbraucht"
+        matrix = tagesmatrix(conn, sorten, start_tag, heute)
+        profil = wochenprofil(matrix[:, :-1], start_tag)
+        tage = reichweite(bestand, profil, heute, matrix[:, -1], gramm_pro_tasse)
+
+        ergebnis = {}
+        for i, sorte in enumerate(sorten):
+            ergebnis[sorte] = {
+                'bestand': int(bestand[i]),
+                'tassen_pro_tag': round(float(profil[i].mean()), 1),
+                'tage_bis_leer': tage[i] if tage[i] is not None else 999,
+                'leer_am': (heute + timedelta(days=tage[i])).isoformat() if tage[i] is not None else None,
+                'profil': [round(float(x), 1) for x in profil[i]],
+            }
+        with self._lock:
+            self._schluessel, self._ergebnis = schluessel, ergebnis
+        return ergebnis
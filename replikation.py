@@ -0,0 +1,127 @@
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# --- EIN SCHREIBER, MEHRERE LESE-REPLIKATE ---
+# Der Schreiber (ROLLE=schreiber, wie bisher) besitzt kaffee.db und nimmt alle
+# Buchungen an. Alle SNAPSHOT_S Sekunden kopiert SnapshotVersand die DB mit der
+# Online-Backup-API von SQLite in eine Snapshot-Datei – aber nur, wenn seit dem
+# letzten Snapshot jemand geschrieben hat (PRAGMA data_version). Der Snapshot
+# ist eine normale DB im Rollback-Journal-Modus, damit Replikate ihn ohne -wal
+# und -shm nur lesend öffnen können.
+#
+# Ein Replikat (ROLLE=replikat) holt den Snapshot per HTTP vom Schreiber
+# (/api/snapshot, geschützt mit REPLIKAT_TOKEN, ETag/304 wenn nichts neu ist),
+# prüft ihn, tauscht ihn atomar gegen seine lokale Kopie und bedient daraus
+# Dashboard, History und Admin-Ansichten. Schreibende Requests leitet es mit
+# 307 an den Schreiber weiter (siehe app.py).
+
+
+def snapshot_schreiben(conn, pfad):
+    """Konsistente Kopie der DB hinter conn nach pfad (atomar ersetzt)."""
+    tmp = pfad + '.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    ziel = sqlite3.connect(tmp)
+    try:
+        # In einem Schritt: Schreiber warten im WAL-Modus nicht, die Kopie ist ein fester Lese-Stand
+        conn.backup(ziel, pages=-1)
+        ziel.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        ziel.close()
+    os.replace(tmp, pfad)
+
+
+class SnapshotVersand(threading.Thread):
+    """Schreiber: hält die Snapshot-Datei für die Replikate aktuell."""
+
+    def __init__(self, verbinden, pfad=None, intervall=30.0):
+        super().__init__(daemon=True, name='snapshot-versand')
+        self.verbinden = verbinden
+        self.pfad = pfad
+        self.intervall = intervall
+        self.etag = None            # ändert sich mit jedem neuen Snapshot
+        self._data_version = None
+
+    def schreiben(self, conn):
+        """Neuer Snapshot, falls sich seit dem letzten etwas geändert hat. Gibt True zurück, wenn geschrieben."""
+        # data_version ändert sich, sobald eine andere Verbindung committet hat
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if self.etag is not None and version == self._data_version:
+            return False
+        snapshot_schreiben(conn, self.pfad)
+        self._data_version = version
+        self.etag = f"{time.time_ns():x}"
+        return True
+
+    def run(self):
+        conn = self.verbinden()
+        while True:
+            try:
+                self.schreiben(conn)
+            except Exception as e:
+                print(f"Snapshot fehlgeschlagen: {e}")
+            time.sleep(self.intervall)
+
+
+class SnapshotAbruf(threading.Thread):
+    """Replikat: holt regelmäßig den Snapshot vom Schreiber und spielt ihn lokal ein."""
+
+    def __init__(self, bei_neuem_stand=None):
+        super().__init__(daemon=True, name='snapshot-abruf')
+        self.bei_neuem_stand = bei_neuem_stand
+        self.quelle = None          # Basis-URL des Schreibers
+        self.token = None
+        self.ziel = None            # lokale DB-Datei des Replikats
+        self.intervall = 30.0
+        self.etag = None
+        self._stand = None          # monotonic() des letzten erfolgreichen Abrufs
+
+    def alter(self):
+        """Sekunden seit dem letzten erfolgreichen Abgleich mit dem Schreiber, None = noch nie."""
+        return None if self._stand is None else time.monotonic() - self._stand
+
+    def abrufen(self):
+        """Einmal abgleichen. Gibt True zurück, wenn ein neuer Snapshot eingespielt wurde."""
+        kopf = {'X-Replikat-Token': self.token or ''}
+        if self.etag:
+            kopf['If-None-Match'] = self.etag
+        anfrage = urllib.request.Request(f"{self.quelle}/api/snapshot", headers=kopf)
+        try:
+            antwort = urllib.request.urlopen(anfrage, timeout=30)
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                self._stand = time.monotonic()
+                return False
+            raise
+
+        neu = self.ziel + '.neu'
+        with antwort, open(neu, 'wb') as f:
+            shutil.copyfileobj(antwort, f)
+        pruefung = sqlite3.connect(neu)
+        try:
+            ergebnis = pruefung.execute("PRAGMA quick_check").fetchone()[0]
+        finally:
+            pruefung.close()
+        if ergebnis != 'ok':
+            os.remove(neu)
+            raise ValueError(f"Snapshot beschädigt: {ergebnis}")
+        # Offene Lese-Verbindungen behalten bis zum Neu-Verbinden den alten Stand (alte Datei bleibt offen)
+        os.replace(neu, self.ziel)
+        self.etag = antwort.headers.get('ETag')
+        self._stand = time.monotonic()
+        if self.bei_neuem_stand:
+            self.bei_neuem_stand()
+        return True
+
+    def run(self):
+        while True:
+            time.sleep(self.intervall)
+            try:
+                self.abrufen()
+            except Exception as e:
+                print(f"Snapshot-Abruf von {self.quelle} fehlgeschlagen: {e}")
@@ -0,0 +1,122 @@
+import queue
+import sys
+import threading
+import time
+
+# --- RFID-LESER ---
+# Statt alle 100 ms eine neue Verbindung zum Leser aufzubauen, warten wir
+# blockierend auf "Karte aufgelegt"-Ereignisse (PC/SC SCardGetStatusChange,
+# in pyscard über CardMonitor/CardObserver). Eine liegende Karte erzeugt nur
+# ein Ereignis; kurze Wackelkontakte filtert die Entprellung heraus.
+#
+# Das Backend ist austauschbar: SimulierterLeser treibt Tests und Benchmarks
+# ganz ohne Hardware.
+
+GET_UID = [0xFF, 0xCA, 0x00, 0x00, 0x00]
+
+
+class PcscLeser:
+    """Echter Leser über pyscard. Der Monitor-Thread von pyscard hält den PC/SC-Kontext offen."""
+
+    def __init__(self):
+        from smartcard.CardMonitoring import CardMonitor, CardObserver
+        from smartcard.util import toHexString
+
+        self._uids = queue.Queue()
+        leser = self
+
+        class _Beobachter(CardObserver):
+            def update(self, observable, actions):
+                aufgelegt, _entfernt = actions
+                for karte in aufgelegt:
+                    uid = leser._uid_lesen(karte, toHexString)
+                    if uid:
+                        leser._uids.put(uid)
+
+        self._beobachter = _Beobachter()
+        self._monitor = CardMonitor()
+        self._monitor.addObserver(self._beobachter)
+
+    @staticmethod
+    def _uid_lesen(karte, toHexString):
+        try:
+            verbindung = karte.createConnection()
+            verbindung.connect()
+            try:
+                data, sw1, sw2 = verbindung.transmit(GET_UID)
+            finally:
+                verbindung.disconnect()
+        except Exception as e:
+            print(f"RFID Lesefehler: {e}")
+            return None
+        if sw1 != 0x90:
+            return None
+        return toHexString(data).replace(" ", "")
+
+    def warte_auf_karte(self, timeout=None):
+        try:
+            return self._uids.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def schliessen(self):
+        self._monitor.deleteObserver(self._beobachter)
+
+
+class SimulierterLeser:
+    """Leser ohne Hardware: Karten werden per karte_auflegen() 'aufgelegt'."""
+
+    def __init__(self):
+        self._uids = queue.Queue()
+        self.aufgelegt_um = {}
+
+    def karte_auflegen(self, uid):
+        self.aufgelegt_um[uid] = time.perf_counter()
+        self._uids.put(uid)
+
+    def warte_auf_karte(self, timeout=None):
+        try:
+            return self._uids.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def schliessen(self):
+        pass
+
+
+def stdin_einspeisen(leser):
+    """Für den Kiosk ohne Leser (KAFFEE_RFID=sim): jede Zeile auf stdin ist ein Scan."""
+    def lesen():
+        for zeile in sys.stdin:
+            if zeile.strip():
+                leser.karte_auflegen(zeile.strip().upper())
+    threading.Thread(target=lesen, daemon=True, name='rfid-stdin').start()
+
+
+class RfidLeser(threading.Thread):
+    """Wartet auf Karten und ruft callback(uid) auf – gleiche UID innerhalb der Entprellzeit nur einmal."""
+
+    def __init__(self, backend, callback, entprellzeit=2.0):
+        super().__init__(daemon=True, name='rfid')
+        self.backend = backend
+        self.callback = callback
+        self.entprellzeit = entprellzeit
+        self.running = True
+        self._zuletzt = {}
+
+    def run(self):
+        while self.running:
+            uid = self.backend.warte_auf_karte(timeout=1.0)
+            if uid is None:
+                continue
+            jetzt = time.monotonic()
+            if jetzt - self._zuletzt.get(uid, float('-inf')) < self.entprellzeit:
+                continue
+            # Nur Karten innerhalb der Entprellzeit behalten, sonst wächst das dict mit jeder je gesehenen UID
+            self._zuletzt = {u: t for u, t in self._zuletzt.items() if jetzt - t < self.entprellzeit}
+            self._zuletzt[uid] = jetzt
+            self.callback(uid)
+
+    def stoppen(self):
+        self.running = False
+        self.backend.schliessen()
@@ -0,0 +1,85 @@
+import gzip
+import hashlib
+
+from flask import Response, request, session
+
+try:
+    import brotli   # optional (pip install brotli); ohne gibt es nur gzip
+except ImportError:
+    brotli = None
+
+# --- GERENDERTE SEITEN: CACHE, ETAG, KOMPRESSION ---
+# Jinja übersetzt jedes Template nur einmal und behält es (Flask-Standard);
+# teuer ist das Rendern mit den Daten. Dashboard, History und Admin werden
+# deshalb einmal pro Datenstand gerendert und samt komprimierter Fassungen im
+# SeitenCache (cache.py) gehalten. Der Schlüssel enthält alles, wovon die
+# Seite abhängt – vor allem den Datenstand, den die Schreibpfade in app.py über
+# auswertungen.invalidieren() hochzählen.
+#
+# Jede Antwort trägt ein ETag über den Inhalt. Schickt der Browser es mit
+# If-None-Match zurück und hat sich nichts geändert, gibt es 304 ohne Body.
+# Alle übrigen Textantworten komprimiert komprimierung() im after_request.
+
+KOMPRIMIERBAR = {'text/html', 'text/plain', 'text/csv', 'application/json'}
+MIN_GROESSE = 500   # darunter lohnt sich der Header-Overhead nicht
+
+
+def kodierung():
+    """Beste vom Browser akzeptierte Kodierung für diesen Request: 'br', 'gzip' oder None."""
+    angebot = ['br', 'gzip'] if brotli else ['gzip']
+    return request.accept_encodings.best_match(angebot)
+
+
+def komprimieren(daten, art):
+    if art == 'br':
+        return brotli.compress(daten, quality=5)
+    return gzip.compress(daten, compresslevel=6)
+
+
+def _fertig(response, daten, art):
+    response.set_data(daten)
+    if art:
+        response.headers['Content-Encoding'] = art
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+class Seiten:
+    """Liefert Seiten aus dem SeitenCache, mit ETag/304 und vorab komprimiert."""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def antwort(self, schluessel, rendern, mimetype='text/html'):
+        """rendern() liefert den Text der Seite; schluessel muss alles enthalten, wovon er abhängt."""
+        if session.get('_flashes'):
+            # Flash-Meldungen stehen genau einmal auf der Seite: an Cache und 304 vorbei
+            return Response(rendern(), mimetype=mimetype)
+        eintrag = self.cache.hole(schluessel)
+        if eintrag is None:
+            daten = rendern().encode()
+            eintrag = {'etag': hashlib.blake2b(daten, digest_size=12).hexdigest(), None: daten}
+            self.cache.eintragen(schluessel, eintrag)
+
+        art = kodierung() if len(eintrag[None]) >= MIN_GROESSE else None
+        if art not in eintrag:
+            # Pro Kodierung einmal komprimieren; zwei Threads gleichzeitig machen es nur doppelt
+            eintrag[art] = komprimieren(eintrag[None], art)
+        response = _fertig(Response(mimetype=mimetype), eintrag[art], art)
+        # weak: gzip, br und unkomprimiert sind dieselbe Seite
+        response.set_etag(eintrag['etag'], weak=True)
+        # Personalisiert und ab der nächsten Buchung veraltet: Browser fragt jedes Mal nach
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response.make_conditional(request)
+
+
+def komprimierung(response):
+    """after_request: Textantworten komprimieren, die nicht schon aus Seiten kommen."""
+    if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+            or 'Content-Encoding' in response.headers or response.mimetype not in KOMPRIMIERBAR):
+        return response
+    daten = response.get_data()
+    art = kodierung() if len(daten) >= MIN_GROESSE else None
+    if art is None:
+        return response
+    return _fertig(response, komprimieren(daten, art), art)
@@ -0,0 +1,8 @@
+# --- STANDARD-PRODUKTE ---
+# Die beiden Knöpfe, die der Kiosk bisher fest eingebaut hatte: (id, name, preis, sorte).
+# Eigenes Modul ohne Importe, damit der Kiosk (kiosk_speicher.py) beim Kaltstart
+# nicht produkte.py samt statistik, konten und archiv laden muss.
+STANDARD = [
+    (1, 'Kaffee mit Koffein', 0.40, 'Koffein'),
+    (2, 'Kaffee Entkoffeiniert', 0.40, 'Entkoffeiniert'),
+]
@@ -0,0 +1,163 @@
+import argparse
+import os
+
+import archiv
+
+# --- LAUFENDE SUMMEN FÜR BESTAND & VERBRAUCH ---
+# Statt bei jedem Dashboard-Aufruf bohnen_log und transaktionen komplett zu
+# durchsuchen, führen wir kleine Summen-Tabellen mit, die beim Schreiben
+# (api_book / Bohnen-Lieferung) in derselben Transaktion hochgezählt werden.
+
+# (Sorte, Buchungstyp, Textmuster für alte 'KAUF'-Zeilen – nur noch für die Migration in produkte.py)
+SORTEN = [
+    ('Koffein', 'KAUF_KOFFEIN', 'Schwarz'),
+    ('Entkoffeiniert', 'KAUF_ENTKOFFEINIERT', 'Decaf')
+]
+SORTE_ZU_KAUF_TYP = {sorte: kauf_typ for sorte, kauf_typ, _ in SORTEN}
+KAUF_TYP_ZU_SORTE = {kauf_typ: sorte for sorte, kauf_typ, _ in SORTEN}
+
+
+def init_tabellen(conn):
+    """Legt die Summen-Tabellen an und füllt sie beim ersten Mal aus den Rohdaten."""
+    vorhanden = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type='table' AND name LIKE 'statistik_%'").fetchone()[0]
+    conn.execute('''CREATE TABLE IF NOT EXISTS statistik_sorten (
+                        sorte TEXT PRIMARY KEY,
+                        gramm_ein INTEGER NOT NULL DEFAULT 0,
+                        tassen INTEGER NOT NULL DEFAULT 0
+                    )''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS statistik_tage (
+                        tag TEXT NOT NULL,
+                        sorte TEXT NOT NULL,
+                        tassen INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY (tag, sorte)
+                    ) WITHOUT ROWID''')
+    # Stündliche Auflösung für die Wochentags-/Tageszeit-Auswertung (prognose.py); stunde = 'YYYY-MM-DD HH:00'
+    conn.execute('''CREATE TABLE IF NOT EXISTS statistik_stunden (
+                        stunde TEXT NOT NULL,
+                        sorte TEXT NOT NULL,
+                        tassen INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY (stunde, sorte)
+                    ) WITHOUT ROWID''')
+    if vorhanden < 3:
+        neu_berechnen(conn)
+
+
+def buche_tasse(conn, kauf_typ, zeitstempel=None):
+    """Zählt eine verkaufte Tasse. Muss in derselben Transaktion wie das INSERT laufen."""
+    sorte = KAUF_TYP_ZU_SORTE[kauf_typ]
+    conn.execute('''INSERT INTO statistik_sorten (sorte, tassen) VALUES (?, 1)
+                    ON CONFLICT(sorte) DO UPDATE SET tassen = tassen + 1''', (sorte,))
+    # Ohne zeitstempel entspricht date('now') dem CURRENT_TIMESTAMP des gerade geschriebenen Ledger-Eintrags
+    conn.execute('''INSERT INTO statistik_tage (tag, sorte, tassen) VALUES (date(COALESCE(?, 'now')), ?, 1)
+                    ON CONFLICT(tag, sorte) DO UPDATE SET tassen = tassen + 1''', (zeitstempel, sorte))
+    conn.execute('''INSERT INTO statistik_stunden (stunde, sorte, tassen) VALUES (strftime('%Y-%m-%d %H:00', COALESCE(?, 'now')), ?, 1)
+                    ON CONFLICT(stunde, sorte) DO UPDATE SET tassen = tassen + 1''', (zeitstempel, sorte))
+
+
+def buche_bohnen(conn, sorte, menge_gramm):
+    """Zählt eine Bohnen-Lieferung zum Bestand."""
+    conn.execute('''INSERT INTO statistik_sorten (sorte, gramm_ein) VALUES (?, ?)
+                    ON CONFLICT(sorte) DO UPDATE SET gramm_ein = gramm_ein + excluded.gramm_ein''', (sorte, menge_gramm))
+
+
+def _aus_rohdaten(conn):
+    """Berechnet die Summen komplett aus bohnen_log und transaktionen (langsam!)."""
+    sorten = {}
+    for sorte, gramm in conn.execute("SELECT sorte, SUM(menge_gramm) FROM bohnen_log GROUP BY sorte"):
+        sorten[sorte] = [gramm or 0, 0]
+
+    tage, stunden = {}, {}
+    for sorte, _, _ in SORTEN:
+        sorten.setdefault(sorte, [0, 0])
+    # Käufe über den Produkt-Schlüssel (Index idx_transaktionen_produkt_zeit), kein Text-Matching
+    # Hot-DB und Archive (siehe archiv.py) nacheinander; eine Stunde kann in beiden vorkommen
+    for schema, _, bedingungen in archiv.quellen(conn):
+        where = f"WHERE {' AND '.join(bedingungen)}" if bedingungen else ""
+        for sorte, stunde, anzahl in conn.execute(f'''SELECT p.sorte, strftime('%Y-%m-%d %H:00', t.zeitstempel), COUNT(*)
+                                                     FROM produkte p JOIN {schema}.transaktionen t ON t.produkt_id = p.id
+                                                     {where} GROUP BY 1, 2'''):
+            stunden[(stunde, sorte)] = stunden.get((stunde, sorte), 0) + anzahl
+            tage[(stunde[:10], sorte)] = tage.get((stunde[:10], sorte), 0) + anzahl
+            sorten.setdefault(sorte, [0, 0])[1] += anzahl
+    return sorten, tage, stunden
+
+
+def neu_berechnen(conn):
+    """Verwirft die Summen-Tabellen und baut sie aus den Rohdaten neu auf."""
+    sorten, tage, stunden = _aus_rohdaten(conn)
+    conn.execute("DELETE FROM statistik_sorten")
+    conn.execute("DELETE FROM statistik_tage")
+    conn.execute("DELETE FROM statistik_stunden")
+    conn.executemany("INSERT INTO statistik_sorten (sorte, gramm_ein, tassen) VALUES (?, ?, ?)",
+                     [(sorte, gramm, tassen) for sorte, (gramm, tassen) in sorten.items()])
+    conn.executemany("INSERT INTO statistik_tage (tag, sorte, tassen) VALUES (?, ?, ?)",
+                     [(tag, sorte, anzahl) for (tag, sorte), anzahl in tage.items()])
+    conn.executemany("INSERT INTO statistik_stunden (stunde, sorte, tassen) VALUES (?, ?, ?)",
+                     [(stunde, sorte, anzahl) for (stunde, sorte), anzahl in stunden.items()])
+
+
+def pruefen(conn):
+    """Vergleicht die Summen-Tabellen mit den Rohdaten. Gibt eine Liste von Abweichungen zurück."""
+    sorten, tage, stunden = _aus_rohdaten(conn)
+    abweichungen = []
+
+    gespeichert = {row[0]: [row[1], row[2]] for row in conn.execute("SELECT sorte, gramm_ein, tassen FROM statistik_sorten")}
+    for sorte in sorted(set(sorten) | set(gespeichert)):
+        soll = sorten.get(sorte, [0, 0])
+        ist = gespeichert.get(sorte, [0, 0])
+        if soll != ist:
+            abweichungen.append(f"Sorte {sorte}: gespeichert {ist[0]}g/{ist[1]} Tassen, Rohdaten {soll[0]}g/{soll[1]} Tassen")
+
+    gespeichert_tage = {(row[0], row[1]): row[2] for row in conn.execute("SELECT tag, sorte, tassen FROM statistik_tage WHERE tassen > 0")}
+    for schluessel in sorted(set(tage) | set(gespeichert_tage)):
+        soll, ist = tage.get(schluessel, 0), gespeichert_tage.get(schluessel, 0)
+        if soll != ist:
+            abweichungen.append(f"Tag {schluessel[0]} ({schluessel[1]}): gespeichert {ist} Tassen, Rohdaten {soll} Tassen")
+
+    gespeichert_stunden = {(row[0], row[1]): row[2] for row in conn.execute("SELECT stunde, sorte, tassen FROM statistik_stunden WHERE tassen > 0")}
+    for schluessel in sorted(set(stunden) | set(gespeichert_stunden)):
+        soll, ist = stunden.get(schluessel, 0), gespeichert_stunden.get(schluessel, 0)
+        if soll != ist:
+            abweichungen.append(f"Stunde {schluessel[0]} ({schluessel[1]}): gespeichert {ist} Tassen, Rohdaten {soll} Tassen")
+    return abweichungen
+
+
+def lese_verbrauch(conn, start_date_str):
+    """Liefert je Sorte (Gramm geliefert, Tassen gesamt, Tassen seit start_date_str)."""
+    ergebnis = {sorte: (0, 0, 0) for sorte, _, _ in SORTEN}
+    for sorte, gramm, tassen in conn.execute("SELECT sorte, gramm_ein, tassen FROM statistik_sorten"):
+        ergebnis[sorte] = (gramm, tassen, 0)
+    # Tagesgenau: Tassen vom Starttag selbst zählen komplett mit
+    for sorte, tassen_zeitraum in conn.execute('''SELECT sorte, SUM(tassen) FROM statistik_tage
+                                                  WHERE tag >= date(?) GROUP BY sorte''', (start_date_str,)):
+        gramm, tassen, _ = ergebnis.get(sorte, (0, 0, 0))
+        ergebnis[sorte] = (gramm, tassen, tassen_zeitraum or 0)
+    return ergebnis
+
+
+def datenstand(conn):
+    """Ändert sich mit jeder Tasse und jeder Lieferung – Cache-Schlüssel für abgeleitete Auswertungen."""
+    return tuple(conn.execute("SELECT COALESCE(SUM(tassen), 0), COALESCE(SUM(gramm_ein), 0) FROM statistik_sorten").fetchone())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Summen-Tabellen für Bestand & Verbrauch neu berechnen oder prüfen.")
+    parser.add_argument('befehl', choices=['rebuild', 'check'])
+    parser.add_argument('--db', default=os.path.join(os.path.abspath(os.path.dirname(__file__)), "kaffee.db"))
+    args = parser.parse_args()
+
+    import db
+    conn = db.verbinden(args.db)
+    db.init_schema(conn)
+    if args.befehl == 'rebuild':
+        neu_berechnen(conn)
+        conn.commit()
+        print("✅ Summen-Tabellen neu berechnet.")
+
+    abweichungen = pruefen(conn)
+    conn.close()
+    if abweichungen:
+        for zeile in abweichungen:
+            print(f"❌ {zeile}")
+        raise SystemExit(1)
+    print("✅ Summen-Tabellen stimmen mit den Rohdaten überein.")
@@ -0,0 +1,161 @@
+import base64
+import csv
+import heapq
+import io
+import json
+
+import archiv
+
+# --- LESEN AUS DEM LEDGER (transaktionen) ---
+# Keyset-Pagination auf (zeitstempel, id): Die nächste Seite beginnt hinter der
+# letzten Zeile der vorigen, statt mit OFFSET alles davor erneut zu lesen.
+# Passt zu den Indizes idx_transaktionen_zeit und idx_transaktionen_user_zeit
+# (id steckt als rowid automatisch mit im Index).
+#
+# Alte Monate liegen in Jahresarchiven (siehe archiv.py). Jede Abfrage läuft
+# getrennt gegen die Hot-DB und die Archive, die Ergebnisse werden nach
+# (zeitstempel, id) gemischt. seite() fragt die Archive nur, wenn die Hot-DB
+# die Seite nicht mit Zeilen ab archiv_bis füllt, und ältere Jahre nur, solange
+# sie noch etwas beitragen können.
+
+SPALTEN = ['id', 'zeitstempel', 'user_id', 'name', 'typ', 'beschreibung', 'betrag']
+EXPORT_CHUNK = 1000
+
+
+def cursor_kodieren(zeile):
+    roh = f"{zeile['zeitstempel']}|{zeile['id']}"
+    return base64.urlsafe_b64encode(roh.encode()).decode().rstrip('=')
+
+
+def cursor_dekodieren(cursor):
+    """Gibt (zeitstempel, id) zurück oder None bei kaputtem/fehlendem Cursor."""
+    if not cursor:
+        return None
+    try:
+        roh = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        zeitstempel, id_ = roh.rsplit('|', 1)
+        return zeitstempel, int(id_)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _filter(user_id=None, typ=None, von=None, bis=None):
+    bedingungen, parameter = [], []
+    if user_id is not None:
+        bedingungen.append("t.user_id = ?")
+        parameter.append(user_id)
+    if typ:
+        bedingungen.append("t.typ = ?")
+        parameter.append(typ)
+    if von:
+        bedingungen.append("t.zeitstempel >= ?")
+        parameter.append(von)
+    if bis:
+        # bis ist inklusive: '2024-01-31' schließt den ganzen Tag ein
+        bedingungen.append("t.zeitstempel < datetime(?, '+1 day')" if len(bis) == 10 else "t.zeitstempel <= ?")
+        parameter.append(bis)
+    return bedingungen, parameter
+
+
+def _schluessel(zeile):
+    return zeile['zeitstempel'], zeile['id']
+
+
+def seite(conn, limit, vor=None, **filter):
+    """Neueste Buchungen zuerst. Gibt (zeilen, cursor_für_nächste_seite_oder_None) zurück."""
+    bedingungen, parameter = _filter(**filter)
+    position = cursor_dekodieren(vor)
+    if position:
+        bedingungen.append("(t.zeitstempel, t.id) < (?, ?)")
+        parameter.extend(position)
+    # Jüngstes Jahr, das noch in Frage kommt: Filter 'bis' oder Cursor, was früher liegt
+    bis = min((g for g in (filter.get('bis'), position and position[0]) if g), default=None)
+    # Ein Lese-Stand für archiv_bis und die Hot-DB, auch wenn archivieren() gerade Zeilen verschiebt
+    eigene_transaktion = not conn.in_transaction
+    if eigene_transaktion:
+        conn.execute("BEGIN")
+    try:
+        archiv_bis = archiv.archiviert_bis(conn)
+        zeilen = _seite_aus(conn, 'main', bedingungen, parameter, limit)
+        # Volle Seite nur aus Zeilen nach archiv_bis: die Archive können nichts beitragen
+        if archiv_bis and not (len(zeilen) > limit and zeilen[limit]['zeitstempel'] >= archiv_bis):
+            for schema, jahr, nur_archiv in archiv.quellen(conn, absteigend=True)[1:]:
+                if len(zeilen) > limit and zeilen[limit]['zeitstempel'] >= f"{jahr + 1}":
+                    break   # alles in diesem und älteren Archiven käme erst nach der Seite
+                if archiv.jahr_moeglich(jahr, filter.get('von'), bis):
+                    zeilen = sorted(zeilen + _seite_aus(conn, schema, bedingungen + nur_archiv, parameter, limit),
+                                    key=_schluessel, reverse=True)[:limit + 1]
+    finally:
+        if eigene_transaktion:
+            conn.rollback()
+    if len(zeilen) > limit:
+        return zeilen[:limit], cursor_kodieren(zeilen[limit - 1])
+    return zeilen, None
+
+
+def _seite_aus(conn, schema, bedingungen, parameter, limit):
+    where = f"WHERE {' AND '.join(bedingungen)}" if bedingungen else ""
+    return conn.execute(f'''
+        SELECT t.id, t.zeitstempel, t.user_id, COALESCE(u.name, 'Unbekannte Karte') as name, t.beschreibung, t.betrag, t.typ
+        FROM {schema}.transaktionen t
+        LEFT JOIN main.users u ON t.user_id = u.id
+        {where}
+        ORDER BY t.zeitstempel DESC, t.id DESC LIMIT ?
+    ''', parameter + [limit + 1]).fetchall()
+
+
+def alle(conn, **filter):
+    """Generator über das komplette (gefilterte) Ledger, älteste zuerst, in Häppchen.
+
+    Jedes Häppchen ist eine eigene kurze Abfrage – es bleibt kein Lese-Snapshot
+    offen und der Speicherverbrauch hängt nicht an der Anzahl Zeilen (höchstens
+    ein Häppchen pro Hot-DB und Archiv).
+    """
+    teile = [_alle_aus(conn, schema, nur_archiv, **filter) for schema, jahr, nur_archiv in archiv.quellen(conn)
+             if archiv.jahr_moeglich(jahr, filter.get('von'), filter.get('bis'))]
+    return heapq.merge(*teile, key=_schluessel)
+
+
+def _alle_aus(conn, schema, nur_archiv, **filter):
+    bedingungen, parameter = _filter(**filter)
+    bedingungen += nur_archiv
+    position = None
+    while True:
+        keyset = ["(t.zeitstempel, t.id) > (?, ?)"] if position else []
+        where = " AND ".join(bedingungen + keyset)
+        zeilen = conn.execute(f'''
+            SELECT t.id, t.zeitstempel, t.user_id, u.name, t.typ, t.beschreibung, t.betrag
+            FROM {schema}.transaktionen t
+            LEFT JOIN main.users u ON t.user_id = u.id
+            {"WHERE " + where if where else ""}
+            ORDER BY t.zeitstempel, t.id LIMIT ?
+        ''', parameter + list(position or []) + [EXPORT_CHUNK]).fetchall()
+        yield from zeilen
+        if len(zeilen) < EXPORT_CHUNK:
+            return
+        position = (zeilen[-1]['zeitstempel'], zeilen[-1]['id'])
+
+
+def als_csv(zeilen, puffergroesse=65536):
+    puffer = io.StringIO()
+    writer = csv.writer(puffer)
+    writer.writerow(SPALTEN)
+    for zeile in zeilen:
+        writer.writerow([zeile[s] for s in SPALTEN])
+        if puffer.tell() >= puffergroesse:
+            yield puffer.getvalue()
+            puffer.seek(0)
+            puffer.truncate()
+    yield puffer.getvalue()
+
+
+def als_ndjson(zeilen, puffergroesse=65536):
+    teile, groesse = [], 0
+    for zeile in zeilen:
+        teil = json.dumps({s: zeile[s] for s in SPALTEN}, ensure_ascii=False) + "\n"
+        teile.append(teil)
+        groesse += len(teil)
+        if groesse >= puffergroesse:
+            yield "".join(teile)
+            teile, groesse = [], 0
+    yield "".join(teile)
@@ -1,66 +1,31 @@
-from flask import Flask, render_template, request, redirect, url_for
-import sqlite3
+from flask import Blueprint, render_template
 
-app = Flask(__name__)
-DB_NAME = "kaffee.db"
+import db
+import statistik
 
-# --- Konfiguration für Nachkauf-Empfehlung ---
-MAX_KAFFEE_BOHNEN = 100 # Angenommen: 1 Packung reicht für 100 Tassen
-KRITISCHE_GRENZE = 20   # Warnung ab 20 restlichen Tassen
+# --- STATUS-SEITE (früher eigener Server) ---
+# webserver.py war eine zweite Flask-App auf Port 5000, die eine Tabelle
+# buchungen abfragte, die es im Schema nicht mehr gibt. Übrig ist die
+# Vorrats-Anzeige ohne Login, als Blueprint unter /status in der App aus
+# create_app() (app.py). /history und /admin der alten App gibt es dort unter
+# denselben Pfaden mit Login.
 
-def get_db_connection():
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row # Damit wir Spaltennamen benutzen können
-    return conn
+# Warnung ab so vielen restlichen Tassen (alle Sorten zusammen)
+KRITISCHE_GRENZE = 20
 
-# 1. Startseite & Handlungsempfehlung
-@app.route('/')
-def index():
-    conn = get_db_connection()
-    
-    # Berechnen, wie viel Kaffee getrunken wurde (seit letztem Reset/Auffüllen)
-    # Vereinfacht: Wir zählen einfach alle "Kaffee"-Buchungen
-    count = conn.execute("SELECT COUNT(*) FROM buchungen WHERE produkt LIKE 'Kaffee%'").fetchone()[0]
-    
-    restliche_tassen = MAX_KAFFEE_BOHNEN - (count % MAX_KAFFEE_BOHNEN)
-    nachkauf_noetig = restliche_tassen < KRITISCHE_GRENZE
-    
-    conn.close()
-    return render_template('index.html', rest=restliche_tassen, warnung=nachkauf_noetig)
-
-# 2. Buchungsliste (Historie)
-@app.route('/history')
-def history():
-    conn = get_db_connection()
-    # Holt die letzten 50 Buchungen inkl. Namen des Users
-    buchungen = conn.execute('''
-        SELECT buchungen.zeitstempel, users.name, buchungen.produkt, buchungen.preis 
-        FROM buchungen 
-        JOIN users ON buchungen.user_id = users.id 
-        ORDER BY buchungen.zeitstempel DESC LIMIT 50
-    ''').fetchall()
-    conn.close()
-    return render_template('history.html', buchungen=buchungen)
+status = Blueprint('status', __name__, url_prefix='/status')
 
-# 3. Admin: Neuer Benutzer
-@app.route('/admin', methods=('GET', 'POST'))
-def admin():
-    if request.method == 'POST':
-        name = request.form['name']
-        rfid = request.form['rfid']
-        
-        conn = get_db_connection()
-        try:
-            conn.execute("INSERT INTO users (name, rfid_uid) VALUES (?, ?)", (name, rfid))
-            conn.commit()
-            status = "Benutzer angelegt!"
-        except:
-            status = "Fehler: RFID existiert wohl schon."
-        conn.close()
-        return render_template('admin.html', status=status)
-        
-    return render_template('admin.html')
 
-if __name__ == '__main__':
-    # host='0.0.0.0' macht den Server im ganzen WLAN erreichbar!
-    app.run(debug=True, host='0.0.0.0', port=5000)
+@status.route('/')
+def index():
+    conn = db.get_db()
+    zeile = conn.execute("SELECT value FROM settings WHERE key = 'gramm_pro_tasse'").fetchone()
+    try:
+        gramm_pro_tasse = float(zeile[0]) if zeile else 12.0
+    except (TypeError, ValueError):
+        gramm_pro_tasse = 12.0
+    # Bestand je Sorte = gelieferte Gramm - getrunkene Tassen (laufende Summen, siehe statistik.py)
+    bestand = sum(max(gramm - tassen * gramm_pro_tasse, 0)
+                  for gramm, tassen, _ in statistik.lese_verbrauch(conn, '2000-01-01').values())
+    restliche_tassen = int(bestand // gramm_pro_tasse) if gramm_pro_tasse > 0 else 0
+    return render_template('index.html', rest=restliche_tassen, warnung=restliche_tassen < KRITISCHE_GRENZE)